@@ -0,0 +1,4 @@
+"""Benchmarks for qbt_flow_utils.
+
+Run a benchmark with ``python -m benchmarks.<module>``.
+"""
@@ -0,0 +1,96 @@
+"""Benchmark config import and per section loading time.
+
+Usage: ``python -m benchmarks.bench_config_import --config-folder config --max-import-ms 500``
+
+Import time is measured with ``python -X importtime`` in a fresh interpreter.
+Exits with status 1 when ``--max-import-ms`` is exceeded, or when a heavy
+module is imported, to be used as a regression guard by ``make check``.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+# Modules the config must not import, e.g. through a package ``__init__``.
+HEAVY_MODULES = ("numpy", "aiohttp", "redis")
+
+SECTIONS = {
+    "tags": "get_tags_config()",
+    "scoring": "get_scoring_config()",
+    "clients": "get_clients_config()",
+    "trackers": "get_trackers_config()",
+    "all": (
+        "get_tags_config(); get_scoring_config(); get_clients_config();"
+        " get_trackers_config(); get_tracker_matcher()"
+    ),
+}
+
+
+def import_times(env: Dict[str, str]) -> Dict[str, float]:
+    """Return the cumulative import time in ms of the modules imported by the config."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import qbt_flow_utils.config"],  # noqa: S603
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = (part.strip() for part in line[len("import time:") :].split("|"))
+        if cumulative.isdigit():
+            times[module] = int(cumulative) / 1000
+    return times
+
+
+def heavy_imports(times: Dict[str, float]) -> List[str]:
+    """Return the heavy modules found in :func:`import_times` results."""
+    return [module for module in HEAVY_MODULES if module in times]
+
+
+def section_time(env: Dict[str, str], statement: str) -> float:
+    """Return the time in ms to load config sections in a fresh interpreter."""
+    code = (
+        "import time\n"
+        "from qbt_flow_utils.config.config import *\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "print((time.perf_counter() - start) * 1000)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],  # noqa: S603
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--config-folder", default="config")
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    env = dict(os.environ, QBT_FLOW_UTILS_CONFIG_FOLDER=os.path.abspath(args.config_folder))
+    times = import_times(env)
+    import_ms = times.get("qbt_flow_utils.config", 0.0)
+    print(f"import qbt_flow_utils.config : {import_ms:8.1f}ms")
+    for name, statement in SECTIONS.items():
+        print(f"load {name:<24}: {section_time(env, statement):8.1f}ms")
+
+    heavy = heavy_imports(times)
+    if heavy:
+        print(f"Import time regression: the config imports {', '.join(heavy)}")
+        sys.exit(1)
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print(f"Import time regression: {import_ms:.1f}ms > {args.max_import_ms}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark the logging pipeline at DEBUG on per torrent messages.
+
+Usage: ``python -m benchmarks.bench_logging --torrents 100000``
+
+Compares the caller side cost of the previous synchronous sink, of loguru
+``enqueue`` (messages are pickled to a queue) and of the batched sink, with
+and without the per torrent rate limit. Output goes to a drained pipe, like
+a container stdout.
+"""
+import argparse
+import os
+import threading
+import time
+from typing import Any, Dict, TextIO
+
+from loguru import logger
+
+from qbt_flow_utils.logging import BatchedWriter, RateLimitFilter
+
+
+def drained_pipe() -> TextIO:
+    read_fd, write_fd = os.pipe()
+
+    def drain() -> None:
+        while os.read(read_fd, 1 << 16):
+            pass
+
+    threading.Thread(target=drain, daemon=True).start()
+    return open(write_fd, "w")  # noqa: SIM115
+
+
+def run(torrents: int, stream: Any, **options: Any) -> float:
+    logger.remove()
+    logger.add(stream, level="DEBUG", colorize=True, **options)
+    start = time.perf_counter()
+    for i in range(torrents):
+        logger.bind(hash=f"{i:040x}").debug(f"Torrent {i} is not hit and run protected")
+    elapsed = time.perf_counter() - start
+    logger.remove()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--torrents", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with drained_pipe() as output:
+        variants: Dict[str, Dict[str, Any]] = {
+            "synchronous": {"stream": output},
+            "loguru enqueue": {"stream": output, "enqueue": True},
+            "batched": {"stream": BatchedWriter(output)},
+            "batched rate limited": {
+                "stream": BatchedWriter(output),
+                "filter": RateLimitFilter(20, 60),
+            },
+        }
+        print(f"torrents={args.torrents}")
+        for name, options in variants.items():
+            elapsed = run(args.torrents, **options)
+            print(
+                f"{name:<22}: {elapsed * 1000:8.1f}ms ({elapsed / args.torrents * 1e6:.1f}us/msg)"
+            )
+
+
+if __name__ == "__main__":
+    main()
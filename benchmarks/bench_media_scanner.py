@@ -0,0 +1,77 @@
+"""Benchmark the incremental media folder scanner.
+
+Usage: ``python -m benchmarks.bench_media_scanner --files 200000``
+
+Builds a library of ``--files`` hardlinked files, 20 per directory, then
+times a cold scan, a scan of the unchanged library and a scan after
+``--changes`` files were added.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from qbt_flow_utils.files.media import MediaScanner
+
+FILES_PER_DIR = 20
+PAST = (1_600_000_000, 1_600_000_000)
+
+
+def build_library(root: str, files: int) -> str:
+    downloads = os.path.join(root, "downloads")
+    media = os.path.join(root, "media")
+    os.makedirs(downloads)
+    for i in range(files):
+        if i % 10_000 == 0:
+            # Filesystems cap the links per inode, e.g. 65000 on ext4.
+            source = os.path.join(downloads, f"payload{i // 10_000}.mkv")
+            with open(source, "wb"):
+                pass
+        directory = os.path.join(media, f"show{i // 2000:03d}", f"season{i // FILES_PER_DIR:05d}")
+        if i % FILES_PER_DIR == 0:
+            os.makedirs(directory)
+        os.link(source, os.path.join(directory, f"episode{i:06d}.mkv"))
+    for dir_path, _, _ in os.walk(media):
+        os.utime(dir_path, PAST)
+    return media
+
+
+def timed(scanner: MediaScanner, label: str) -> None:
+    start = time.perf_counter()
+    stats = scanner.refresh()
+    violations = scanner.violations()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<10}: {elapsed * 1000:8.1f}ms ({stats.scanned_dirs} dirs listed,"
+        f" {stats.reused_dirs} reused, {len(violations)} violations)",
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=200_000)
+    parser.add_argument("--changes", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        media = build_library(root, args.files)
+        manifest_file = os.path.join(root, "media.state")
+        scanner = MediaScanner(media, manifest_file, workers=args.workers)
+        print(f"files={args.files} workers={args.workers}")
+        timed(scanner, "cold")
+        scanner.save()
+
+        scanner = MediaScanner(media, manifest_file, workers=args.workers)
+        scanner.load()
+        timed(scanner, "unchanged")
+        for i in range(args.changes):
+            directory = os.path.join(media, "show000", f"season{i:05d}")
+            with open(os.path.join(directory, "extra.mkv"), "wb"):
+                pass
+            os.utime(directory, (PAST[0] + 10, PAST[1] + 10))
+        timed(scanner, "changed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark the streaming orphaned files detector on a synthetic tree.
+
+Usage: ``python -m benchmarks.bench_orphans --files 2000000 --workers 8``
+
+The tree is created once in ``--path`` (a temporary folder by default) and
+reused when the same path is given again.
+"""
+import argparse
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+from qbt_flow_utils.files.orphans import ExpectedPaths, find_orphans
+
+FILES_PER_DIR = 100
+DIRS_PER_TOP = 100
+
+
+def build_tree(path: str, files: int) -> None:
+    """Create empty files spread over top-level / torrent folders."""
+    marker = os.path.join(path, f".tree-{files}")
+    if os.path.exists(marker):
+        return
+    for i in range(files):
+        directory = os.path.join(
+            path,
+            f"top{i // (FILES_PER_DIR * DIRS_PER_TOP)}",
+            f"torrent{i // FILES_PER_DIR}",
+        )
+        if i % FILES_PER_DIR == 0:
+            os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"file{i}.bin"), "wb"):
+            pass
+    with open(marker, "wb"):
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=2_000_000)
+    parser.add_argument("--orphans-every", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--path", default=None)
+    args = parser.parse_args()
+
+    path = args.path or tempfile.mkdtemp(prefix="qfu-orphans-")
+    start = time.perf_counter()
+    build_tree(path, args.files)
+    print(f"tree of {args.files} files ready in {time.perf_counter() - start:.1f}s ({path})")
+
+    start = time.perf_counter()
+    expected = ExpectedPaths()
+    for i in range(args.files):
+        if i % args.orphans_every:
+            expected.add(
+                os.path.join(
+                    path,
+                    f"top{i // (FILES_PER_DIR * DIRS_PER_TOP)}",
+                    f"torrent{i // FILES_PER_DIR}",
+                    f"file{i}.bin",
+                ),
+            )
+    expected.compact()
+    expected_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    orphans = sum(1 for _ in find_orphans([path], expected, max_workers=args.workers))
+    walk_time = time.perf_counter() - start
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(f"expected paths  : {expected_time:8.2f}s ({len(expected)} digests)")
+    print(f"orphans walk    : {walk_time:8.2f}s ({orphans} orphans)")
+    print(f"peak RSS        : {max_rss:8.1f} MiB")
+    if args.path is None:
+        shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    main()
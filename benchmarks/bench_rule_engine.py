@@ -0,0 +1,97 @@
+"""Benchmark the vectorised auto_manage rule engine against a per torrent loop.
+
+Usage: ``python -m benchmarks.bench_rule_engine --torrents 100000``
+"""
+import argparse
+import random
+import time
+from typing import Any, Dict, List, Tuple
+
+from box import Box
+
+from benchmarks.bench_scoring_engine import build_snapshot
+from qbt_flow_utils.config.runtime import compile_tracker
+from qbt_flow_utils.rules.engine import RuleEngine
+from qbt_flow_utils.torrents.snapshot import TorrentSnapshot
+
+ACTIONS = ["pause_torrent", "stop_torrent", "remove_torrent", None]
+
+
+def trackers_config(trackers: int, seed: int = 42) -> Dict[str, Dict[str, Any]]:
+    rng = random.Random(seed)
+    config = {}
+    for i in range(trackers):
+        action = rng.choice(ACTIONS)
+        config[f"tracker{i}"] = {
+            "tracker_tag": f"tracker{i}",
+            "tracker_keywords": [f"tracker{i}.org"],
+            "hit_and_run": {"ignore_hit_and_run": False, "min_seed_time": rng.choice([72, 120])},
+            "auto_manage": {
+                "conditions": {
+                    "max_seed_time": rng.choice([240, 720, 2160]),
+                    "max_ratio": rng.choice([1, 2, 5]),
+                    "min_active_seeder": rng.choice([0, 2, 5]),
+                    "protect_hit_and_run": rng.random() < 0.5,
+                },
+                "action": {action: True} if action else {"limit_upload_speed": 512},
+            },
+        }
+    return config
+
+
+def loop_plan(snapshot: TorrentSnapshot, config: Box) -> Dict[Tuple[str, Any], List[str]]:
+    """Match torrents one at a time against the Box config."""
+    groups: Dict[Tuple[str, Any], List[str]] = {}
+    for row in range(len(snapshot)):
+        tracker = config.get(snapshot.tracker_names[snapshot.tracker_codes[row]])
+        if tracker is None:
+            continue
+        conditions = tracker.auto_manage.conditions
+        seeding_time = snapshot.seeding_time[row]
+        ratio = snapshot.ratio[row]
+        if not (seeding_time >= conditions.max_seed_time * 3600 or ratio >= conditions.max_ratio):
+            continue
+        if snapshot.seeders[row] < conditions.min_active_seeder:
+            continue
+        hit_and_run = tracker.hit_and_run
+        if conditions.protect_hit_and_run and seeding_time < hit_and_run.min_seed_time * 3600:
+            continue
+        action = next(iter(tracker.auto_manage.action.items()))
+        state = snapshot.state_names[snapshot.state_codes[row]]
+        if action[0] in ("pause_torrent", "stop_torrent") and state == "pausedUP":
+            continue
+        groups.setdefault(action, []).append(snapshot.hashes[row])
+    return groups
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--torrents", type=int, default=100_000)
+    parser.add_argument("--trackers", type=int, default=300)
+    args = parser.parse_args()
+
+    config = trackers_config(args.trackers)
+    snapshot = build_snapshot(args.torrents, args.trackers)
+    engine = RuleEngine({tag: compile_tracker(tracker) for tag, tracker in config.items()})
+
+    start = time.perf_counter()
+    loop_groups = loop_plan(snapshot, Box(config, frozen_box=True))
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batches = engine.plan(snapshot)
+    plan_time = time.perf_counter() - start
+
+    matched = sum(len(batch.hashes) for batch in batches)
+    print(f"torrents={args.torrents} trackers={args.trackers}")
+    print(
+        f"python loop : {loop_time * 1000:8.1f}ms ({sum(map(len, loop_groups.values()))} torrents)"
+    )
+    print(
+        f"rule engine : {plan_time * 1000:8.1f}ms ({matched} torrents, {len(batches)} calls,"
+        f" {args.torrents / plan_time / 1e6:.1f}M torrents/s, {loop_time / plan_time:.1f}x)",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark config access patterns: frozen Box, pydantic models and runtime config.
+
+Usage: ``python -m benchmarks.bench_runtime_config --lookups 1000000``
+"""
+import argparse
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from box import Box
+
+from qbt_flow_utils.config.runtime import HOUR, compile_runtime_config
+from qbt_flow_utils.config.schemas import TrackerConfig
+
+SCORING_CONFIG = {
+    "score_calculation": {"coef_day_seed_time": 0.5, "coef_seed_ratio": 2, "coef_nums_seeder": 0.1},
+}
+
+
+def tracker_config(tag: str) -> Dict[str, Any]:
+    return {
+        "tracker_tag": tag,
+        "extra_score": 10,
+        "tracker_keywords": [f"{tag}.example.com"],
+        "hit_and_run": {"ignore_hit_and_run": False, "min_seed_time": 72, "min_ratio": 1},
+        "auto_manage": {
+            "conditions": {"max_seed_time": 720, "max_ratio": 2, "min_active_seeder": 2},
+            "action": {"limit_upload_speed": 512},
+        },
+    }
+
+
+def timed(label: str, loop: Callable[[], float], baseline: float = 0) -> float:
+    start = time.perf_counter()
+    loop()
+    elapsed = time.perf_counter() - start
+    speedup = f" ({baseline / elapsed:.1f}x)" if baseline else ""
+    print(f"{label:<36}: {elapsed * 1000:8.1f}ms{speedup}")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lookups", type=int, default=1_000_000)
+    parser.add_argument("--trackers", type=int, default=300)
+    args = parser.parse_args()
+
+    configs = [tracker_config(f"tracker{i}") for i in range(args.trackers)]
+    models = {config["tracker_tag"]: TrackerConfig.model_validate(config) for config in configs}
+    box = Box(
+        {tag: model.model_dump(exclude_none=True) for tag, model in models.items()},
+        frozen_box=True,
+    )
+    runtime = compile_runtime_config(box, SCORING_CONFIG)
+    rng = random.Random(42)
+    tags: List[str] = [rng.choice(list(models)) for _ in range(args.lookups)]
+    seeding_time = 100 * HOUR
+
+    print(f"lookups={args.lookups} trackers={args.trackers}")
+    print("hit_and_run.min_ratio / min_seed_time")
+
+    def box_hnr() -> float:
+        return sum(
+            box[tag].hit_and_run.min_ratio + box[tag].hit_and_run.min_seed_time * HOUR
+            for tag in tags
+        )
+
+    def model_hnr() -> float:
+        total = 0.0
+        for tag in tags:
+            hit_and_run = models[tag].hit_and_run
+            total += (hit_and_run.min_ratio or 0) + (hit_and_run.min_seed_time or 0) * HOUR
+        return total
+
+    def runtime_hnr() -> float:
+        trackers = runtime.trackers
+        return sum(
+            trackers[tag].hit_and_run.min_ratio + trackers[tag].hit_and_run.min_seed_time
+            for tag in tags
+        )
+
+    baseline = timed("  frozen Box", box_hnr)
+    timed("  pydantic model", model_hnr, baseline)
+    timed("  runtime config", runtime_hnr, baseline)
+
+    print("auto_manage.conditions.max_seed_time reached")
+
+    def box_manage() -> float:
+        return sum(
+            seeding_time >= box[tag].auto_manage.conditions.max_seed_time * HOUR for tag in tags
+        )
+
+    def model_manage() -> float:
+        return sum(
+            seeding_time >= (models[tag].auto_manage.conditions.max_seed_time or 0) * HOUR
+            for tag in tags
+        )
+
+    def runtime_manage() -> float:
+        trackers = runtime.trackers
+        return sum(seeding_time >= trackers[tag].auto_manage.max_seed_time for tag in tags)
+
+    baseline = timed("  frozen Box", box_manage)
+    timed("  pydantic model", model_manage, baseline)
+    timed("  runtime config", runtime_manage, baseline)
+
+
+if __name__ == "__main__":
+    main()
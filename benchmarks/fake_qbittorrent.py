@@ -0,0 +1,332 @@
+"""Local fake qBittorrent WebUI API server.
+
+Only the endpoints used by qbt_flow_utils are implemented. The torrents state
+is kept in memory with a per field revision so that ``sync/maindata`` answers
+real partial deltas. Every call is recorded in :attr:`FakeQBittorrent.calls`.
+"""
+import asyncio
+import secrets
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from aiohttp import web
+from yarl import URL
+
+
+@dataclass(frozen=True)
+class RecordedCall:
+    """A call received by the fake server."""
+
+    method: str
+    endpoint: str
+    status: int
+    request_bytes: int
+    response_bytes: int
+    duration: float
+
+
+class FakeQBittorrent:
+    """In-memory qBittorrent WebUI API server."""
+
+    def __init__(
+        self,
+        username: str = "admin",
+        password: str = "adminadmin",  # noqa: S107
+        latency: float = 0,
+    ) -> None:
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls: List[RecordedCall] = []
+        self.rid = 0
+        self.torrents: Dict[str, Dict[str, Any]] = {}
+        self.categories: Dict[str, Dict[str, Any]] = {}
+        self.tags: Set[str] = set()
+        self.trackers: Dict[str, List[Dict[str, Any]]] = {}
+        self._failures: Dict[str, int] = {}
+        self._fields_rid: Dict[str, Dict[str, int]] = {}
+        self._torrents_rid: Dict[str, int] = {}
+        self._torrents_removed: List[Tuple[int, str]] = []
+        self._categories_rid: Dict[str, int] = {}
+        self._categories_removed: List[Tuple[int, str]] = []
+        self._tags_rid: Dict[str, int] = {}
+        self._tags_removed: List[Tuple[int, str]] = []
+        self._sessions: Set[str] = set()
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application(middlewares=[self._auth_middleware])
+        self.app.router.add_post("/api/v2/auth/login", self._login)
+        self.app.router.add_get("/api/v2/sync/maindata", self._maindata)
+        self.app.router.add_get("/api/v2/torrents/info", self._torrents_info)
+        self.app.router.add_get("/api/v2/torrents/trackers", self._torrent_trackers)
+        self.app.router.add_post("/api/v2/torrents/addTags", self._add_tags)
+        self.app.router.add_post("/api/v2/torrents/removeTags", self._remove_tags)
+        self.app.router.add_post("/api/v2/torrents/setUploadLimit", self._set_upload_limit)
+        self.app.router.add_post("/api/v2/torrents/pause", self._pause)
+        self.app.router.add_post("/api/v2/torrents/stop", self._pause)
+        self.app.router.add_post("/api/v2/torrents/delete", self._delete)
+
+    # State mutation
+
+    def _bump(self) -> int:
+        self.rid += 1
+        return self.rid
+
+    def add_torrent(self, torrent_hash: str, **properties: Any) -> None:
+        """Add a torrent, or update it if it already exists."""
+        self.update_torrent(torrent_hash, **properties)
+
+    def load_torrents(self, torrents: Mapping[str, Mapping[str, Any]]) -> None:
+        """Add many torrents at once, in a single revision."""
+        rid = self._bump()
+        for torrent_hash, properties in torrents.items():
+            self.torrents[torrent_hash] = dict(properties)
+            self._fields_rid[torrent_hash] = dict.fromkeys(properties, rid)
+            self._torrents_rid[torrent_hash] = rid
+            for tag in self._torrent_tags(torrent_hash):
+                self.add_tag(tag)
+
+    def update_torrent(self, torrent_hash: str, **properties: Any) -> None:
+        """Update some properties of a torrent."""
+        rid = self._bump()
+        if torrent_hash not in self.torrents:
+            self._torrents_removed = [
+                entry for entry in self._torrents_removed if entry[1] != torrent_hash
+            ]
+        torrent = self.torrents.setdefault(torrent_hash, {})
+        fields_rid = self._fields_rid.setdefault(torrent_hash, {})
+        for key, value in properties.items():
+            torrent[key] = value
+            fields_rid[key] = rid
+        self._torrents_rid[torrent_hash] = rid
+        for tag in self._torrent_tags(torrent_hash):
+            self.add_tag(tag)
+
+    def set_trackers(self, torrent_hash: str, trackers: Iterable[Mapping[str, Any]]) -> None:
+        """Replace the trackers of a torrent, as listed by ``torrents/trackers``."""
+        self.trackers[torrent_hash] = [dict(tracker) for tracker in trackers]
+
+    def remove_torrent(self, torrent_hash: str) -> None:
+        """Remove a torrent."""
+        rid = self._bump()
+        self.torrents.pop(torrent_hash, None)
+        self.trackers.pop(torrent_hash, None)
+        self._fields_rid.pop(torrent_hash, None)
+        self._torrents_rid.pop(torrent_hash, None)
+        self._torrents_removed.append((rid, torrent_hash))
+
+    def add_category(self, name: str, save_path: str) -> None:
+        """Add or update a category."""
+        self.categories[name] = {"name": name, "savePath": save_path}
+        self._categories_rid[name] = self._bump()
+
+    def remove_category(self, name: str) -> None:
+        """Remove a category."""
+        self.categories.pop(name, None)
+        self._categories_rid.pop(name, None)
+        self._categories_removed.append((self._bump(), name))
+
+    def add_tag(self, tag: str) -> None:
+        """Create a tag."""
+        if tag not in self.tags:
+            self.tags.add(tag)
+            self._tags_rid[tag] = self._bump()
+
+    def remove_tag(self, tag: str) -> None:
+        """Delete a tag."""
+        self.tags.discard(tag)
+        self._tags_rid.pop(tag, None)
+        self._tags_removed.append((self._bump(), tag))
+
+    def set_torrent_tags(self, torrent_hash: str, tags: Iterable[str]) -> None:
+        """Replace the tags of a torrent."""
+        self.update_torrent(torrent_hash, tags=", ".join(sorted(tags)))
+
+    def _torrent_tags(self, torrent_hash: str) -> List[str]:
+        tags = self.torrents.get(torrent_hash, {}).get("tags") or ""
+        return [tag for tag in (part.strip() for part in tags.split(",")) if tag]
+
+    # Calls recording
+
+    def calls_to(self, endpoint: str) -> List[RecordedCall]:
+        """Return the recorded calls to an endpoint, e.g. ``torrents/addTags``."""
+        return [call for call in self.calls if call.endpoint == endpoint]
+
+    def reset_calls(self) -> None:
+        """Forget the recorded calls."""
+        self.calls = []
+
+    def fail_next(self, endpoint: str, count: int = 1) -> None:
+        """Answer the next ``count`` calls to an endpoint with a 500 error."""
+        self._failures[endpoint] = count
+
+    # Server
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> URL:
+        """Start the server and return its base URL."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        sockets = site._server.sockets  # type: ignore
+        return URL.build(scheme="http", host=host, port=sockets[0].getsockname()[1])
+
+    async def close(self) -> None:
+        """Stop the server."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @web.middleware
+    async def _auth_middleware(self, request: web.Request, handler: Any) -> web.StreamResponse:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        start = time.perf_counter()
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            response = await self._authenticated(request, handler)
+        finally:
+            self.in_flight -= 1
+        body = getattr(response, "body", None)
+        self.calls.append(
+            RecordedCall(
+                method=request.method,
+                endpoint=request.path[len("/api/v2/") :],
+                status=response.status,
+                request_bytes=len(request.path_qs) + (request.content_length or 0),
+                response_bytes=len(body) if isinstance(body, bytes) else 0,
+                duration=time.perf_counter() - start,
+            ),
+        )
+        return response
+
+    async def _authenticated(self, request: web.Request, handler: Any) -> web.StreamResponse:
+        if (
+            request.path != "/api/v2/auth/login"
+            and request.cookies.get("SID") not in self._sessions
+        ):
+            return web.Response(status=403, text="Forbidden")
+        endpoint = request.path[len("/api/v2/") :]
+        if self._failures.get(endpoint):
+            self._failures[endpoint] -= 1
+            return web.Response(status=500, text="Internal Server Error")
+        response: web.StreamResponse = await handler(request)
+        return response
+
+    async def _login(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        if form.get("username") != self.username or form.get("password") != self.password:
+            return web.Response(text="Fails.")
+        sid = secrets.token_hex(16)
+        self._sessions.add(sid)
+        response = web.Response(text="Ok.")
+        response.set_cookie("SID", sid)
+        return response
+
+    async def _maindata(self, request: web.Request) -> web.Response:
+        rid = int(request.query.get("rid", 0))
+        if rid <= 0 or rid > self.rid:
+            return web.json_response(
+                {
+                    "rid": self.rid,
+                    "full_update": True,
+                    "torrents": self.torrents,
+                    "categories": self.categories,
+                    "tags": sorted(self.tags),
+                    "server_state": {},
+                },
+            )
+
+        data: Dict[str, Any] = {"rid": self.rid}
+        torrents = {
+            torrent_hash: {
+                key: self.torrents[torrent_hash][key]
+                for key, field_rid in self._fields_rid[torrent_hash].items()
+                if field_rid > rid
+            }
+            for torrent_hash, torrent_rid in self._torrents_rid.items()
+            if torrent_rid > rid
+        }
+        if torrents:
+            data["torrents"] = torrents
+        removed = [
+            torrent_hash for log_rid, torrent_hash in self._torrents_removed if log_rid > rid
+        ]
+        if removed:
+            data["torrents_removed"] = removed
+        categories = {
+            name: self.categories[name]
+            for name, category_rid in self._categories_rid.items()
+            if category_rid > rid
+        }
+        if categories:
+            data["categories"] = categories
+        categories_removed = [name for log_rid, name in self._categories_removed if log_rid > rid]
+        if categories_removed:
+            data["categories_removed"] = categories_removed
+        tags = [tag for tag, tag_rid in self._tags_rid.items() if tag_rid > rid]
+        if tags:
+            data["tags"] = tags
+        tags_removed = [tag for log_rid, tag in self._tags_removed if log_rid > rid]
+        if tags_removed:
+            data["tags_removed"] = tags_removed
+        return web.json_response(data)
+
+    async def _torrents_info(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            [{"hash": torrent_hash, **torrent} for torrent_hash, torrent in self.torrents.items()],
+        )
+
+    async def _torrent_trackers(self, request: web.Request) -> web.Response:
+        torrent_hash = request.query.get("hash", "")
+        if torrent_hash not in self.torrents:
+            return web.Response(status=404, text="Not Found")
+        return web.json_response(self.trackers.get(torrent_hash, []))
+
+    async def _form_hashes(self, request: web.Request) -> Tuple[List[str], Any]:
+        form = await request.post()
+        hashes = str(form.get("hashes", ""))
+        if hashes == "all":
+            return list(self.torrents), form
+        return [h for h in hashes.split("|") if h in self.torrents], form
+
+    async def _add_tags(self, request: web.Request) -> web.Response:
+        hashes, form = await self._form_hashes(request)
+        tags = [tag.strip() for tag in str(form.get("tags", "")).split(",") if tag.strip()]
+        for torrent_hash in hashes:
+            current = set(self._torrent_tags(torrent_hash))
+            if not current.issuperset(tags):
+                self.set_torrent_tags(torrent_hash, current.union(tags))
+        return web.Response()
+
+    async def _remove_tags(self, request: web.Request) -> web.Response:
+        hashes, form = await self._form_hashes(request)
+        tags = [tag.strip() for tag in str(form.get("tags", "")).split(",") if tag.strip()]
+        for torrent_hash in hashes:
+            current = set(self._torrent_tags(torrent_hash))
+            if current.intersection(tags):
+                self.set_torrent_tags(torrent_hash, current.difference(tags))
+        return web.Response()
+
+    async def _set_upload_limit(self, request: web.Request) -> web.Response:
+        hashes, form = await self._form_hashes(request)
+        limit = int(str(form.get("limit", "0")))
+        for torrent_hash in hashes:
+            self.update_torrent(torrent_hash, up_limit=limit)
+        return web.Response()
+
+    async def _pause(self, request: web.Request) -> web.Response:
+        hashes, _ = await self._form_hashes(request)
+        for torrent_hash in hashes:
+            self.update_torrent(torrent_hash, state="pausedUP")
+        return web.Response()
+
+    async def _delete(self, request: web.Request) -> web.Response:
+        hashes, _ = await self._form_hashes(request)
+        for torrent_hash in hashes:
+            self.remove_torrent(torrent_hash)
+        return web.Response()
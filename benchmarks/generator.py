@@ -0,0 +1,173 @@
+"""Synthetic torrents, trackers and file tree generator.
+
+The torrents dicts carry the ``sync/maindata`` fields used by qbt_flow_utils.
+Trackers popularity follows a Zipf law (``tracker_mix`` is its exponent, 0 for
+a uniform mix), a ``cross_seed_ratio`` share of torrents are cross-seeds of an
+other torrent (same name, size and content path on an other tracker) and a
+``hardlink_ratio`` share of contents are hardlinked into the media folder.
+"""
+import os
+import random
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+DAY = 86400
+STATES = ["uploading", "stalledUP", "stalledUP", "stalledUP", "pausedUP", "queuedUP"]
+
+
+@dataclass
+class SyntheticLoad:
+    """Generated torrents and config."""
+
+    torrents: Dict[str, Dict[str, Any]]
+    trackers_config: Dict[str, Dict[str, Any]]
+    # Relative file paths and sizes of each distinct content.
+    contents: Dict[str, List[Tuple[str, int]]] = field(default_factory=dict)
+    # Contents hardlinked into the media folder.
+    hardlinked: List[str] = field(default_factory=list)
+
+
+def tracker_config(index: int, rng: random.Random) -> Dict[str, Any]:
+    """Return a valid ``TrackerConfig`` dict."""
+    action = rng.choice(["limit_upload_speed", "pause_torrent", None])
+    config: Dict[str, Any] = {
+        "tracker_tag": f"tracker{index}",
+        "extra_score": rng.choice([0, 0, 100, 1000]),
+        "tracker_keywords": [f"tracker{index}.org"],
+        "hit_and_run": {
+            "ignore_hit_and_run": rng.random() < 0.5,
+            "min_seed_time": rng.choice([72, 120, 240]),
+            "min_ratio": 1,
+        },
+        "auto_manage": None,
+    }
+    if action is not None:
+        config["auto_manage"] = {
+            "conditions": {
+                "max_seed_time": rng.choice([240, 720, 2160]),
+                "max_ratio": rng.choice([2, 5]),
+                "min_active_seeder": rng.choice([0, 2]),
+                "protect_hit_and_run": True,
+            },
+            "action": {"limit_upload_speed": 512}
+            if action == "limit_upload_speed"
+            else {action: True},
+        }
+    return config
+
+
+def generate(
+    count: int,
+    trackers: int = 50,
+    tracker_mix: float = 1.0,
+    cross_seed_ratio: float = 0.2,
+    hardlink_ratio: float = 0.5,
+    public_ratio: float = 0.05,
+    downloads_path: str = "/downloads",
+    seed: int = 42,
+) -> SyntheticLoad:
+    """Generate a synthetic load.
+
+    :param count: Number of torrents.
+    :type count: int
+    :param trackers: Number of configured private trackers.
+    :type trackers: int
+    :param tracker_mix: Zipf exponent of trackers popularity, 0 for uniform.
+    :type tracker_mix: float
+    :param cross_seed_ratio: Share of torrents cross-seeding an other one.
+    :type cross_seed_ratio: float
+    :param hardlink_ratio: Share of contents hardlinked into the media folder.
+    :type hardlink_ratio: float
+    :param public_ratio: Share of torrents from public trackers.
+    :type public_ratio: float
+    :param downloads_path: Save path of the torrents.
+    :type downloads_path: str
+    :param seed: Random seed.
+    :type seed: int
+    :return: Synthetic load.
+    :rtype: SyntheticLoad
+    """
+    rng = random.Random(seed)
+    trackers_config = {f"tracker{i}": tracker_config(i, rng) for i in range(trackers)}
+    tags = list(trackers_config)
+    weights = [1 / (rank + 1) ** tracker_mix for rank in range(trackers)]
+    load = SyntheticLoad({}, trackers_config)
+    now = 1_700_000_000
+
+    originals: List[Dict[str, Any]] = []
+    for i in range(count):
+        torrent_hash = f"{rng.getrandbits(160):040x}"
+        is_public = rng.random() < public_ratio
+        tracker = "" if is_public else rng.choices(tags, weights)[0]
+        origin: Optional[Dict[str, Any]] = None
+        if originals and rng.random() < cross_seed_ratio:
+            origin = rng.choice(originals)
+        if origin is None:
+            name = f"content{i}"
+            files = [
+                (f"{name}/file{j}.mkv", rng.randint(2**20, 2**32))
+                for j in range(rng.choice([1, 1, 1, 3, 10]))
+            ]
+            load.contents[name] = files
+            if rng.random() < hardlink_ratio:
+                load.hardlinked.append(name)
+            size = sum(file_size for _, file_size in files)
+        else:
+            name, size = origin["name"], origin["size"]
+        seeding_time = rng.randint(0, 365 * DAY)
+        ratio = round(rng.expovariate(1.0), 3)
+        torrent = {
+            "name": name,
+            "size": size,
+            "total_size": size,
+            "downloaded": size,
+            "uploaded": int(ratio * size),
+            "ratio": ratio,
+            "seeding_time": seeding_time,
+            "added_on": now - seeding_time - rng.randint(0, DAY),
+            "num_complete": rng.randint(0, 200),
+            "up_limit": -1,
+            "state": rng.choice(STATES),
+            "tracker": (
+                f"udp://open{rng.randrange(10)}.public.org:1337/announce"
+                if is_public
+                else f"https://{tracker}.org/{rng.getrandbits(64):016x}/announce"
+            ),
+            "private": not is_public,
+            "tags": "",
+            "category": "",
+            "save_path": downloads_path,
+            "content_path": os.path.join(downloads_path, name),
+        }
+        load.torrents[torrent_hash] = torrent
+        if origin is None:
+            originals.append(torrent)
+    return load
+
+
+def build_file_tree(load: SyntheticLoad, downloads: str, media: str) -> int:
+    """Create the contents as sparse files, hardlinked into media as generated.
+
+    :param load: Synthetic load.
+    :type load: SyntheticLoad
+    :param downloads: Downloads folder, must match the generated save path.
+    :type downloads: str
+    :param media: Media folder.
+    :type media: str
+    :return: Number of files created.
+    :rtype: int
+    """
+    created = 0
+    hardlinked = set(load.hardlinked)
+    for name, files in load.contents.items():
+        for relative_path, size in files:
+            path = os.path.join(downloads, relative_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as file:
+                file.truncate(size)
+            if name in hardlinked:
+                link = os.path.join(media, relative_path)
+                os.makedirs(os.path.dirname(link), exist_ok=True)
+                os.link(path, link)
+            created += 1
+    return created
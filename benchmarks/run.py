@@ -0,0 +1,309 @@
+"""Synthetic load benchmark suite.
+
+Usage: ``python -m benchmarks.run --sizes 10000 100000 1000000 --output results.json``
+
+Every size runs in a fresh process against a local fake qBittorrent server
+and reports, per stage (sync, tagging, scoring, auto_manage, removal), the
+wall time, the API calls and bytes recorded by the server and the process
+peak RSS once the stage is done. The fake server runs in the same process,
+so its share of time and memory is included. Pass ``--compare`` with the
+output of an earlier commit to list the regressions.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from benchmarks.fake_qbittorrent import FakeQBittorrent
+from benchmarks.generator import build_file_tree, generate
+from qbt_flow_utils.config.runtime import compile_tracker
+from qbt_flow_utils.files.inodes import InodeIndex
+from qbt_flow_utils.logging import logger
+from qbt_flow_utils.qbittorrent.client import QBittorrentClient
+from qbt_flow_utils.qbittorrent.sync import ClientStateStore
+from qbt_flow_utils.rules.engine import RuleEngine, apply_actions
+from qbt_flow_utils.scoring.engine import ScoringEngine
+from qbt_flow_utils.scoring.removal import RemovalPlanner
+from qbt_flow_utils.tagging.planner import apply_tag_mutations, managed_tags, plan_tag_mutations
+from qbt_flow_utils.torrents.cross_seed import CrossSeedIndex
+from qbt_flow_utils.torrents.snapshot import TorrentSnapshot, parse_tags
+from qbt_flow_utils.trackers.matcher import TrackerMatcher, known_tracker
+
+STAGES = ("sync", "tagging", "scoring", "auto_manage", "removal")
+METRICS = ("wall_time", "api_calls", "api_bytes", "peak_rss_mb")
+DELETE_CHUNK = 10_000
+TAGS_CONFIG = {
+    "auto_tags_public": True,
+    "public_tag": "Public",
+    "auto_tags_unknown_trackers": True,
+    "unknown_tracker_tag": "Other",
+}
+SCORING_CONFIG = {
+    "ignore_untagged_torrents": True,
+    "ignore_tags_for_selection": ["to-keep"],
+    "extra_tags_score": {"Public": 10000},
+    "score_calculation": {"coef_day_seed_time": 0.5, "coef_seed_ratio": 2, "coef_nums_seeder": 0.1},
+}
+
+
+@dataclass
+class StageResult:
+    """Measures of a stage."""
+
+    wall_time: float
+    api_calls: int
+    api_bytes: int
+    peak_rss_mb: float
+
+
+@dataclass
+class Options:
+    """Synthetic load and run options."""
+
+    trackers: int = 50
+    tracker_mix: float = 1.0
+    cross_seed_ratio: float = 0.2
+    hardlink_ratio: float = 0.5
+    free_ratio: float = 0.05
+    latency: float = 0
+    file_tree: bool = False
+    seed: int = 42
+
+
+def peak_rss_mb() -> float:
+    """Return the process peak RSS in MiB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KiB elsewhere.
+    return rss / 1024**2 if sys.platform == "darwin" else rss / 1024
+
+
+@contextmanager
+def measure(
+    server: FakeQBittorrent,
+    results: Dict[str, StageResult],
+    stage: str,
+) -> Iterator[None]:
+    """Record the measures of the stage run in the block."""
+    server.reset_calls()
+    start = time.perf_counter()
+    yield
+    wall_time = time.perf_counter() - start
+    results[stage] = StageResult(
+        wall_time=round(wall_time, 4),
+        api_calls=len(server.calls),
+        api_bytes=sum(call.request_bytes + call.response_bytes for call in server.calls),
+        peak_rss_mb=round(peak_rss_mb(), 1),
+    )
+
+
+async def run_stages(size: int, options: Options, work_dir: str) -> Dict[str, StageResult]:
+    """Run every stage once against ``size`` synthetic torrents."""
+    downloads = os.path.join(work_dir, "downloads")
+    media = os.path.join(work_dir, "media")
+    load = generate(
+        size,
+        trackers=options.trackers,
+        tracker_mix=options.tracker_mix,
+        cross_seed_ratio=options.cross_seed_ratio,
+        hardlink_ratio=options.hardlink_ratio,
+        downloads_path=downloads,
+        seed=options.seed,
+    )
+    inode_index = None
+    if options.file_tree:
+        build_file_tree(load, downloads, media)
+        inode_index = InodeIndex([downloads, media])
+
+    server = FakeQBittorrent(latency=options.latency)
+    server.load_torrents(load.torrents)
+    load.torrents = {}  # The server keeps its own copy.
+    url = await server.start()
+    results: Dict[str, StageResult] = {}
+    matcher = TrackerMatcher.from_config(load.trackers_config, TAGS_CONFIG)
+    store = ClientStateStore()
+    try:
+        async with QBittorrentClient(url, server.username, server.password) as client:
+            with measure(server, results, "sync"):
+                await client.login()
+                await store.sync(client)
+                store.pop_changes()
+
+            with measure(server, results, "tagging"):
+                current = {h: parse_tags(t.get("tags") or "") for h, t in store.torrents.items()}
+                desired = {
+                    h: [matcher.match([known_tracker(t)], t.get("private"))]
+                    for h, t in store.torrents.items()
+                }
+                managed = managed_tags(TAGS_CONFIG, load.trackers_config)
+                mutations = plan_tag_mutations(current, desired, managed)
+                await apply_tag_mutations(client, mutations, dry_run=False)
+
+            with measure(server, results, "scoring"):
+                await store.sync(client)
+                snapshot = TorrentSnapshot.from_torrents(store.torrents, matcher)
+                scoring = ScoringEngine(SCORING_CONFIG, load.trackers_config)
+                scores = scoring.score(snapshot)
+                selectable = scoring.selectable(snapshot)
+
+            with measure(server, results, "auto_manage"):
+                trackers = {tag: compile_tracker(c) for tag, c in load.trackers_config.items()}
+                batches = RuleEngine(trackers).plan(snapshot)
+                await apply_actions(client, batches, dry_run=False)
+
+            with measure(server, results, "removal"):
+                cross_seeds = CrossSeedIndex()
+                cross_seeds.update(store.torrents, store.pop_changes())
+                content_paths = None
+                if inode_index is not None:
+                    inode_index.refresh()
+                    content_paths = [store.torrents[h].get("content_path") for h in snapshot.hashes]
+                bytes_to_free = int(snapshot.size.sum() * options.free_ratio)
+                plan = RemovalPlanner(inode_index, cross_seeds).plan(
+                    snapshot,
+                    scores,
+                    selectable,
+                    bytes_to_free,
+                    content_paths,
+                )
+                hashes: List[str] = snapshot.hashes[np.sort(plan.rows)].tolist()
+                for start in range(0, len(hashes), DELETE_CHUNK):
+                    chunk = hashes[start : start + DELETE_CHUNK]
+                    await client.post(
+                        "torrents/delete", hashes="|".join(chunk), deleteFiles="false"
+                    )
+    finally:
+        await server.close()
+    return results
+
+
+def run_size(size: int, options: Options) -> Dict[str, Dict[str, Any]]:
+    """Run the stages for one size, in a temporary work folder."""
+    logger.disable("qbt_flow_utils")
+    work_dir = tempfile.mkdtemp(prefix="qfu-bench-")
+    try:
+        results = asyncio.run(run_stages(size, options, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        logger.enable("qbt_flow_utils")
+    return {stage: asdict(result) for stage, result in results.items()}
+
+
+def git_commit() -> Optional[str]:
+    """Return the current git commit, None outside of a git checkout."""
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "HEAD"],  # noqa: S603, S607
+            capture_output=True,
+            check=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def run_suite(sizes: List[int], options: Options, isolate: bool = True) -> Dict[str, Any]:
+    """Run every size and return the JSON report."""
+    report: Dict[str, Any] = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": int(time.time()),
+        "options": asdict(options),
+        "sizes": {},
+    }
+    for size in sizes:
+        if isolate:
+            # A fresh process per size so that peak RSS is not inherited.
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(1) as pool:
+                report["sizes"][str(size)] = pool.apply(run_size, (size, options))
+        else:
+            report["sizes"][str(size)] = run_size(size, options)
+    return report
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """List the measures of ``report`` worse than ``baseline`` beyond tolerance."""
+    regressions = []
+    for size, stages in report["sizes"].items():
+        for stage, measures in stages.items():
+            previous = baseline.get("sizes", {}).get(size, {}).get(stage)
+            if previous is None:
+                continue
+            for metric in METRICS:
+                old, new = previous.get(metric), measures[metric]
+                if old is not None and new > old * (1 + tolerance) and new - old > 1e-3:
+                    regressions.append(f"{size} {stage} {metric}: {old} -> {new}")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"commit {report['commit']}")
+    print(f"{'size':>9} {'stage':<12} {'wall':>9} {'calls':>7} {'bytes':>12} {'peak RSS':>10}")
+    for size, stages in report["sizes"].items():
+        for stage in STAGES:
+            result = stages[stage]
+            print(
+                f"{size:>9} {stage:<12} {result['wall_time'] * 1000:7.1f}ms"
+                f" {result['api_calls']:>7} {result['api_bytes']:>12}"
+                f" {result['peak_rss_mb']:>7.1f}MiB",
+            )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--trackers", type=int, default=50)
+    parser.add_argument("--tracker-mix", type=float, default=1.0)
+    parser.add_argument("--cross-seed-ratio", type=float, default=0.2)
+    parser.add_argument("--hardlink-ratio", type=float, default=0.5)
+    parser.add_argument("--free-ratio", type=float, default=0.05)
+    parser.add_argument("--latency", type=float, default=0, help="Fake server latency in s")
+    parser.add_argument("--file-tree", action="store_true", help="Create the sparse file tree")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-isolate", action="store_true", help="Run sizes in this process")
+    parser.add_argument("--output", help="JSON report path")
+    parser.add_argument("--compare", help="Baseline JSON report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    options = Options(
+        trackers=args.trackers,
+        tracker_mix=args.tracker_mix,
+        cross_seed_ratio=args.cross_seed_ratio,
+        hardlink_ratio=args.hardlink_ratio,
+        free_ratio=args.free_ratio,
+        latency=args.latency,
+        file_tree=args.file_tree,
+        seed=args.seed,
+    )
+    report = run_suite(args.sizes, options, isolate=not args.no_isolate)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"regression {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
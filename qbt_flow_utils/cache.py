@@ -0,0 +1,320 @@
+"""Shared state cache backed by Redis, with an in-process LRU fallback.
+
+Torrents snapshots, scores, hardlink index results and tracker lookups are
+stored under namespaced keys with a TTL, so that restarts and other worker
+containers reuse work. Reads and writes of many keys go through ``MGET`` and
+non transactional pipelines. Writes are also kept in a bounded in-process
+LRU, which serves reads while Redis is unreachable; Redis is retried after
+``retry_interval`` seconds. Invalidations made meanwhile, and keys written
+only to the LRU, are invalidated on Redis before it serves reads again.
+
+Values are stored on Redis as JSON, never pickled: anyone able to write to
+a shared Redis could otherwise run code in every worker. Values must be JSON
+serializable, tuples are read back from Redis as lists. Values that do not
+decode are treated as misses.
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+import redis
+
+from qbt_flow_utils.logging import logger
+from qbt_flow_utils.metrics import record_cache_lookups
+from qbt_flow_utils.settings import settings
+
+_MISSING = object()
+# Past this many keys invalidated while Redis is unreachable, the whole
+# namespace is flushed on recovery instead.
+MAX_PENDING_INVALIDATIONS = 10_000
+
+
+def make_key(*parts: Any) -> str:
+    """Build a cache key from its parts, e.g. ``make_key("tracker", client, hash)``.
+
+    :return: Cache key.
+    :rtype: str
+    """
+    return ":".join(str(part) for part in parts)
+
+
+class LRUCache:
+    """Bounded in-process cache with per key expiry."""
+
+    def __init__(self, max_size: int = 100_000) -> None:
+        self.max_size = max_size
+        self._data: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return a value, or default if missing or expired."""
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:  # noqa: A003
+        """Store a value, evicting the least recently used ones when full."""
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Remove a value."""
+        self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        """Remove every value whose key starts with prefix."""
+        for key in [key for key in self._data if key.startswith(prefix)]:
+            del self._data[key]
+
+
+class StateCache:
+    """Namespaced state cache shared through Redis."""
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis],
+        namespace: str = "qfu",
+        default_ttl: int = 3600,
+        lru_size: int = 100_000,
+        retry_interval: float = 30,
+    ) -> None:
+        """Initialize the cache.
+
+        :param redis_client: Redis client, memory only if None.
+        :type redis_client: Optional[redis.Redis]
+        :param namespace: Prefix of every key.
+        :type namespace: str
+        :param default_ttl: TTL in seconds of values stored without explicit
+            TTL, 0 to never expire.
+        :type default_ttl: int
+        :param lru_size: Max number of values kept in memory.
+        :type lru_size: int
+        :param retry_interval: Seconds before retrying an unreachable Redis.
+        :type retry_interval: float
+        """
+        self.redis = redis_client
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        self.retry_interval = retry_interval
+        self.local = LRUCache(lru_size)
+        self.hits = 0
+        self.misses = 0
+        self._down_until = 0.0
+        self._pending_keys: Set[str] = set()
+        self._pending_prefixes: Set[str] = set()
+
+    @classmethod
+    def from_settings(cls) -> "StateCache":
+        """Build a cache using ``settings.redis_url``.
+
+        :return: State cache.
+        :rtype: StateCache
+        """
+        client = redis.Redis.from_url(
+            str(settings.redis_url),
+            socket_connect_timeout=2,
+            socket_timeout=5,
+        )
+        return cls(client)
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _redis_available(self) -> bool:
+        if self.redis is None or time.monotonic() < self._down_until:
+            return False
+        if self._pending_keys or self._pending_prefixes:
+            return self._replay_invalidations()
+        return True
+
+    def _defer_invalidation(self, keys: Iterable[str] = (), prefix: Optional[str] = None) -> None:
+        if prefix is not None:
+            self._pending_prefixes.add(prefix)
+        self._pending_keys.update(keys)
+        if len(self._pending_keys) > MAX_PENDING_INVALIDATIONS:
+            self._pending_keys = set()
+            self._pending_prefixes = {""}
+
+    def _replay_invalidations(self) -> bool:
+        keys, prefixes = self._pending_keys, self._pending_prefixes
+        self._pending_keys, self._pending_prefixes = set(), set()
+        try:
+            if keys:
+                self.redis.unlink(*[self._key(key) for key in keys])  # type: ignore
+            for prefix in prefixes:
+                self._unlink_prefix(prefix)
+        except redis.RedisError as error:
+            self._pending_keys |= keys
+            self._pending_prefixes |= prefixes
+            self._redis_failed(error)
+            return False
+        logger.info(
+            f"Replayed {len(keys)} keys and {len(prefixes)} prefixes invalidated"
+            " while Redis was unreachable",
+        )
+        return True
+
+    def _redis_failed(self, error: Exception) -> None:
+        logger.warning(
+            f"Redis unreachable, using in-process cache for {self.retry_interval}s: {error}",
+        )
+        self._down_until = time.monotonic() + self.retry_interval
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return a cached value.
+
+        :param key: Key, without namespace.
+        :type key: str
+        :param default: Value returned on miss.
+        :type default: Any
+        :return: Cached value or default.
+        :rtype: Any
+        """
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return the cached values of several keys in one round trip.
+
+        :param keys: Keys, without namespace.
+        :type keys: Iterable[str]
+        :return: Found values keyed by key, misses are omitted.
+        :rtype: Dict[str, Any]
+        """
+        keys = list(keys)
+        found: Dict[str, Any] = {}
+        if keys and self._redis_available():
+            try:
+                raw_values = self.redis.mget([self._key(key) for key in keys])  # type: ignore
+            except redis.RedisError as error:
+                self._redis_failed(error)
+            else:
+                for key, raw in zip(keys, raw_values):
+                    if raw is None:
+                        continue
+                    try:
+                        found[key] = json.loads(raw)
+                    except ValueError:
+                        logger.warning(f"Ignoring undecodable cached value of '{key}'")
+                self._count(len(found), len(keys) - len(found))
+                return found
+
+        for key in keys:
+            value = self.local.get(key, _MISSING)
+            if value is not _MISSING:
+                found[key] = value
+        self._count(len(found), len(keys) - len(found))
+        return found
+
+    def _count(self, hits: int, misses: int) -> None:
+        self.hits += hits
+        self.misses += misses
+        record_cache_lookups("state", hits, misses)
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:  # noqa: A003
+        """Store a value.
+
+        :param key: Key, without namespace.
+        :type key: str
+        :param value: JSON serializable value.
+        :type value: Any
+        :param ttl: TTL in seconds, ``default_ttl`` if None, 0 to never expire.
+        :type ttl: Optional[int]
+        """
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, values: Mapping[str, Any], ttl: Optional[int] = None) -> None:
+        """Store several values in one pipelined round trip.
+
+        :param values: JSON serializable values keyed by key, without namespace.
+        :type values: Mapping[str, Any]
+        :param ttl: TTL in seconds, ``default_ttl`` if None, 0 to never expire.
+        :type ttl: Optional[int]
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        for key, value in values.items():
+            self.local.set(key, value, ttl)
+        if not values or self.redis is None:
+            return
+        if not self._redis_available():
+            # The values on Redis are older than the ones written to the LRU.
+            self._defer_invalidation(values.keys())
+            return
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            for key, value in values.items():
+                pipeline.set(
+                    self._key(key),
+                    json.dumps(value, separators=(",", ":")),
+                    ex=ttl or None,
+                )
+            pipeline.execute()
+        except redis.RedisError as error:
+            self._defer_invalidation(values.keys())
+            self._redis_failed(error)
+
+    def invalidate(self, *keys: str) -> None:
+        """Remove values.
+
+        :param keys: Keys, without namespace.
+        :type keys: str
+        """
+        for key in keys:
+            self.local.delete(key)
+        if not keys or self.redis is None:
+            return
+        if not self._redis_available():
+            self._defer_invalidation(keys)
+            return
+        try:
+            self.redis.unlink(*[self._key(key) for key in keys])
+        except redis.RedisError as error:
+            self._defer_invalidation(keys)
+            self._redis_failed(error)
+
+    def invalidate_prefix(self, prefix: str, batch_size: int = 1000) -> None:
+        """Remove every value whose key starts with prefix, e.g. a client snapshot.
+
+        :param prefix: Keys prefix, without namespace.
+        :type prefix: str
+        :param batch_size: Number of keys unlinked per call.
+        :type batch_size: int
+        """
+        self.local.delete_prefix(prefix)
+        if self.redis is None:
+            return
+        if not self._redis_available():
+            self._defer_invalidation(prefix=prefix)
+            return
+        try:
+            self._unlink_prefix(prefix, batch_size)
+        except redis.RedisError as error:
+            self._defer_invalidation(prefix=prefix)
+            self._redis_failed(error)
+
+    def _unlink_prefix(self, prefix: str, batch_size: int = 1000) -> None:
+        batch: List[Any] = []
+        for key in self.redis.scan_iter(  # type: ignore
+            match=f"{self._key(prefix)}*",
+            count=batch_size,
+        ):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                self.redis.unlink(*batch)  # type: ignore
+                batch = []
+        if batch:
+            self.redis.unlink(*batch)  # type: ignore
+
+    @property
+    def hit_ratio(self) -> float:
+        """Return the ratio of hits over lookups."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -2,8 +2,11 @@
 from qbt_flow_utils.config.config import (
     get_clients_config,
     get_clients_list,
+    get_rclone_config,
+    get_runtime_config,
     get_scoring_config,
     get_tags_config,
+    get_tracker_matcher,
     get_trackers_config,
     get_trackers_tags,
 )
@@ -12,14 +15,20 @@ QFUTrackerConfig = get_trackers_config
 QFUTrackerList = get_trackers_tags
 QFUScoreConfig = get_scoring_config
 QFUTagsConfig = get_tags_config
+QFUTrackerMatcher = get_tracker_matcher
+QFURuntimeConfig = get_runtime_config
 QFUClientConfig = get_clients_config
 QFUClientList = get_clients_list
+QFURcloneConfig = get_rclone_config
 
 __all__ = [
     "QFUTrackerConfig",
     "QFUTrackerList",
     "QFUScoreConfig",
     "QFUTagsConfig",
+    "QFUTrackerMatcher",
+    "QFURuntimeConfig",
     "QFUClientConfig",
     "QFUClientList",
+    "QFURcloneConfig",
 ]
@@ -0,0 +1,150 @@
+"""Compiled config cache.
+
+Validated config files are stored, already dumped, in a pickle state file
+keyed by the SHA-256 of each source file and by the schema version, which is
+the hash of the ``schemas/*.py`` sources. Unchanged files then skip the YAML
+parsing and the pydantic validation, and any schema change drops the whole
+cache.
+"""
+import glob
+import hashlib
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple, Type
+
+import yaml
+from pydantic import BaseModel
+
+from qbt_flow_utils.logging import logger
+from qbt_flow_utils.metrics import record_cache_lookups
+from qbt_flow_utils.persist import dump_state, load_state
+
+CACHE_FORMAT = 1
+SCHEMAS_FOLDER = os.path.join(os.path.dirname(__file__), "schemas")
+
+_schema_version: Optional[str] = None
+
+
+def schema_version() -> str:
+    """Return the hash of the config schemas sources.
+
+    :return: Hex digest of the cache format and of every ``schemas/*.py`` file.
+    :rtype: str
+    """
+    global _schema_version
+    if _schema_version is None:
+        digest = hashlib.sha256(f"format:{CACHE_FORMAT}".encode())
+        for path in sorted(glob.glob(os.path.join(SCHEMAS_FOLDER, "*.py"))):
+            digest.update(os.path.basename(path).encode())
+            with open(path, "rb") as file:
+                digest.update(hashlib.sha256(file.read()).digest())
+        _schema_version = digest.hexdigest()
+    return _schema_version
+
+
+class CompiledConfigCache:
+    """Validated config files cache backed by a state file.
+
+    Writes are atomic (see :func:`dump_state`) and merged with the entries
+    saved meanwhile by other processes, so concurrent writers never corrupt
+    the file; at worst an entry is lost and recompiled on the next load.
+    """
+
+    def __init__(self, cache_file: str, version: Optional[str] = None) -> None:
+        """Initialize the cache.
+
+        :param cache_file: Path to the cache state file.
+        :type cache_file: str
+        :param version: Schema version, :func:`schema_version` if None.
+        :type version: Optional[str]
+        """
+        self.cache_file = cache_file
+        self.version = version or schema_version()
+        self.hits = 0
+        self.misses = 0
+        self._entries: Optional[Dict[str, Tuple[str, str, Dict[str, Any]]]] = None
+        self._dirty: Dict[str, Tuple[str, str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Tuple[str, str, Dict[str, Any]]]:
+        state = load_state(self.cache_file)
+        if not isinstance(state, dict) or state.get("version") != self.version:
+            return {}
+        entries = state.get("entries")
+        return entries if isinstance(entries, dict) else {}
+
+    @property
+    def entries(self) -> Dict[str, Tuple[str, str, Dict[str, Any]]]:
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def load(self, path: str, model: Type[BaseModel]) -> Dict[str, Any]:
+        """Load a config file, validated and dumped with ``exclude_none``.
+
+        :param path: Config file path.
+        :type path: str
+        :param model: Pydantic model validating the file.
+        :type model: Type[BaseModel]
+        :return: Dumped config.
+        :rtype: Dict[str, Any]
+        :raises ValidationError: If the config file is invalid.
+        """
+        with open(path, "rb") as file:
+            content = file.read()
+        key = os.path.abspath(path)
+        digest = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == digest and entry[1] == model.__name__:
+                self.hits += 1
+                record_cache_lookups("compiled_config", 1, 0)
+                return entry[2]
+            self.misses += 1
+        record_cache_lookups("compiled_config", 0, 1)
+
+        config = model.model_validate(yaml.safe_load(content))
+        config_dict = config.model_dump(exclude_none=True)
+        with self._lock:
+            self.entries[key] = self._dirty[key] = (digest, model.__name__, config_dict)
+        return config_dict
+
+    def save(self) -> None:
+        """Write entries compiled since last save, merged with the file ones."""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = self._read()
+            entries.update(self._dirty)
+            entries = {path: entry for path, entry in entries.items() if os.path.isfile(path)}
+            try:
+                dump_state(self.cache_file, {"version": self.version, "entries": entries})
+            except OSError as error:
+                logger.warning(f"Unable to write config cache '{self.cache_file}': {error}")
+                return
+            self._entries = entries
+            self._dirty = {}
+
+
+def load_config_file(
+    path: str,
+    model: Type[BaseModel],
+    cache: Optional[CompiledConfigCache] = None,
+) -> Dict[str, Any]:
+    """Load a config file through the compiled cache if any.
+
+    :param path: Config file path.
+    :type path: str
+    :param model: Pydantic model validating the file.
+    :type model: Type[BaseModel]
+    :param cache: Compiled config cache, files are always compiled if None.
+    :type cache: Optional[CompiledConfigCache]
+    :return: Dumped config.
+    :rtype: Dict[str, Any]
+    :raises ValidationError: If the config file is invalid.
+    """
+    if cache is not None:
+        return cache.load(path, model)
+    with open(path) as file:
+        data = yaml.safe_load(file)
+    return model.model_validate(data).model_dump(exclude_none=True)
@@ -1,21 +1,44 @@
 """Config main validation module."""
+import asyncio
 import os
-from typing import List, Tuple
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Tuple, TypeVar
 
-import yaml
 from box import Box
 from pydantic import ValidationError
 
-from qbt_flow_utils.config.schemas import ClientConfig, ScoringConfig, TagsConfig, TrackerConfig
+from qbt_flow_utils.config.compiled import CompiledConfigCache, load_config_file
+from qbt_flow_utils.config.runtime import RuntimeConfig, compile_runtime_config
+from qbt_flow_utils.config.schemas import (
+    ClientConfig,
+    RcloneConfig,
+    ScoringConfig,
+    TagsConfig,
+    TrackerConfig,
+)
 from qbt_flow_utils.logging import logger
 from qbt_flow_utils.settings import settings
+from qbt_flow_utils.trackers.matcher import TrackerMatcher
 
+T = TypeVar("T")
 
-def _load_trackers_config(config_path: str) -> Tuple[Box, List[str]]:
+COMPILED_CONFIG_FILE = "compiled_config.cache"
+FILE_SECTIONS = ("trackers", "clients", "scoring", "tags", "rclone")
+
+Signature = Tuple[Tuple[str, int, int], ...]
+
+
+def _load_trackers_config(
+    config_path: str,
+    cache: Optional[CompiledConfigCache] = None,
+) -> Tuple[Box, List[str]]:
     """Load trackers config.
 
     :param config_path: Path to trackers config directory.
     :type config_path: str
+    :param cache: Compiled config cache.
+    :type cache: Optional[CompiledConfigCache]
     :return: Tuple of trackers config and list of trackers tags.
     :rtype: Tuple[Box, List[str]]
     :raises ValidationError: If tracker config is invalid.
@@ -36,13 +59,14 @@ def _load_trackers_config(config_path: str) -> Tuple[Box, List[str]]:
 
     for filename in files:
         if filename.endswith((".yml", ".yaml")):
-            with open(os.path.join(config_path, filename)) as file:
-                data = yaml.safe_load(file)
             try:
-                tracker_config = TrackerConfig.model_validate(data)
-                tracker_tag = tracker_config.tracker_tag
+                tracker_config_dict = load_config_file(
+                    os.path.join(config_path, filename),
+                    TrackerConfig,
+                    cache,
+                )
+                tracker_tag = tracker_config_dict["tracker_tag"]
                 trackers_tags.append(tracker_tag)
-                tracker_config_dict = tracker_config.model_dump(exclude_none=True)
                 trackers_config[tracker_tag] = tracker_config_dict
             except ValidationError:
                 logger.info(f"Invalid tracker config file {filename}")
@@ -51,11 +75,13 @@ def _load_trackers_config(config_path: str) -> Tuple[Box, List[str]]:
     return Box(trackers_config, frozen_box=True), trackers_tags
 
 
-def _load_scoring_config(config_file: str) -> Box:
+def _load_scoring_config(config_file: str, cache: Optional[CompiledConfigCache] = None) -> Box:
     """Load scoring config.
 
     :param config_file: Path to scoring config file.
     :type config_file: str
+    :param cache: Compiled config cache.
+    :type cache: Optional[CompiledConfigCache]
     :return: Scoring config.
     :rtype: Box
     :raises ValidationError: If scoring config is invalid.
@@ -65,12 +91,8 @@ def _load_scoring_config(config_file: str) -> Box:
         logger.info(f"File '{config_file}' does not exist.")
         raise FileNotFoundError(f"File '{config_file}' does not exist.")
 
-    with open(config_file) as file:
-        data = yaml.safe_load(file)
-
     try:
-        scoring_config = ScoringConfig.model_validate(data)
-        scoring_config_dict = scoring_config.model_dump(exclude_none=True)
+        scoring_config_dict = load_config_file(config_file, ScoringConfig, cache)
     except ValidationError:
         logger.info(f"Invalid scoring config file {config_file}")
         raise
@@ -78,11 +100,13 @@ def _load_scoring_config(config_file: str) -> Box:
     return Box(scoring_config_dict, frozen_box=True)
 
 
-def _load_tags_config(config_file: str) -> Box:
+def _load_tags_config(config_file: str, cache: Optional[CompiledConfigCache] = None) -> Box:
     """Load tags config.
 
     :param config_file: Path to tags config file.
     :type config_file: str
+    :param cache: Compiled config cache.
+    :type cache: Optional[CompiledConfigCache]
     :return: Tags config.
     :rtype: Box
     :raises ValidationError: If tags config is invalid.
@@ -92,12 +116,8 @@ def _load_tags_config(config_file: str) -> Box:
         logger.info(f"File '{config_file}' does not exist.")
         raise FileNotFoundError(f"File '{config_file}' does not exist.")
 
-    with open(config_file) as file:
-        data = yaml.safe_load(file)
-
     try:
-        tags_config = TagsConfig.model_validate(data)
-        tags_config_dict = tags_config.model_dump(exclude_none=True)
+        tags_config_dict = load_config_file(config_file, TagsConfig, cache)
     except ValidationError:
         logger.info(f"Invalid tags config file {config_file}")
         raise
@@ -105,11 +125,41 @@ def _load_tags_config(config_file: str) -> Box:
     return Box(tags_config_dict, frozen_box=True)
 
 
-def _load_clients_config(config_dir: str) -> Tuple[Box, List[str]]:
+def _load_rclone_config(config_file: str, cache: Optional[CompiledConfigCache] = None) -> Box:
+    """Load rclone config.
+
+    :param config_file: Path to rclone config file.
+    :type config_file: str
+    :param cache: Compiled config cache.
+    :type cache: Optional[CompiledConfigCache]
+    :return: Rclone config.
+    :rtype: Box
+    :raises ValidationError: If rclone config is invalid.
+    :raises FileNotFoundError: If config file does not exist.
+    """
+    if not os.path.isfile(config_file):
+        logger.info(f"File '{config_file}' does not exist.")
+        raise FileNotFoundError(f"File '{config_file}' does not exist.")
+
+    try:
+        rclone_config_dict = load_config_file(config_file, RcloneConfig, cache)
+    except ValidationError:
+        logger.info(f"Invalid rclone config file {config_file}")
+        raise
+
+    return Box(rclone_config_dict, frozen_box=True)
+
+
+def _load_clients_config(
+    config_dir: str,
+    cache: Optional[CompiledConfigCache] = None,
+) -> Tuple[Box, List[str]]:
     """Load clients config.
 
     :param config_dir: Path to clients config directory.
     :type config_dir: str
+    :param cache: Compiled config cache.
+    :type cache: Optional[CompiledConfigCache]
     :return: Tuple of clients config and list of clients names.
     :rtype: Tuple[Box, List[str]]
     :raises ValidationError: If clients config is invalid.
@@ -130,13 +180,14 @@ def _load_clients_config(config_dir: str) -> Tuple[Box, List[str]]:
 
     for filename in files:
         if filename.endswith((".yml", ".yaml")):
-            with open(os.path.join(config_dir, filename)) as file:
-                data = yaml.safe_load(file)
             try:
-                client_config = ClientConfig.model_validate(data)
+                client_config_dict = load_config_file(
+                    os.path.join(config_dir, filename),
+                    ClientConfig,
+                    cache,
+                )
                 client_name = filename.split("_")[0]
                 clients_list.append(client_name)
-                client_config_dict = client_config.model_dump(exclude_none=True)
                 clients_config[client_name] = client_config_dict
             except ValidationError:
                 logger.info(f"Invalid client config file {filename}")
@@ -145,37 +196,369 @@ def _load_clients_config(config_dir: str) -> Tuple[Box, List[str]]:
     return Box(clients_config, frozen_box=True), clients_list
 
 
-config_folder = settings.config_folder
-trackers_config_folder = os.path.join(config_folder, "trackers_config")
-clients_config_folder = os.path.join(config_folder, "clients_config")
-scoring_config_file = os.path.join(config_folder, "scoring_config.yml")
-tags_config_file = os.path.join(config_folder, "tags_config.yml")
+def _keys_diff(
+    old: Mapping[str, Any],
+    new: Mapping[str, Any],
+) -> Tuple[FrozenSet[str], FrozenSet[str], FrozenSet[str]]:
+    added = frozenset(new.keys() - old.keys())
+    removed = frozenset(old.keys() - new.keys())
+    changed = frozenset(key for key in new.keys() & old.keys() if new[key] != old[key])
+    return added, removed, changed
+
+
+@dataclass(frozen=True)
+class ConfigDiff:
+    """Changes between two config snapshots."""
+
+    trackers_added: FrozenSet[str] = field(default_factory=frozenset)
+    trackers_removed: FrozenSet[str] = field(default_factory=frozenset)
+    trackers_changed: FrozenSet[str] = field(default_factory=frozenset)
+    clients_added: FrozenSet[str] = field(default_factory=frozenset)
+    clients_removed: FrozenSet[str] = field(default_factory=frozenset)
+    clients_changed: FrozenSet[str] = field(default_factory=frozenset)
+    scoring_changed: bool = False
+    tags_changed: bool = False
+    rclone_changed: bool = False
+
+    @classmethod
+    def between(cls, old: Mapping[str, Any], new: Mapping[str, Any]) -> "ConfigDiff":
+        """Diff the sections loaded in both registry snapshots.
+
+        :param old: Previous sections by name.
+        :type old: Mapping[str, Any]
+        :param new: New sections by name.
+        :type new: Mapping[str, Any]
+        :return: Config diff.
+        :rtype: ConfigDiff
+        """
+        empty: Tuple[Box, List[str]] = (Box(), [])
+        trackers = _keys_diff(old.get("trackers", empty)[0], new.get("trackers", empty)[0])
+        clients = _keys_diff(old.get("clients", empty)[0], new.get("clients", empty)[0])
+        return cls(
+            *trackers,
+            *clients,
+            scoring_changed=old.get("scoring") != new.get("scoring"),
+            tags_changed=old.get("tags") != new.get("tags"),
+            rclone_changed=old.get("rclone") != new.get("rclone"),
+        )
+
+    @property
+    def trackers(self) -> FrozenSet[str]:
+        """Added, removed or changed tracker tags."""
+        return self.trackers_added | self.trackers_removed | self.trackers_changed
+
+    @property
+    def clients(self) -> FrozenSet[str]:
+        """Added, removed or changed client names."""
+        return self.clients_added | self.clients_removed | self.clients_changed
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.trackers
+            or self.clients
+            or self.scoring_changed
+            or self.tags_changed
+            or self.rclone_changed,
+        )
+
+
+def _rebuild_derived_sections(sections: Dict[str, Any], changed: List[str]) -> None:
+    if "tracker_matcher" in sections and {"trackers", "tags"} & set(changed):
+        sections["tracker_matcher"] = TrackerMatcher.from_config(
+            sections["trackers"][0],
+            sections["tags"],
+        )
+    if "runtime" in sections and {"trackers", "scoring"} & set(changed):
+        sections["runtime"] = compile_runtime_config(sections["trackers"][0], sections["scoring"])
+
+
+class ConfigRegistry:
+    """Lazily loaded and memoised config sections.
+
+    Each section is loaded and validated on first access only, so importing
+    this module has no side effect and a command only pays for the sections
+    it uses.
+
+    In daemon mode, :meth:`watch` polls the config files and :meth:`reload`
+    swaps in the sections whose files changed, once validated.
+    """
+
+    def __init__(
+        self,
+        config_folder: Optional[str] = None,
+        cache_file: Optional[str] = None,
+    ) -> None:
+        """Initialize the registry.
+
+        :param config_folder: Config folder, ``settings.config_folder`` if None.
+        :type config_folder: Optional[str]
+        :param cache_file: Compiled config cache file, defaults to a file of
+            ``settings.cache_folder``. Unused if ``settings.config_cache`` is off.
+        :type cache_file: Optional[str]
+        """
+        self._config_folder = config_folder
+        self._cache_file = cache_file
+        self._cache: Optional[CompiledConfigCache] = None
+        self._sections: Dict[str, Any] = {}
+        self._signatures: Dict[str, Signature] = {}
+        self._rejected: Dict[str, Signature] = {}
+        self._subscribers: List[Callable[[ConfigDiff], None]] = []
+        self._lock = threading.RLock()
+
+    @property
+    def config_folder(self) -> str:
+        return self._config_folder or settings.config_folder
+
+    @property
+    def trackers_config_folder(self) -> str:
+        return os.path.join(self.config_folder, "trackers_config")
+
+    @property
+    def clients_config_folder(self) -> str:
+        return os.path.join(self.config_folder, "clients_config")
+
+    @property
+    def scoring_config_file(self) -> str:
+        return os.path.join(self.config_folder, "scoring_config.yml")
+
+    @property
+    def tags_config_file(self) -> str:
+        return os.path.join(self.config_folder, "tags_config.yml")
+
+    @property
+    def rclone_config_file(self) -> str:
+        return os.path.join(self.config_folder, "rclone_config", "rclone_config.yml")
+
+    @property
+    def cache(self) -> Optional[CompiledConfigCache]:
+        if not settings.config_cache:
+            return None
+        if self._cache is None:
+            self._cache = CompiledConfigCache(
+                self._cache_file or os.path.join(settings.cache_folder, COMPILED_CONFIG_FILE),
+            )
+        return self._cache
+
+    def _signature(self, name: str) -> Signature:
+        if name in ("trackers", "clients"):
+            folder = (
+                self.trackers_config_folder if name == "trackers" else self.clients_config_folder
+            )
+            try:
+                with os.scandir(folder) as entries:
+                    paths = sorted(e.path for e in entries if e.name.endswith((".yml", ".yaml")))
+            except FileNotFoundError:
+                return ()
+        else:
+            paths = [getattr(self, f"{name}_config_file")]
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def _load_trackers(self) -> Tuple[Box, List[str]]:
+        return _load_trackers_config(self.trackers_config_folder, self.cache)
+
+    def _load_clients(self) -> Tuple[Box, List[str]]:
+        return _load_clients_config(self.clients_config_folder, self.cache)
+
+    def _load_scoring(self) -> Box:
+        return _load_scoring_config(self.scoring_config_file, self.cache)
+
+    def _load_tags(self) -> Box:
+        return _load_tags_config(self.tags_config_file, self.cache)
+
+    def _load_rclone(self) -> Box:
+        return _load_rclone_config(self.rclone_config_file, self.cache)
+
+    def _loader(self, name: str) -> Callable[[], Any]:
+        loader: Callable[[], Any] = getattr(self, f"_load_{name}")
+        return loader
+
+    def _section(self, name: str, loader: Callable[[], T]) -> T:
+        try:
+            return self._sections[name]  # type: ignore [no-any-return]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._sections:
+                if name in FILE_SECTIONS:
+                    self._signatures[name] = self._signature(name)
+                self._sections[name] = loader()
+                if self.cache is not None:
+                    self.cache.save()
+            return self._sections[name]  # type: ignore [no-any-return]
+
+    def trackers(self) -> Tuple[Box, List[str]]:
+        return self._section("trackers", self._load_trackers)
+
+    def clients(self) -> Tuple[Box, List[str]]:
+        return self._section("clients", self._load_clients)
+
+    def scoring(self) -> Box:
+        return self._section("scoring", self._load_scoring)
+
+    def tags(self) -> Box:
+        return self._section("tags", self._load_tags)
+
+    def rclone(self) -> Box:
+        return self._section("rclone", self._load_rclone)
+
+    def tracker_matcher(self) -> TrackerMatcher:
+        return self._section(
+            "tracker_matcher",
+            lambda: TrackerMatcher.from_config(self.trackers()[0], self.tags()),
+        )
+
+    def runtime(self) -> RuntimeConfig:
+        return self._section(
+            "runtime",
+            lambda: compile_runtime_config(self.trackers()[0], self.scoring()),
+        )
+
+    def reset(self) -> None:
+        """Forget loaded sections, they are reloaded on next access."""
+        with self._lock:
+            self._sections = {}
+            self._signatures = {}
+            self._rejected = {}
+
+    def subscribe(self, callback: Callable[[ConfigDiff], None]) -> None:
+        """Register a callback called with the diff of each applied reload.
+
+        :param callback: Callback, e.g. rebuilding indexes of changed trackers.
+        :type callback: Callable[[ConfigDiff], None]
+        """
+        self._subscribers.append(callback)
+
+    def _reject(self, names: List[str], signatures: Dict[str, Any], error: Exception) -> None:
+        logger.error(
+            f"Rejected config reload of {', '.join(names)}, keeping previous config: {error}",
+        )
+        self._rejected.update((name, signatures[name]) for name in names)
+
+    def _load_changed(
+        self,
+        changed: List[str],
+        signatures: Dict[str, Any],
+    ) -> Tuple[Dict[str, Any], List[str]]:
+        """Load the changed sections, return the new sections and the applied names."""
+        sections = dict(self._sections)
+        applied: List[str] = []
+        for name in changed:
+            try:
+                sections[name] = self._loader(name)()
+            except Exception as error:
+                self._reject([name], signatures, error)
+            else:
+                applied.append(name)
+        if applied:
+            try:
+                _rebuild_derived_sections(sections, applied)
+            except Exception as error:
+                # Valid on their own, but not together with the other sections.
+                self._reject(applied, signatures, error)
+                applied = []
+        return sections, applied
+
+    def reload(self) -> Optional[ConfigDiff]:
+        """Reload the loaded sections whose files changed.
+
+        Each changed section is validated on its own, the valid ones replace
+        the previous snapshot in a single assignment. An invalid edit is
+        logged and rejected, the previous section stays live until its files
+        change again, without holding back the other sections. Derived
+        sections (tracker matcher, runtime config) are only rebuilt if the
+        sections they are compiled from changed.
+
+        :return: Diff of the applied reload, None if nothing was reloaded.
+        :rtype: Optional[ConfigDiff]
+        """
+        with self._lock:
+            signatures = {
+                name: self._signature(name) for name in FILE_SECTIONS if name in self._sections
+            }
+            changed = [
+                name
+                for name, signature in signatures.items()
+                if signature not in (self._signatures.get(name), self._rejected.get(name))
+            ]
+            if not changed:
+                return None
 
-trackers_config, trackers_tags = _load_trackers_config(trackers_config_folder)
-clients_config, clients_list = _load_clients_config(clients_config_folder)
-scoring_config = _load_scoring_config(scoring_config_file)
-tags_config = _load_tags_config(tags_config_file)
+            try:
+                sections, applied = self._load_changed(changed, signatures)
+            finally:
+                if self.cache is not None:
+                    self.cache.save()
+            if not applied:
+                return None
+
+            diff = ConfigDiff.between(self._sections, sections)
+            self._sections = sections
+            for name in applied:
+                self._signatures[name] = signatures[name]
+                self._rejected.pop(name, None)
+
+        if diff:
+            logger.info(f"Config reloaded: {diff}")
+            for callback in self._subscribers:
+                try:
+                    callback(diff)
+                except Exception as error:
+                    logger.opt(exception=error).error("Config reload subscriber failed")
+        return diff
+
+    async def watch(self, interval: float = 5.0) -> None:
+        """Poll config files forever and reload them on change.
+
+        :param interval: Seconds between two polls.
+        :type interval: float
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            await loop.run_in_executor(None, self.reload)
+
+
+registry = ConfigRegistry()
 
 
 def get_trackers_config() -> Box:
-    return trackers_config
+    return registry.trackers()[0]
 
 
 def get_trackers_tags() -> List[str]:
-    return trackers_tags
+    return registry.trackers()[1]
 
 
 def get_scoring_config() -> Box:
-    return scoring_config
+    return registry.scoring()
 
 
 def get_tags_config() -> Box:
-    return tags_config
+    return registry.tags()
+
+
+def get_tracker_matcher() -> TrackerMatcher:
+    return registry.tracker_matcher()
+
+
+def get_runtime_config() -> RuntimeConfig:
+    return registry.runtime()
 
 
 def get_clients_config() -> Box:
-    return clients_config
+    return registry.clients()[0]
 
 
 def get_clients_list() -> List[str]:
-    return clients_list
+    return registry.clients()[1]
+
+
+def get_rclone_config() -> Box:
+    return registry.rclone()
@@ -0,0 +1,187 @@
+"""Compiled runtime config.
+
+Per torrent loops read the config millions of times, and a frozen ``Box``
+attribute access costs much more than a plain attribute. The runtime config
+is made of named tuples keyed by interned tracker tags, with defaults already
+resolved and thresholds converted to the units of the qBittorrent API:
+
+- seed times in seconds (hours in config files),
+- upload speeds in bytes/s (KB/s in config files),
+- unset max thresholds to ``math.inf`` (never reached) and an unset
+  ``min_active_seeder`` to ``0`` (always passed),
+- unset hit and run ``min_seed_time`` / ``min_ratio`` to ``math.inf``: a
+  torrent is safe once it reaches either of them, so an unset one never
+  makes it safe.
+"""
+import math
+import sys
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Tuple
+
+HOUR = 3600
+KIB = 1024
+
+
+class HitAndRunRules(NamedTuple):
+    """Hit and run rules of a tracker.
+
+    A torrent is protected until it reaches ``min_seed_time`` or
+    ``min_ratio``, unless ``ignore`` is set.
+    """
+
+    ignore: bool
+    min_seed_time: float  # seconds
+    min_ratio: float
+
+
+class AutoManageRules(NamedTuple):
+    """Auto manage conditions and action of a tracker."""
+
+    max_seed_time: float  # seconds
+    max_ratio: float
+    min_active_seeder: int
+    protect_hit_and_run: bool
+    action: Optional[str]  # action flag name set to True, e.g. "pause_torrent"
+    limit_upload_speed: Optional[int]  # bytes/s
+
+
+class TrackerRules(NamedTuple):
+    """Runtime config of a tracker."""
+
+    tag: str
+    extra_score: int
+    keywords: Tuple[str, ...]
+    hit_and_run: HitAndRunRules
+    auto_manage: Optional[AutoManageRules]
+
+
+class ScoringRules(NamedTuple):
+    """Runtime scoring config."""
+
+    coef_day_seed_time: float
+    coef_seed_ratio: float
+    coef_nums_seeder: float
+    ignore_untagged_torrents: bool
+    ignore_tags_for_selection: Tuple[str, ...]
+    extra_tags_score: Dict[str, int]
+
+
+class RuntimeConfig(NamedTuple):
+    """Compiled config used on hot paths."""
+
+    trackers: Dict[str, TrackerRules]
+    scoring: ScoringRules
+
+
+AUTO_MANAGE_ACTIONS = (
+    "pause_torrent",
+    "stop_torrent",
+    "move_to_local",
+    "sync_to_remote",
+    "remove_torrent",
+)
+
+
+def _seconds(hours: Optional[float], default: float) -> float:
+    return default if hours is None else float(hours) * HOUR
+
+
+def compile_hit_and_run(config: Mapping[str, Any]) -> HitAndRunRules:
+    """Compile the ``hit_and_run`` config of a tracker.
+
+    :param config: Hit and run config.
+    :type config: Mapping[str, Any]
+    :return: Hit and run rules.
+    :rtype: HitAndRunRules
+    """
+    min_ratio = config.get("min_ratio")
+    return HitAndRunRules(
+        ignore=bool(config.get("ignore_hit_and_run", True)),
+        min_seed_time=_seconds(config.get("min_seed_time"), math.inf),
+        min_ratio=math.inf if min_ratio is None else float(min_ratio),
+    )
+
+
+def compile_auto_manage(config: Optional[Mapping[str, Any]]) -> Optional[AutoManageRules]:
+    """Compile the ``auto_manage`` config of a tracker.
+
+    :param config: Auto manage config.
+    :type config: Optional[Mapping[str, Any]]
+    :return: Auto manage rules, None if no action is configured.
+    :rtype: Optional[AutoManageRules]
+    """
+    if not config:
+        return None
+    conditions = config.get("conditions") or {}
+    action_config = config.get("action") or {}
+    action = next((name for name in AUTO_MANAGE_ACTIONS if action_config.get(name)), None)
+    limit_upload_speed = action_config.get("limit_upload_speed")
+    if action is None and limit_upload_speed is None:
+        return None
+    max_ratio = conditions.get("max_ratio")
+    return AutoManageRules(
+        max_seed_time=_seconds(conditions.get("max_seed_time"), math.inf),
+        max_ratio=math.inf if max_ratio is None else float(max_ratio),
+        min_active_seeder=int(conditions.get("min_active_seeder") or 0),
+        protect_hit_and_run=bool(conditions.get("protect_hit_and_run", False)),
+        action=action,
+        limit_upload_speed=None if limit_upload_speed is None else limit_upload_speed * KIB,
+    )
+
+
+def compile_tracker(config: Mapping[str, Any]) -> TrackerRules:
+    """Compile the config of a tracker.
+
+    :param config: Tracker config.
+    :type config: Mapping[str, Any]
+    :return: Tracker rules.
+    :rtype: TrackerRules
+    """
+    return TrackerRules(
+        tag=sys.intern(config["tracker_tag"]),
+        extra_score=int(config.get("extra_score", 0)),
+        keywords=tuple(config.get("tracker_keywords") or ()),
+        hit_and_run=compile_hit_and_run(config.get("hit_and_run") or {}),
+        auto_manage=compile_auto_manage(config.get("auto_manage")),
+    )
+
+
+def compile_scoring(config: Mapping[str, Any]) -> ScoringRules:
+    """Compile the scoring config.
+
+    :param config: Scoring config.
+    :type config: Mapping[str, Any]
+    :return: Scoring rules.
+    :rtype: ScoringRules
+    """
+    calculation = config["score_calculation"]
+    return ScoringRules(
+        coef_day_seed_time=float(calculation["coef_day_seed_time"]),
+        coef_seed_ratio=float(calculation["coef_seed_ratio"]),
+        coef_nums_seeder=float(calculation["coef_nums_seeder"]),
+        ignore_untagged_torrents=bool(config.get("ignore_untagged_torrents", True)),
+        ignore_tags_for_selection=tuple(config.get("ignore_tags_for_selection") or ()),
+        extra_tags_score={
+            sys.intern(tag): int(score)
+            for tag, score in (config.get("extra_tags_score") or {}).items()
+        },
+    )
+
+
+def compile_runtime_config(
+    trackers_config: Mapping[str, Any],
+    scoring_config: Mapping[str, Any],
+) -> RuntimeConfig:
+    """Compile the runtime config.
+
+    :param trackers_config: Trackers config keyed by tracker tag.
+    :type trackers_config: Mapping[str, Any]
+    :param scoring_config: Scoring config.
+    :type scoring_config: Mapping[str, Any]
+    :return: Runtime config.
+    :rtype: RuntimeConfig
+    """
+    trackers = (compile_tracker(config) for config in trackers_config.values())
+    return RuntimeConfig(
+        trackers={rules.tag: rules for rules in trackers},
+        scoring=compile_scoring(scoring_config),
+    )
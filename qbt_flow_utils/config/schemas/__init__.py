@@ -1,7 +1,8 @@
 """init schemas"""
 from qbt_flow_utils.config.schemas.clients import ClientConfig
+from qbt_flow_utils.config.schemas.rclone import RcloneConfig
 from qbt_flow_utils.config.schemas.scoring import ScoringConfig
 from qbt_flow_utils.config.schemas.tags import TagsConfig
 from qbt_flow_utils.config.schemas.trackers import TrackerConfig
 
-__all__ = ["ClientConfig", "ScoringConfig", "TagsConfig", "TrackerConfig"]
+__all__ = ["ClientConfig", "RcloneConfig", "ScoringConfig", "TagsConfig", "TrackerConfig"]
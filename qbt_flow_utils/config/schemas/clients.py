@@ -4,6 +4,7 @@ from typing import Any, Dict, Optional
 from pydantic import (
     BaseModel,
     ConfigDict,
+    Field,
     model_validator,
 )
 
@@ -63,6 +64,13 @@ class ClientDiskControlMethodConfig(BaseModel):
 class ClientPathConfig(BaseModel):
     downloads_path: str
     recycle_bin: str
+    recycle_bin_max_gib: Optional[int] = None
+    recycle_bin_max_days: Optional[float] = None
+
+
+class ClientTransferConfig(BaseModel):
+    max_concurrent: int = Field(ge=1, default=2)
+    max_speed: Optional[int] = Field(gt=0, default=None)  # KB/s
 
 
 class ClientConfig(BaseModel):
@@ -72,6 +80,7 @@ class ClientConfig(BaseModel):
     disk_control_method: ClientDiskControlMethodConfig
     category: Optional[Dict[str, str]] = None
     path: ClientPathConfig
+    transfer: Optional[ClientTransferConfig] = None
 
     @model_validator(mode="after")
     def validate_absolute_path(self) -> "ClientConfig":
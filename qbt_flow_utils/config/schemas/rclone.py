@@ -0,0 +1,37 @@
+"""Rclone validation schema."""
+import hashlib
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, model_validator
+
+
+class RcloneConfig(BaseModel):
+    """Rclone upload verification schema."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    # Only remove torrents whose files are found on the remote
+    verify_upload: bool = False
+    # Remote mirroring local_root, e.g. "gdrive:media"
+    remote: str
+    local_root: str
+    rclone_binary: str = "rclone"
+    # rclone.conf path, rclone default if unset
+    rclone_config_file: Optional[str] = None
+    # Files match by size, size and modtime, or size and hash
+    compare: Literal["size", "modtime", "hash"] = "size"
+    # rclone hash name, local files are hashed with hashlib
+    hash_type: str = "md5"
+    modtime_tolerance: float = 1
+    extra_flags: List[str] = []
+
+    @model_validator(mode="after")
+    def validate_remote(self) -> "RcloneConfig":
+        if ":" not in self.remote:
+            raise ValueError(f"Remote {self.remote} must be in the 'name:path' form")
+        if not self.local_root.startswith("/"):
+            raise ValueError(f"Path {self.local_root} must be an absolute path")
+        # rclone names hashes "md5" or "MD5", "sha1" or "SHA-1" depending on versions.
+        if self.hash_type.lower().replace("-", "") not in hashlib.algorithms_available:
+            raise ValueError(f"Hash type {self.hash_type} is not supported by hashlib")
+        return self
@@ -36,6 +36,10 @@ class TagsConfig(BaseModel):
     auto_tags_unknown_trackers: bool = False
     unknown_tracker_tag: str = "Other"
 
+    # Torrents whose trackers all report errors
+    auto_tags_tracker_error: bool = False
+    tracker_error_tag: str = "TrackerError"
+
     @model_validator(mode="before")
     @classmethod
     def validate_tags_string(cls, values: Any) -> Any:
@@ -47,6 +51,7 @@ class TagsConfig(BaseModel):
             "upload_limit_tag",
             "public_tag",
             "unknown_tracker_tag",
+            "tracker_error_tag",
         ]:
             if values.get(field) == "":
                 raise ValueError(f"{field} cannot be empty")
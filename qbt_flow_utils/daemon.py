@@ -0,0 +1,302 @@
+"""Event driven daemon scheduler.
+
+Instead of rerunning every stage in fixed full cycles, each stage has its
+own jittered interval and the triggers that run it early:
+
+- ``new_torrents``: a periodic delta sync, one small ``sync/maindata``
+  request, reported torrents never seen before,
+- ``disk_pressure``: the client disk control target is not met, checked
+  locally with ``statvfs`` or from the synced ``free_space_on_disk``,
+- ``hnr_deadline``: the earliest hit and run deadline passed.
+
+Triggers fired while a stage waits for its ``min_interval`` are coalesced
+into one run. A stage due while its previous run is still in flight is
+skipped, its pending triggers run it again once the previous run ends.
+Between events the client loops sleep until the next deadline, so a quiet
+instance costs one delta sync per ``poll_interval``.
+"""
+import asyncio
+import contextlib
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Mapping, Optional, Sequence, Set, Tuple
+
+from qbt_flow_utils.disk import bytes_to_free, local_bytes_to_free
+from qbt_flow_utils.engine import ClientContext, MultiClientEngine, Stage
+from qbt_flow_utils.logging import logger
+from qbt_flow_utils.metrics import STAGE_DURATION, STAGE_RUNS
+from qbt_flow_utils.settings import settings
+from qbt_flow_utils.torrents.hit_and_run import HitAndRunScheduler
+
+NEW_TORRENTS = "new_torrents"
+DISK_PRESSURE = "disk_pressure"
+HNR_DEADLINE = "hnr_deadline"
+
+# Settings flag: stage name, interval, triggers, min interval.
+DEFAULT_SCHEDULES: Dict[str, Tuple[str, float, FrozenSet[str], float]] = {
+    "auto_tags": ("tagging", 3600, frozenset({NEW_TORRENTS}), 30),
+    "auto_remove": ("removal", 3600, frozenset({DISK_PRESSURE}), 60),
+    "auto_manage": ("auto_manage", 900, frozenset({NEW_TORRENTS, HNR_DEADLINE}), 30),
+    "auto_sync": ("sync_to_remote", 1800, frozenset(), 0),
+    "auto_move": ("move_to_local", 1800, frozenset({DISK_PRESSURE}), 300),
+}
+
+
+@dataclass(frozen=True)
+class StageSchedule:
+    """When a stage runs."""
+
+    stage: Stage
+    # Max seconds between runs, only run by triggers if None.
+    interval: Optional[float] = None
+    triggers: FrozenSet[str] = frozenset()
+    # Min seconds between the starts of two runs, triggers are coalesced meanwhile.
+    min_interval: float = 0
+
+    @property
+    def name(self) -> str:
+        """Stage name."""
+        return getattr(self.stage, "__name__", "stage")
+
+
+@dataclass
+class _StageState:
+    schedule: StageSchedule
+    due: float = math.inf
+    last_start: float = -math.inf
+    triggered: Set[str] = field(default_factory=set)
+    task: Optional["asyncio.Task[None]"] = None
+
+
+@dataclass
+class _ClientLoop:
+    context: ClientContext
+    stages: List[_StageState]
+    wake: asyncio.Event = field(default_factory=asyncio.Event)
+    sync_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    known: Set[str] = field(default_factory=set)
+    next_poll: float = -math.inf
+    next_disk_check: float = -math.inf
+    fired_deadline: Optional[float] = None
+
+
+def default_schedules(stages: Mapping[str, Stage]) -> List[StageSchedule]:
+    """Build the schedules of the stages enabled by the ``auto_*`` settings.
+
+    :param stages: Stages keyed by name, e.g. ``tagging`` or ``removal``.
+    :type stages: Mapping[str, Stage]
+    :return: Stages schedules.
+    :rtype: List[StageSchedule]
+    """
+    return [
+        StageSchedule(stages[name], interval, triggers, min_interval)
+        for flag, (name, interval, triggers, min_interval) in DEFAULT_SCHEDULES.items()
+        if getattr(settings, flag) and name in stages
+    ]
+
+
+class DaemonScheduler:
+    """Run the stages of every client on their intervals and triggers."""
+
+    def __init__(
+        self,
+        engine: MultiClientEngine,
+        schedules: Sequence[StageSchedule],
+        hit_and_run: Optional[Mapping[str, HitAndRunScheduler]] = None,
+        poll_interval: Optional[float] = None,
+        disk_check_interval: Optional[float] = None,
+        jitter: Optional[float] = None,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        """Initialize the scheduler.
+
+        :param engine: Engine holding the clients contexts.
+        :type engine: MultiClientEngine
+        :param schedules: Stages schedules, applied to every client.
+        :type schedules: Sequence[StageSchedule]
+        :param hit_and_run: Hit and run schedulers keyed by client name, kept
+            up to date by the stages.
+        :type hit_and_run: Optional[Mapping[str, HitAndRunScheduler]]
+        :param poll_interval: Seconds between delta syncs, defaults to
+            ``settings.daemon_poll_interval``.
+        :type poll_interval: Optional[float]
+        :param disk_check_interval: Seconds between disk checks, defaults to
+            ``settings.daemon_disk_check_interval``.
+        :type disk_check_interval: Optional[float]
+        :param jitter: Fraction of randomization of the intervals, defaults to
+            ``settings.daemon_jitter``.
+        :type jitter: Optional[float]
+        :param rng: Random generator of the jitter.
+        :type rng: Optional[random.Random]
+        """
+        self.engine = engine
+        self.schedules = list(schedules)
+        self.hit_and_run = hit_and_run or {}
+        self.poll_interval = (
+            settings.daemon_poll_interval if poll_interval is None else poll_interval
+        )
+        self.disk_check_interval = (
+            settings.daemon_disk_check_interval
+            if disk_check_interval is None
+            else disk_check_interval
+        )
+        self.jitter = settings.daemon_jitter if jitter is None else jitter
+        self._rng = rng or random.Random()
+        self._loops: Dict[str, _ClientLoop] = {}
+        self._stopped = False
+
+    def _jittered(self, interval: float) -> float:
+        return interval * (1 + self._rng.uniform(-self.jitter, self.jitter))
+
+    def trigger(self, name: str, client: Optional[str] = None) -> None:
+        """Fire a trigger, e.g. from a qBittorrent "run on torrent added" hook.
+
+        :param name: Trigger name.
+        :type name: str
+        :param client: Client name, every client if None.
+        :type client: Optional[str]
+        """
+        now = asyncio.get_running_loop().time()
+        for loop_name, client_loop in self._loops.items():
+            if client is None or client == loop_name:
+                self._fire(client_loop, name, now)
+
+    def stop(self) -> None:
+        """Stop the scheduler, in flight stages are awaited."""
+        self._stopped = True
+        for client_loop in self._loops.values():
+            client_loop.wake.set()
+
+    def _fire(self, client_loop: _ClientLoop, trigger: str, now: float) -> None:
+        for state in client_loop.stages:
+            if trigger not in state.schedule.triggers:
+                continue
+            state.triggered.add(trigger)
+            if state.task is None:
+                state.due = min(state.due, max(now, state.last_start + state.schedule.min_interval))
+        client_loop.wake.set()
+
+    async def _sync(self, client_loop: _ClientLoop) -> None:
+        context = client_loop.context
+        async with client_loop.sync_lock:
+            await context.state.sync(context.client)
+        changes = context.state.changes
+        known = client_loop.known
+        if changes.full_update:
+            known.intersection_update(context.state.torrents)
+        known.difference_update(changes.removed)
+        new = [torrent_hash for torrent_hash in changes.changed if torrent_hash not in known]
+        if new:
+            known.update(new)
+            logger.debug(f"{len(new)} new torrents on client '{context.name}'")
+            self._fire(client_loop, NEW_TORRENTS, asyncio.get_running_loop().time())
+
+    def _disk_pressure(self, context: ClientContext) -> bool:
+        disk_control_method = context.config.get("disk_control_method")
+        if not disk_control_method:
+            return False
+        if disk_control_method.get("path_to_check"):
+            return local_bytes_to_free(disk_control_method) > 0
+        free = context.state.server_state.get("free_space_on_disk")
+        if disk_control_method.get("keep_free_gib") is None or free is None:
+            return False
+        return bytes_to_free(disk_control_method, 0, int(free)) > 0
+
+    def _deadline(self, client_loop: _ClientLoop, now: float) -> float:
+        """Fire the hit and run deadline if passed, return the next one."""
+        hit_and_run = self.hit_and_run.get(client_loop.context.name)
+        deadline = hit_and_run.next_deadline() if hit_and_run is not None else None
+        if deadline is None or deadline == client_loop.fired_deadline:
+            return math.inf
+        at = now + deadline - time.time()
+        if at > now:
+            return at
+        client_loop.fired_deadline = deadline
+        self._fire(client_loop, HNR_DEADLINE, now)
+        return math.inf
+
+    def _start(self, client_loop: _ClientLoop, state: _StageState, now: float) -> None:
+        context, schedule = client_loop.context, state.schedule
+        interval = schedule.interval
+        state.due = now + self._jittered(interval) if interval is not None else math.inf
+        if state.task is not None:
+            STAGE_RUNS.inc(context.name, schedule.name, "skipped")
+            logger.debug(f"Skipped stage '{schedule.name}', previous run still in flight")
+            return
+        triggers, state.triggered = state.triggered, set()
+        state.last_start = now
+        state.task = asyncio.create_task(self._run_stage(client_loop, state, triggers))
+
+    async def _run_stage(
+        self,
+        client_loop: _ClientLoop,
+        state: _StageState,
+        triggers: Set[str],
+    ) -> None:
+        context, name = client_loop.context, state.schedule.name
+        try:
+            with logger.contextualize(client=context.name):
+                logger.debug(
+                    f"Running stage '{name}' ({', '.join(sorted(triggers)) or 'interval'})"
+                )
+                await self._sync(client_loop)
+                # The stage sees the state synced after these triggers.
+                state.triggered.clear()
+                with STAGE_DURATION.time(context.name, name):
+                    await state.schedule.stage(context)
+                STAGE_RUNS.inc(context.name, name, "run")
+        except Exception as error:
+            logger.opt(exception=error).error(f"Stage '{name}' failed on client '{context.name}'")
+            STAGE_RUNS.inc(context.name, name, "failed")
+        finally:
+            state.task = None
+            if state.triggered:
+                # Triggers fired during the run, coalesced into the next one.
+                now = asyncio.get_running_loop().time()
+                state.due = min(state.due, max(now, state.last_start + state.schedule.min_interval))
+            client_loop.wake.set()
+
+    async def _client_loop(self, client_loop: _ClientLoop) -> None:
+        loop = asyncio.get_running_loop()
+        context = client_loop.context
+        for state in client_loop.stages:
+            state.due = loop.time()
+        while not self._stopped:
+            now = loop.time()
+            try:
+                if now >= client_loop.next_poll:
+                    client_loop.next_poll = now + self._jittered(self.poll_interval)
+                    await self._sync(client_loop)
+                if now >= client_loop.next_disk_check:
+                    client_loop.next_disk_check = now + self.disk_check_interval
+                    if self._disk_pressure(context):
+                        self._fire(client_loop, DISK_PRESSURE, now)
+            except Exception as error:
+                logger.opt(exception=error).warning(f"Watch failed on client '{context.name}'")
+            deadline_at = self._deadline(client_loop, now)
+            for state in client_loop.stages:
+                if state.due <= now:
+                    self._start(client_loop, state, now)
+            wake_at = min(
+                client_loop.next_poll,
+                client_loop.next_disk_check,
+                deadline_at,
+                *(state.due for state in client_loop.stages),
+            )
+            client_loop.wake.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(client_loop.wake.wait(), max(0.0, wake_at - loop.time()))
+
+        tasks = [state.task for state in client_loop.stages if state.task is not None]
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run(self) -> None:
+        """Run the client loops until :meth:`stop` is called."""
+        self._stopped = False
+        self._loops = {
+            name: _ClientLoop(context, [_StageState(schedule) for schedule in self.schedules])
+            for name, context in self.engine.contexts.items()
+        }
+        await asyncio.gather(*(self._client_loop(loop) for loop in self._loops.values()))
@@ -0,0 +1,37 @@
+"""Disk space checking utilities."""
+import shutil
+from typing import Any, Mapping
+
+GIB = 1024**3
+
+
+def bytes_to_free(disk_control_method: Mapping[str, Any], total: int, free: int) -> int:
+    """Compute the number of bytes to free to meet a client disk control target.
+
+    :param disk_control_method: Client ``disk_control_method`` config.
+    :type disk_control_method: Mapping[str, Any]
+    :param total: Disk total size in bytes.
+    :type total: int
+    :param free: Disk free space in bytes.
+    :type free: int
+    :return: Bytes to free, 0 if the target is already met.
+    :rtype: int
+    """
+    max_percents = disk_control_method.get("max_percents")
+    if max_percents is not None:
+        used = total - free
+        return max(0, used - total * int(max_percents) // 100)
+    return max(0, int(disk_control_method["keep_free_gib"]) * GIB - free)
+
+
+def local_bytes_to_free(disk_control_method: Mapping[str, Any]) -> int:
+    """Compute the number of bytes to free on a local disk.
+
+    :param disk_control_method: Client ``disk_control_method`` config, with
+        ``path_to_check`` set.
+    :type disk_control_method: Mapping[str, Any]
+    :return: Bytes to free, 0 if the target is already met.
+    :rtype: int
+    """
+    usage = shutil.disk_usage(disk_control_method["path_to_check"])
+    return bytes_to_free(disk_control_method, usage.total, usage.free)
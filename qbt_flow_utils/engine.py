@@ -0,0 +1,128 @@
+"""Asyncio multi-client engine.
+
+Each configured client gets its own pooled keep-alive session and state
+store, and runs its pipeline (state sync then stages) concurrently with the
+other clients: a slow remote client no longer stalls the local one and a
+cycle lasts about as long as the slowest client.
+
+With ``settings.metrics_enabled``, the sync and every stage are timed per
+client, the metrics are served on ``settings.metrics_port`` and written to
+``settings.metrics_textfile`` after each cycle.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Sequence
+
+from aiohttp import web
+
+from qbt_flow_utils.logging import logger
+from qbt_flow_utils.metrics import STAGE_DURATION, TORRENTS_PROCESSED, registry
+from qbt_flow_utils.qbittorrent.client import QBittorrentClient
+from qbt_flow_utils.qbittorrent.sync import ClientStateStore
+from qbt_flow_utils.settings import settings
+
+
+@dataclass
+class ClientContext:
+    """Per client state shared by the pipeline stages."""
+
+    name: str
+    config: Mapping[str, Any]
+    client: QBittorrentClient
+    state: ClientStateStore = field(default_factory=ClientStateStore)
+
+
+Stage = Callable[[ClientContext], Awaitable[None]]
+
+
+@dataclass
+class ClientCycleResult:
+    """Outcome of one client pipeline run."""
+
+    duration: float
+    error: Optional[BaseException] = None
+
+
+class MultiClientEngine:
+    """Run stages pipelines on every client concurrently."""
+
+    def __init__(
+        self,
+        clients_config: Mapping[str, Mapping[str, Any]],
+        stages: Sequence[Stage],
+        max_in_flight: Optional[int] = None,
+    ) -> None:
+        """Initialize the engine.
+
+        :param clients_config: Clients config keyed by client name.
+        :type clients_config: Mapping[str, Mapping[str, Any]]
+        :param stages: Stages run in order on each client after the state sync.
+        :type stages: Sequence[Stage]
+        :param max_in_flight: Max concurrent requests per client, defaults to
+            ``settings.max_in_flight_requests``.
+        :type max_in_flight: Optional[int]
+        """
+        self.stages = list(stages)
+        self.contexts: Dict[str, ClientContext] = {
+            name: ClientContext(
+                name=name,
+                config=config,
+                client=QBittorrentClient.from_config(config, max_in_flight=max_in_flight),
+            )
+            for name, config in clients_config.items()
+        }
+        self._metrics_server: Optional[web.AppRunner] = None
+
+    async def __aenter__(self) -> "MultiClientEngine":
+        if registry.enabled and settings.metrics_port is not None:
+            self._metrics_server = await registry.serve(
+                settings.metrics_host,
+                settings.metrics_port,
+            )
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close every client session."""
+        await asyncio.gather(*(context.client.close() for context in self.contexts.values()))
+        if self._metrics_server is not None:
+            await self._metrics_server.cleanup()
+            self._metrics_server = None
+
+    async def _run_pipeline(self, context: ClientContext) -> ClientCycleResult:
+        start = time.perf_counter()
+        with logger.contextualize(client=context.name):
+            try:
+                with STAGE_DURATION.time(context.name, "sync"):
+                    await context.state.sync(context.client)
+                TORRENTS_PROCESSED.inc(context.name, amount=len(context.state.torrents))
+                for stage in self.stages:
+                    with STAGE_DURATION.time(context.name, getattr(stage, "__name__", "stage")):
+                        await stage(context)
+            except Exception as error:
+                logger.opt(exception=error).error(f"Cycle failed on client '{context.name}'")
+                return ClientCycleResult(time.perf_counter() - start, error)
+            duration = time.perf_counter() - start
+            logger.debug(f"Cycle done on client '{context.name}' in {duration:.2f}s")
+        return ClientCycleResult(duration)
+
+    async def run_cycle(self) -> Dict[str, ClientCycleResult]:
+        """Run one cycle on every client concurrently.
+
+        A failing client does not interrupt the others.
+
+        :return: Result of each client pipeline keyed by client name.
+        :rtype: Dict[str, ClientCycleResult]
+        """
+        results = await asyncio.gather(
+            *(self._run_pipeline(context) for context in self.contexts.values()),
+        )
+        if registry.enabled and settings.metrics_textfile:
+            try:
+                registry.write_textfile(settings.metrics_textfile)
+            except OSError as error:
+                logger.warning(f"Unable to write metrics to '{settings.metrics_textfile}': {error}")
+        return dict(zip(self.contexts, results))
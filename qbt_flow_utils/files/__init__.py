@@ -0,0 +1,23 @@
+"""Local files utilities for qbt_flow_utils."""
+from qbt_flow_utils.files.inodes import FileInode, InodeIndex, RefreshStats
+from qbt_flow_utils.files.media import MediaScanner, ScanStats
+from qbt_flow_utils.files.orphans import ExpectedPaths, client_roots, find_orphans
+from qbt_flow_utils.files.rclone import RcloneError, RemoteFile, RemoteIndex, UploadVerifier
+from qbt_flow_utils.files.recycle_bin import RecycleBin, RecycledTorrent
+
+__all__ = [
+    "FileInode",
+    "InodeIndex",
+    "RefreshStats",
+    "MediaScanner",
+    "ScanStats",
+    "ExpectedPaths",
+    "client_roots",
+    "find_orphans",
+    "RecycleBin",
+    "RecycledTorrent",
+    "RcloneError",
+    "RemoteFile",
+    "RemoteIndex",
+    "UploadVerifier",
+]
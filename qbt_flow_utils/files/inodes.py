@@ -0,0 +1,284 @@
+"""Persistent inode and hardlink index of the download and media folders.
+
+Directories are walked with ``os.scandir`` and their entries recorded with
+their mtime. On the next refresh every directory is still stat'ed, but only
+those whose mtime changed are listed and have their files stat'ed again, so
+an unchanged library costs one ``stat`` per directory instead of one per file.
+
+Hardlink checks are then dictionary lookups: a file is hardlinked into the
+media folder when its ``(st_dev, st_ino)`` is also known under that folder.
+
+An unchanged directory mtime only proves that its names did not change.
+Linking or unlinking a file from another directory changes its ``st_nlink``
+without touching the mtime of its directory, so the indexed ``nlink`` and
+``size`` may be stale: link counts are read with :func:`stat_inode` when they
+matter.
+"""
+import os
+import stat
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from qbt_flow_utils.logging import logger
+from qbt_flow_utils.metrics import record_cache_lookups
+from qbt_flow_utils.persist import dump_state, load_state
+from qbt_flow_utils.settings import settings
+
+INDEX_VERSION = 1
+# Directories modified less than this ago may change again within the same
+# mtime tick, they are listed again on the next refresh.
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+class FileInode(NamedTuple):
+    """Inode identity and link count of a file.
+
+    When indexed, ``nlink`` and ``size`` are those of the last listing of the
+    file directory.
+    """
+
+    dev: int
+    ino: int
+    nlink: int
+    size: int
+
+
+def stat_inode(path: str) -> Optional[FileInode]:
+    """Stat a regular file.
+
+    :param path: File path.
+    :type path: str
+    :return: Current file inode, None if missing or not a regular file.
+    :rtype: Optional[FileInode]
+    """
+    try:
+        st = os.stat(path, follow_symlinks=False)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return FileInode(st.st_dev, st.st_ino, st.st_nlink, st.st_size)
+
+
+class _DirEntry(NamedTuple):
+    mtime_ns: int
+    files: Dict[str, FileInode]
+    subdirs: List[str]
+
+
+@dataclass
+class RefreshStats:
+    """Directories listed or reused during a refresh."""
+
+    scanned_dirs: int = 0
+    reused_dirs: int = 0
+    files: int = 0
+
+
+class InodeIndex:
+    """Index of ``(st_dev, st_ino)`` to paths under a set of root folders."""
+
+    def __init__(self, roots: Sequence[str], index_file: Optional[str] = None) -> None:
+        """Initialize the index.
+
+        :param roots: Folders to index.
+        :type roots: Sequence[str]
+        :param index_file: File the index is persisted to, not persisted if None.
+        :type index_file: Optional[str]
+        """
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.index_file = index_file
+        self._dirs: Dict[str, _DirEntry] = {}
+        self._files: Dict[str, FileInode] = {}
+        self._inodes: Dict[Tuple[int, int], List[str]] = {}
+
+    @classmethod
+    def from_settings(cls) -> "InodeIndex":
+        """Build the index of ``download_folder`` and ``media_folder``.
+
+        :return: Loaded inode index.
+        :rtype: InodeIndex
+        """
+        index = cls(
+            [settings.download_folder, settings.media_folder],
+            os.path.join(settings.cache_folder, "inode_index.state"),
+        )
+        index.load()
+        return index
+
+    def load(self) -> None:
+        """Load the persisted index, if any and matching the current roots."""
+        if self.index_file is None:
+            return
+        state = load_state(self.index_file)
+        if (
+            not isinstance(state, dict)
+            or state.get("version") != INDEX_VERSION
+            or state.get("roots") != self.roots
+        ):
+            return
+        self._dirs = state["dirs"]
+        self._rebuild()
+
+    def save(self) -> None:
+        """Persist the index."""
+        if self.index_file is None:
+            return
+        dump_state(
+            self.index_file,
+            {"version": INDEX_VERSION, "roots": self.roots, "dirs": self._dirs},
+        )
+
+    def refresh(self) -> RefreshStats:
+        """Update the index from disk, listing only changed directories.
+
+        :return: Refresh statistics.
+        :rtype: RefreshStats
+        """
+        stats = RefreshStats()
+        racy_mtime_ns = time.time_ns() - _RACY_WINDOW_NS
+        dirs: Dict[str, _DirEntry] = {}
+        stack = list(reversed(self.roots))
+        while stack:
+            path = stack.pop()
+            if path in dirs:
+                continue
+            try:
+                mtime_ns = os.stat(path, follow_symlinks=False).st_mtime_ns
+            except OSError:
+                continue
+            cached = self._dirs.get(path)
+            if cached is not None and cached.mtime_ns == mtime_ns:
+                entry = cached
+                stats.reused_dirs += 1
+            else:
+                entry = self._scan_dir(path, mtime_ns if mtime_ns < racy_mtime_ns else -1)
+                stats.scanned_dirs += 1
+            dirs[path] = entry
+            stack.extend(os.path.join(path, name) for name in reversed(entry.subdirs))
+
+        self._dirs = dirs
+        self._rebuild()
+        stats.files = len(self._files)
+        record_cache_lookups("inode_index_dirs", stats.reused_dirs, stats.scanned_dirs)
+        logger.debug(
+            f"Inode index refreshed: {stats.scanned_dirs} dirs scanned,"
+            f" {stats.reused_dirs} reused, {stats.files} files",
+        )
+        return stats
+
+    @staticmethod
+    def _scan_dir(path: str, mtime_ns: int) -> _DirEntry:
+        files: Dict[str, FileInode] = {}
+        subdirs: List[str] = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                        elif entry.is_file(follow_symlinks=False):
+                            st = entry.stat(follow_symlinks=False)
+                            if stat.S_ISREG(st.st_mode):
+                                files[entry.name] = FileInode(
+                                    st.st_dev,
+                                    st.st_ino,
+                                    st.st_nlink,
+                                    st.st_size,
+                                )
+                    except OSError:
+                        continue
+        except OSError as error:
+            logger.warning(f"Unable to scan '{path}': {error}")
+        subdirs.sort()
+        return _DirEntry(mtime_ns, files, subdirs)
+
+    def _rebuild(self) -> None:
+        files: Dict[str, FileInode] = {}
+        inodes: Dict[Tuple[int, int], List[str]] = {}
+        for dir_path, entry in self._dirs.items():
+            for name, inode in entry.files.items():
+                path = os.path.join(dir_path, name)
+                files[path] = inode
+                inodes.setdefault((inode.dev, inode.ino), []).append(path)
+        self._files = files
+        self._inodes = inodes
+
+    def lookup(self, path: str) -> Optional[FileInode]:
+        """Return the indexed inode of a file.
+
+        :param path: File absolute path.
+        :type path: str
+        :return: File inode, None if not indexed.
+        :rtype: Optional[FileInode]
+        """
+        return self._files.get(path)
+
+    def files_under(self, path: str) -> Iterator[Tuple[str, FileInode]]:
+        """Iterate over the indexed files of a file or folder.
+
+        :param path: File or folder absolute path, e.g. a torrent content path.
+        :type path: str
+        :return: Iterator of file paths and inodes.
+        :rtype: Iterator[Tuple[str, FileInode]]
+        """
+        inode = self._files.get(path)
+        if inode is not None:
+            yield path, inode
+            return
+        stack = [path]
+        while stack:
+            dir_path = stack.pop()
+            entry = self._dirs.get(dir_path)
+            if entry is None:
+                continue
+            for name, inode in entry.files.items():
+                yield os.path.join(dir_path, name), inode
+            stack.extend(os.path.join(dir_path, name) for name in entry.subdirs)
+
+    def paths_of(self, inode: FileInode) -> List[str]:
+        """Return every indexed path sharing an inode.
+
+        :param inode: File inode.
+        :type inode: FileInode
+        :return: Indexed paths.
+        :rtype: List[str]
+        """
+        return self._inodes.get((inode.dev, inode.ino), [])
+
+    def is_hardlinked(self, path: str, into: Optional[str] = None) -> bool:
+        """Check if a file is hardlinked.
+
+        :param path: File absolute path.
+        :type path: str
+        :param into: Only count links located under this folder, e.g. the
+            media folder. Any link counts when None, read from the file
+            current ``st_nlink``.
+        :type into: Optional[str]
+        :return: True if the file has another link.
+        :rtype: bool
+        """
+        inode = self._files.get(path)
+        if inode is None:
+            return False
+        if into is None:
+            current = stat_inode(path)
+            return current is not None and current.nlink > 1
+        prefix = os.path.join(os.path.abspath(into), "")
+        return any(
+            other != path and other.startswith(prefix)
+            for other in self._inodes.get((inode.dev, inode.ino), ())
+        )
+
+    def any_hardlinked(self, paths: Iterable[str], into: Optional[str] = None) -> bool:
+        """Check if at least one file of a torrent is hardlinked.
+
+        :param paths: Torrent files absolute paths.
+        :type paths: Iterable[str]
+        :param into: Only count links located under this folder.
+        :type into: Optional[str]
+        :return: True if any file has another link.
+        :rtype: bool
+        """
+        return any(self.is_hardlinked(path, into) for path in paths)
@@ -0,0 +1,281 @@
+"""Incremental media folder hygiene scanner.
+
+Every file of the media folder should be a hardlink of a downloaded file,
+anything else uses disk space twice or outlived its torrent. The scanner
+keeps a persisted manifest of the media directories: mtime, entry count, a
+rolling digest of the entries and the files inodes.
+
+Directory mtimes do not propagate to parents, so every directory is still
+stat'ed, but a directory whose mtime is unchanged is neither listed nor are
+its files stat'ed again. Directories are visited level by level, each level
+in parallel on a thread pool, so a large library with a few changes costs
+about one ``stat`` per directory.
+
+With a download folder :class:`InodeIndex`, a file conforms when its inode is
+also indexed there; the index refresh sees removed downloads even though the
+media directories did not change. Without it, a file conforms when its
+``st_nlink > 1`` at the last listing of its directory. Files found non
+conforming from the manifest are stat'ed again before being reported, links
+created since the listing leave the directory mtime unchanged.
+"""
+import hashlib
+import itertools
+import os
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from qbt_flow_utils.files.inodes import _RACY_WINDOW_NS, FileInode, InodeIndex, stat_inode
+from qbt_flow_utils.logging import logger
+from qbt_flow_utils.metrics import record_cache_lookups
+from qbt_flow_utils.persist import dump_state, load_state
+from qbt_flow_utils.settings import settings
+
+MANIFEST_VERSION = 1
+
+
+class _DirRecord(NamedTuple):
+    mtime_ns: int
+    entry_count: int
+    digest: bytes
+    files: Dict[str, FileInode]
+    subdirs: List[str]
+
+
+@dataclass
+class ScanStats:
+    """Directories listed, reused or found changed during a scan."""
+
+    scanned_dirs: int = 0
+    reused_dirs: int = 0
+    changed_dirs: int = 0
+    files: int = 0
+    duration: float = 0.0
+
+
+def _scan_dir(path: str, mtime_ns: int) -> _DirRecord:
+    files: Dict[str, FileInode] = {}
+    subdirs: List[str] = []
+    entries: List[Tuple[str, int, int]] = []
+    try:
+        with os.scandir(path) as scan:
+            for entry in scan:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                        entries.append((entry.name, entry.inode(), 0))
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        if stat.S_ISREG(st.st_mode):
+                            files[entry.name] = FileInode(
+                                st.st_dev,
+                                st.st_ino,
+                                st.st_nlink,
+                                st.st_size,
+                            )
+                            entries.append((entry.name, st.st_ino, st.st_size))
+                except OSError:
+                    continue
+    except OSError as error:
+        logger.warning(f"Unable to scan '{path}': {error}")
+    entries.sort()
+    digest = hashlib.blake2b(digest_size=16)
+    for name, ino, size in entries:
+        digest.update(f"{name}\0{ino}\0{size}\n".encode(errors="surrogateescape"))
+    subdirs.sort()
+    return _DirRecord(mtime_ns, len(entries), digest.digest(), files, subdirs)
+
+
+class MediaScanner:
+    """Find media folder files that are not hardlinks."""
+
+    def __init__(
+        self,
+        media_folder: str,
+        manifest_file: Optional[str] = None,
+        link_index: Optional[InodeIndex] = None,
+        workers: int = 8,
+    ) -> None:
+        """Initialize the scanner.
+
+        :param media_folder: Media folder.
+        :type media_folder: str
+        :param manifest_file: File the manifest is persisted to, not persisted if None.
+        :type manifest_file: Optional[str]
+        :param link_index: Refreshed inode index of the download folder.
+        :type link_index: Optional[InodeIndex]
+        :param workers: Threads listing the changed directories.
+        :type workers: int
+        """
+        self.media_folder = os.path.abspath(media_folder)
+        self.manifest_file = manifest_file
+        self.link_index = link_index
+        self.workers = workers
+        self._dirs: Dict[str, _DirRecord] = {}
+
+    @classmethod
+    def from_settings(cls, link_index: Optional[InodeIndex] = None) -> "MediaScanner":
+        """Build the scanner of ``media_folder`` and load its manifest.
+
+        :param link_index: Refreshed inode index of the download folder.
+        :type link_index: Optional[InodeIndex]
+        :return: Loaded scanner.
+        :rtype: MediaScanner
+        """
+        scanner = cls(
+            settings.media_folder,
+            os.path.join(settings.cache_folder, "media_manifest.state"),
+            link_index,
+        )
+        scanner.load()
+        return scanner
+
+    def load(self) -> None:
+        """Load the persisted manifest, if any and of the same folder."""
+        if self.manifest_file is None:
+            return
+        state = load_state(self.manifest_file)
+        if (
+            isinstance(state, dict)
+            and state.get("version") == MANIFEST_VERSION
+            and state.get("root") == self.media_folder
+        ):
+            self._dirs = state["dirs"]
+
+    def save(self) -> None:
+        """Persist the manifest."""
+        if self.manifest_file is None:
+            return
+        dump_state(
+            self.manifest_file,
+            {"version": MANIFEST_VERSION, "root": self.media_folder, "dirs": self._dirs},
+        )
+
+    def _visit(self, path: str, racy_mtime_ns: int) -> Optional[Tuple[_DirRecord, bool]]:
+        try:
+            mtime_ns = os.stat(path, follow_symlinks=False).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._dirs.get(path)
+        if cached is not None and cached.mtime_ns == mtime_ns:
+            return cached, True
+        # Directories modified within the mtime granularity are listed again next time.
+        return _scan_dir(path, mtime_ns if mtime_ns < racy_mtime_ns else -1), False
+
+    def _visit_batch(
+        self,
+        paths: List[str],
+        racy_mtime_ns: int,
+    ) -> List[Tuple[str, Optional[Tuple[_DirRecord, bool]]]]:
+        return [(path, self._visit(path, racy_mtime_ns)) for path in paths]
+
+    def refresh(self) -> ScanStats:
+        """Update the manifest, listing only the changed directories.
+
+        :return: Scan statistics.
+        :rtype: ScanStats
+        """
+        start = time.perf_counter()
+        stats = ScanStats()
+        racy_mtime_ns = time.time_ns() - _RACY_WINDOW_NS
+        dirs: Dict[str, _DirRecord] = {}
+        level = [self.media_folder]
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="media-scan") as executor:
+            while level:
+                # One batch per worker, most directories are only stat'ed.
+                batches = [level[i :: self.workers] for i in range(min(self.workers, len(level)))]
+                results = executor.map(self._visit_batch, batches, [racy_mtime_ns] * len(batches))
+                next_level: List[str] = []
+                for path, result in itertools.chain.from_iterable(results):
+                    if result is None:
+                        continue
+                    record, reused = result
+                    if reused:
+                        stats.reused_dirs += 1
+                    else:
+                        stats.scanned_dirs += 1
+                        cached = self._dirs.get(path)
+                        if cached is None or cached.digest != record.digest:
+                            stats.changed_dirs += 1
+                    dirs[path] = record
+                    stats.files += len(record.files)
+                    next_level.extend(os.path.join(path, name) for name in record.subdirs)
+                level = next_level
+        self._dirs = dirs
+        stats.duration = time.perf_counter() - start
+        record_cache_lookups("media_manifest_dirs", stats.reused_dirs, stats.scanned_dirs)
+        logger.debug(
+            f"Media folder scanned in {stats.duration:.3f}s: {stats.scanned_dirs} dirs listed"
+            f" ({stats.changed_dirs} changed), {stats.reused_dirs} reused, {stats.files} files",
+        )
+        return stats
+
+    def files(self) -> Iterator[Tuple[str, FileInode]]:
+        """Iterate over the manifest files.
+
+        :return: Iterator of file paths and inodes.
+        :rtype: Iterator[Tuple[str, FileInode]]
+        """
+        for dir_path, record in self._dirs.items():
+            for name, inode in record.files.items():
+                yield os.path.join(dir_path, name), inode
+
+    def is_linked(self, inode: FileInode) -> bool:
+        """Check if a media file is a hardlink.
+
+        :param inode: File inode, from the manifest or stat'ed.
+        :type inode: FileInode
+        :return: With a link index, True if the inode is also indexed outside
+            the media folder. Else True if the inode has several links.
+        :rtype: bool
+        """
+        if self.link_index is not None:
+            prefix = os.path.join(self.media_folder, "")
+            return any(not other.startswith(prefix) for other in self.link_index.paths_of(inode))
+        return inode.nlink > 1
+
+    def violations(self) -> List[str]:
+        """Return the media files that are not hardlinks.
+
+        Files not linked according to the manifest are stat'ed again, and
+        skipped if missing or linked according to their current inode: with
+        a link index, indexed outside the media folder, else linked since.
+
+        :return: Sorted file paths.
+        :rtype: List[str]
+        """
+        is_linked = self.is_linked
+        violations = []
+        for path, inode in self.files():
+            if is_linked(inode):
+                continue
+            current = stat_inode(path)
+            if current is None or is_linked(current):
+                continue
+            violations.append(path)
+        return sorted(violations)
+
+    def clean(self, delete: Optional[bool] = None) -> List[str]:
+        """Flag, or delete, the media files that are not hardlinks.
+
+        :param delete: Delete the files, unless ``settings.dry_run``, defaults
+            to ``settings.media_hygiene_delete``.
+        :type delete: Optional[bool]
+        :return: Non conforming files.
+        :rtype: List[str]
+        """
+        delete = settings.media_hygiene_delete if delete is None else delete
+        violations = self.violations()
+        for path in violations:
+            if not delete or settings.dry_run:
+                logger.warning(f"Media file '{path}' is not a hardlink")
+                continue
+            try:
+                os.unlink(path)
+            except OSError as error:
+                logger.warning(f"Unable to delete media file '{path}': {error}")
+            else:
+                logger.info(f"Deleted media file '{path}', it was not a hardlink")
+        return violations
@@ -0,0 +1,248 @@
+"""Streaming orphaned files detector.
+
+Expected paths, built from every torrent files list, are kept as a sorted
+array of 64-bit path digests rather than strings. The download tree is walked
+with one worker per top-level directory, each directory listing being checked
+in a single vectorised lookup, and orphans are yielded as they are found
+without ever materialising the full files list.
+"""
+import hashlib
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from qbt_flow_utils.logging import logger
+
+# qBittorrent suffix of incomplete files.
+INCOMPLETE_SUFFIX = ".!qB"
+_DONE = object()
+
+
+def path_digest(path: str) -> int:
+    """Return the 64-bit digest of a normalised path.
+
+    :param path: File path.
+    :type path: str
+    :return: Path digest.
+    :rtype: int
+    """
+    return int.from_bytes(
+        hashlib.blake2b(os.path.normpath(path).encode(), digest_size=8).digest(),
+        "little",
+    )
+
+
+class ExpectedPaths:
+    """Compact set of the files expected on disk.
+
+    A digest collision can only hide an orphan, never report a torrent file
+    as orphaned.
+    """
+
+    def __init__(self) -> None:
+        self._pending: List[int] = []
+        self._digests: npt.NDArray[np.uint64] = np.zeros(0, dtype=np.uint64)
+
+    def __len__(self) -> int:
+        self.compact()
+        return len(self._digests)
+
+    def add(self, path: str) -> None:
+        """Add an expected file path.
+
+        :param path: File absolute path.
+        :type path: str
+        """
+        self._pending.append(path_digest(path))
+
+    def add_torrent(self, save_path: str, names: Iterable[str]) -> None:
+        """Add the files of a torrent.
+
+        :param save_path: Torrent save path.
+        :type save_path: str
+        :param names: Files names relative to the save path.
+        :type names: Iterable[str]
+        """
+        for name in names:
+            self.add(os.path.join(save_path, name))
+
+    def compact(self) -> None:
+        """Merge pending paths into the sorted digests array."""
+        if self._pending:
+            pending = np.array(self._pending, dtype=np.uint64)
+            self._digests = np.unique(np.concatenate([self._digests, pending]))
+            self._pending = []
+
+    def contains(self, paths: Sequence[str]) -> npt.NDArray[np.bool_]:
+        """Check a batch of paths.
+
+        :param paths: Files paths.
+        :type paths: Sequence[str]
+        :return: Per path boolean mask, True if expected.
+        :rtype: npt.NDArray[np.bool_]
+        """
+        self.compact()
+        digests = np.fromiter(
+            (path_digest(path) for path in paths),
+            dtype=np.uint64,
+            count=len(paths),
+        )
+        if not len(self._digests):
+            return np.zeros(len(paths), dtype=np.bool_)
+        positions = np.searchsorted(self._digests, digests)
+        positions[positions == len(self._digests)] = 0
+        return self._digests[positions] == digests  # type: ignore [no-any-return]
+
+
+def client_roots(client_config: Mapping[str, Any]) -> List[str]:
+    """Return the folders to inspect for a client.
+
+    The downloads path and every category save path, nested folders removed.
+
+    :param client_config: Client config.
+    :type client_config: Mapping[str, Any]
+    :return: Root folders.
+    :rtype: List[str]
+    """
+    paths = [client_config["path"]["downloads_path"]]
+    paths.extend((client_config.get("category") or {}).values())
+    roots: List[str] = []
+    for path in sorted({os.path.normpath(p) for p in paths}):
+        if not any(path.startswith(os.path.join(root, "")) for root in roots):
+            roots.append(path)
+    return roots
+
+
+def torrent_save_path(torrent: Mapping[str, Any], client_config: Mapping[str, Any]) -> str:
+    """Return the save path of a torrent.
+
+    Falls back to the category save path, then to the downloads path.
+
+    :param torrent: Torrent properties.
+    :type torrent: Mapping[str, Any]
+    :param client_config: Client config.
+    :type client_config: Mapping[str, Any]
+    :return: Save path.
+    :rtype: str
+    """
+    if torrent.get("save_path"):
+        return str(torrent["save_path"])
+    categories = client_config.get("category") or {}
+    category = torrent.get("category")
+    if category and category in categories:
+        return str(categories[category])
+    return str(client_config["path"]["downloads_path"])
+
+
+def _put(output: "queue.Queue[Any]", item: Any, stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            output.put(item, timeout=0.1)
+        except queue.Full:
+            continue
+        return
+
+
+def _list_dir(directory: str, excluded: Sequence[str]) -> Tuple[List[str], List[str]]:
+    subdirs: List[str] = []
+    files: List[str] = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path not in excluded:
+                        subdirs.append(entry.path)
+                else:
+                    files.append(entry.path)
+    except OSError as error:
+        logger.warning(f"Unable to scan '{directory}': {error}")
+    return subdirs, files
+
+
+def _walk_orphans(
+    top: str,
+    expected: ExpectedPaths,
+    excluded: Sequence[str],
+    output: "queue.Queue[Any]",
+    stop: threading.Event,
+) -> None:
+    stack = [top]
+    while stack and not stop.is_set():
+        subdirs, files = _list_dir(stack.pop(), excluded)
+        stack.extend(subdirs)
+        if not files:
+            continue
+        normalised = [
+            path[: -len(INCOMPLETE_SUFFIX)] if path.endswith(INCOMPLETE_SUFFIX) else path
+            for path in files
+        ]
+        known = expected.contains(normalised)
+        orphans = [path for path, is_known in zip(files, known) if not is_known]
+        if orphans:
+            _put(output, orphans, stop)
+
+
+def find_orphans(
+    roots: Iterable[str],
+    expected: ExpectedPaths,
+    excluded: Optional[Iterable[str]] = None,
+    max_workers: int = 8,
+    max_pending: int = 64,
+) -> Iterator[str]:
+    """Yield files under roots which are not expected.
+
+    :param roots: Folders to inspect.
+    :type roots: Iterable[str]
+    :param expected: Expected files.
+    :type expected: ExpectedPaths
+    :param excluded: Folders to skip, e.g. the recycle bin.
+    :type excluded: Optional[Iterable[str]]
+    :param max_workers: Number of walking threads.
+    :type max_workers: int
+    :param max_pending: Max number of directory batches buffered between
+        walkers and consumer, bounding memory.
+    :type max_pending: int
+    :return: Orphaned files paths, as they are found.
+    :rtype: Iterator[str]
+    """
+    excluded_paths = tuple(os.path.normpath(path) for path in excluded or ())
+    output: "queue.Queue[Any]" = queue.Queue(maxsize=max_pending)
+    tops: List[str] = []
+    root_files: List[str] = []
+    for root in roots:
+        subdirs, files = _list_dir(root, excluded_paths)
+        tops.extend(subdirs)
+        root_files.extend(files)
+
+    if root_files:
+        known = expected.contains(root_files)
+        yield from (path for path, is_known in zip(root_files, known) if not is_known)
+
+    stop = threading.Event()
+
+    def walk(top: str) -> None:
+        try:
+            _walk_orphans(top, expected, excluded_paths, output, stop)
+        finally:
+            _put(output, _DONE, stop)
+
+    expected.compact()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="orphans") as pool:
+        for top in tops:
+            pool.submit(walk, top)
+        remaining = len(tops)
+        try:
+            while remaining:
+                batch = output.get()
+                if batch is _DONE:
+                    remaining -= 1
+                else:
+                    yield from batch
+        finally:
+            # Unblock the walkers if the consumer stops early.
+            stop.set()
@@ -0,0 +1,314 @@
+"""Upload verification against an indexed rclone remote listing.
+
+Instead of checking candidates one file at a time against the remote, the
+remote is listed once per cycle with a recursive ``rclone lsjson`` (or only
+the directories of the candidates), indexed by path relative to the remote
+root, and every local file of a candidate is then checked by a dictionary
+lookup on its path relative to ``local_root``. When comparing hashes, local
+hashes are cached by file identity, size and mtime, so unchanged files are
+only read once.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+from qbt_flow_utils.logging import logger
+from qbt_flow_utils.metrics import record_cache_lookups
+
+# lsjson ModTime is RFC 3339 with up to nanoseconds, e.g. "2023-08-30T12:00:00.123456789Z".
+_MOD_TIME = re.compile(r"^(?P<base>[^.]+?)(?:\.(?P<frac>\d+))?(?P<tz>[Zz]|[+-]\d\d:\d\d)?$")
+
+
+# Local file identity: device, inode, size and mtime.
+_FileKey = Tuple[int, int, int, int]
+
+
+class RcloneError(Exception):
+    """rclone command error."""
+
+
+class RemoteFile(NamedTuple):
+    """A file of the remote listing."""
+
+    size: int
+    mod_time: float
+    hash: Optional[str]  # noqa: A003
+
+
+def parse_mod_time(value: str) -> float:
+    """Parse an rclone ``ModTime`` to a timestamp.
+
+    :param value: RFC 3339 time, with up to nanoseconds.
+    :type value: str
+    :return: POSIX timestamp.
+    :rtype: float
+    """
+    match = _MOD_TIME.match(value)
+    if match is None:
+        raise ValueError(f"Invalid rclone ModTime '{value}'")
+    tz = match["tz"] or ""
+    if tz in ("Z", "z"):
+        tz = "+00:00"
+    frac = (match["frac"] or "")[:6].ljust(6, "0")
+    return datetime.fromisoformat(f"{match['base']}.{frac}{tz}").timestamp()
+
+
+def _hash_key(name: str) -> str:
+    # lsjson names hashes "md5" or "MD5", "sha1" or "SHA-1" depending on versions.
+    return name.lower().replace("-", "")
+
+
+def file_hash(path: str, hash_type: str, chunk_size: int = 1 << 20) -> str:
+    """Hash a local file like rclone does.
+
+    :param path: File path.
+    :type path: str
+    :param hash_type: rclone hash name supported by hashlib, e.g. ``md5``.
+    :type hash_type: str
+    :param chunk_size: Read size.
+    :type chunk_size: int
+    :return: Hex digest.
+    :rtype: str
+    """
+    digest = hashlib.new(_hash_key(hash_type))
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RemoteIndex:
+    """Remote files keyed by path relative to the remote root."""
+
+    def __init__(self, hash_type: Optional[str] = None) -> None:
+        """Initialize the index.
+
+        :param hash_type: Hash kept from the listing, None to keep none.
+        :type hash_type: Optional[str]
+        """
+        self.hash_type = _hash_key(hash_type) if hash_type else None
+        self._files: Dict[str, RemoteFile] = {}
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def load(self, listing: Iterable[Mapping[str, Any]], prefix: str = "") -> None:
+        """Replace the files under ``prefix`` with an ``lsjson`` listing.
+
+        :param listing: Decoded ``rclone lsjson --recursive`` output of the
+            ``prefix`` directory.
+        :type listing: Iterable[Mapping[str, Any]]
+        :param prefix: Directory listed, relative to the remote root, empty
+            for the whole remote.
+        :type prefix: str
+        """
+        prefix = prefix.strip("/")
+        if prefix:
+            dir_prefix = prefix + "/"
+            self._files = {
+                path: file for path, file in self._files.items() if not path.startswith(dir_prefix)
+            }
+        else:
+            self._files = {}
+        for item in listing:
+            if item.get("IsDir"):
+                continue
+            hashes = item.get("Hashes") or {}
+            remote_hash = None
+            if self.hash_type is not None:
+                remote_hash = next(
+                    (value for name, value in hashes.items() if _hash_key(name) == self.hash_type),
+                    None,
+                )
+            path = f"{prefix}/{item['Path']}" if prefix else item["Path"]
+            self._files[path] = RemoteFile(
+                int(item.get("Size", -1)),
+                parse_mod_time(item["ModTime"]) if item.get("ModTime") else 0.0,
+                remote_hash,
+            )
+
+    def get(self, path: str) -> Optional[RemoteFile]:
+        """Return a remote file.
+
+        :param path: Path relative to the remote root.
+        :type path: str
+        :return: Remote file, None if not listed.
+        :rtype: Optional[RemoteFile]
+        """
+        return self._files.get(path)
+
+
+class UploadVerifier:
+    """Answer whether torrents are fully uploaded to an rclone remote."""
+
+    def __init__(self, rclone_config: Mapping[str, Any], index: Optional[RemoteIndex] = None):
+        """Initialize the verifier.
+
+        :param rclone_config: Rclone config.
+        :type rclone_config: Mapping[str, Any]
+        :param index: Remote index, a new empty one if not provided.
+        :type index: Optional[RemoteIndex]
+        """
+        self.remote: str = rclone_config["remote"]
+        self.local_root = os.path.normpath(rclone_config["local_root"])
+        self.rclone_binary: str = rclone_config.get("rclone_binary", "rclone")
+        self.rclone_config_file: Optional[str] = rclone_config.get("rclone_config_file")
+        self.compare: str = rclone_config.get("compare", "size")
+        self.hash_type: str = rclone_config.get("hash_type", "md5")
+        self.modtime_tolerance = float(rclone_config.get("modtime_tolerance", 1))
+        self.extra_flags: List[str] = list(rclone_config.get("extra_flags") or [])
+        self.index = index or RemoteIndex(self.hash_type if self.compare == "hash" else None)
+        self.listings = 0
+        self._hashes: Dict[_FileKey, str] = {}
+        # Hashes used by the running verify(), the only ones kept after it.
+        self._used_hashes: Optional[Dict[_FileKey, str]] = None
+        self._hash_lookups = [0, 0]
+
+    def _remote_path(self, relative_dir: str) -> str:
+        if not relative_dir:
+            return self.remote
+        separator = "" if self.remote.endswith((":", "/")) else "/"
+        return f"{self.remote}{separator}{relative_dir}"
+
+    async def lsjson(self, relative_dir: str = "") -> List[Dict[str, Any]]:
+        """List a remote directory recursively.
+
+        :param relative_dir: Directory relative to the remote root.
+        :type relative_dir: str
+        :return: Decoded ``rclone lsjson`` output, paths relative to the directory.
+        :rtype: List[Dict[str, Any]]
+        :raises RcloneError: If rclone fails.
+        """
+        args = [self.rclone_binary, "lsjson", "--recursive", "--files-only", "--no-mimetype"]
+        if self.compare == "hash":
+            args += ["--hash", "--hash-type", self.hash_type]
+        if self.compare == "size":
+            args.append("--no-modtime")
+        if self.rclone_config_file:
+            args += ["--config", self.rclone_config_file]
+        args += [*self.extra_flags, self._remote_path(relative_dir)]
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await process.communicate()
+        self.listings += 1
+        if process.returncode == 3 and relative_dir:
+            # Directory not found: nothing of it is uploaded yet.
+            return []
+        if process.returncode != 0:
+            raise RcloneError(
+                f"rclone lsjson {self._remote_path(relative_dir)} failed"
+                f" ({process.returncode}): {stderr.decode(errors='replace').strip()}",
+            )
+        listing: List[Dict[str, Any]] = json.loads(stdout)
+        return listing
+
+    def relative_path(self, local_path: str) -> Optional[str]:
+        """Return a local path relative to ``local_root``, None if outside."""
+        relative = os.path.relpath(os.path.normpath(local_path), self.local_root)
+        if relative == os.curdir or relative.startswith(os.pardir):
+            return None
+        return relative.replace(os.sep, "/")
+
+    async def refresh(self, local_paths: Optional[Iterable[str]] = None) -> None:
+        """Refresh the remote index, once per cycle.
+
+        :param local_paths: Candidates content paths. Only their top level
+            directories under ``local_root`` are listed, the whole remote is
+            listed if None.
+        :type local_paths: Optional[Iterable[str]]
+        """
+        if local_paths is None:
+            self.index.load(await self.lsjson())
+            logger.debug(f"Listed {len(self.index)} files on {self.remote}")
+            return
+        dirs = set()
+        for local_path in local_paths:
+            relative = self.relative_path(local_path)
+            if relative is not None:
+                top, _, rest = relative.partition("/")
+                # A file at the root is listed with its parent, the root.
+                dirs.add("" if not rest and os.path.isfile(local_path) else top)
+        if "" in dirs:
+            self.index.load(await self.lsjson())
+            return
+        for relative_dir in sorted(dirs):
+            self.index.load(await self.lsjson(relative_dir), relative_dir)
+        logger.debug(f"Listed {len(dirs)} directories on {self.remote}")
+
+    def _local_files(self, local_path: str) -> Iterator[Tuple[str, os.stat_result]]:
+        if os.path.isfile(local_path):
+            yield local_path, os.stat(local_path)
+            return
+        for dir_path, _, names in os.walk(local_path):
+            for name in names:
+                path = os.path.join(dir_path, name)
+                yield path, os.stat(path)
+
+    def _local_hash(self, path: str, stat: os.stat_result) -> str:
+        key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        local_hash = self._hashes.get(key)
+        if local_hash is None:
+            self._hash_lookups[1] += 1
+            local_hash = self._hashes[key] = file_hash(path, self.hash_type)
+        else:
+            self._hash_lookups[0] += 1
+        if self._used_hashes is not None:
+            self._used_hashes[key] = local_hash
+        return local_hash
+
+    def _matches(self, path: str, stat: os.stat_result, remote: RemoteFile) -> bool:
+        if remote.size != stat.st_size:
+            return False
+        if self.compare == "modtime":
+            return abs(remote.mod_time - stat.st_mtime) <= self.modtime_tolerance
+        if self.compare == "hash":
+            # Remotes without this hash can not be verified.
+            return remote.hash is not None and remote.hash == self._local_hash(path, stat)
+        return True
+
+    def is_uploaded(self, local_path: str) -> bool:
+        """Check that every file of a torrent content is on the remote.
+
+        :param local_path: Torrent content path, a file or a folder under
+            ``local_root``.
+        :type local_path: str
+        :return: True if every file is listed and matches, False if any is
+            missing, differs, or the content is empty or outside ``local_root``.
+        :rtype: bool
+        """
+        found = False
+        try:
+            for path, stat in self._local_files(local_path):
+                relative = self.relative_path(path)
+                remote = self.index.get(relative) if relative is not None else None
+                if remote is None or not self._matches(path, stat, remote):
+                    return False
+                found = True
+        except OSError as error:
+            logger.warning(f"Unable to verify upload of '{local_path}': {error}")
+            return False
+        return found
+
+    def verify(self, local_paths: Iterable[str]) -> Dict[str, bool]:
+        """Check many torrent contents against the refreshed index.
+
+        :param local_paths: Torrents content paths.
+        :type local_paths: Iterable[str]
+        :return: Upload status keyed by content path.
+        :rtype: Dict[str, bool]
+        """
+        self._used_hashes, self._hash_lookups = {}, [0, 0]
+        try:
+            return {local_path: self.is_uploaded(local_path) for local_path in local_paths}
+        finally:
+            # Hashes of files no longer verified, e.g. removed torrents, are dropped.
+            self._hashes, self._used_hashes = self._used_hashes, None
+            if self.compare == "hash":
+                record_cache_lookups("rclone_hashes", *self._hash_lookups)
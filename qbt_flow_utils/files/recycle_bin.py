@@ -0,0 +1,374 @@
+"""Recycle bin of removed torrents data.
+
+Torrent contents are moved into ``<recycle_bin>/<hash>/`` with ``os.rename``,
+or hardlinked when the source is left for qBittorrent to delete, so
+recycling a torrent costs no copy on the same filesystem. Contents are only
+copied, by chunks, when the bin is on another device.
+
+A manifest of the recycled torrents (original paths, size, deletion time)
+is persisted in the bin, so restores, size accounting and purges never walk
+the bin. The purger evicts the oldest torrents first, to enforce the size
+and age caps of the bin and to leave the client disk target to the bin
+before any seeding torrent is removed. Files still hardlinked outside the
+bin, e.g. imported in a media library, count in the bin size but not in the
+bytes freed by evicting them.
+"""
+import asyncio
+import errno
+import os
+import shutil
+import stat
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from qbt_flow_utils.disk import GIB, local_bytes_to_free
+from qbt_flow_utils.logging import logger
+from qbt_flow_utils.persist import dump_state, load_state
+
+MANIFEST_FILE = ".manifest.state"
+MANIFEST_VERSION = 1
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class RecycledTorrent(NamedTuple):
+    """Manifest entry of a recycled torrent."""
+
+    paths: Tuple[str, ...]
+    size: int
+    deleted_at: float
+    # Bytes freed by evicting the torrent, None for entries recycled before
+    # it was recorded.
+    reclaimable: Optional[int] = None
+
+
+def _tree_size(path: str, max_links: int) -> Tuple[int, int]:
+    """Return the size of a file or folder, and the size of its files with
+    at most ``max_links`` links, freed once it is deleted.
+    """
+    st = os.stat(path, follow_symlinks=False)
+    if not stat.S_ISDIR(st.st_mode):
+        return st.st_size, st.st_size if st.st_nlink <= max_links else 0
+    size = reclaimable = 0
+    for dir_path, _, names in os.walk(path):
+        for name in names:
+            st = os.stat(os.path.join(dir_path, name), follow_symlinks=False)
+            size += st.st_size
+            if st.st_nlink <= max_links:
+                reclaimable += st.st_size
+    return size, reclaimable
+
+
+def _remove(path: str) -> None:
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.lexists(path):
+        os.unlink(path)
+
+
+def _copy_file(src: str, dst: str) -> None:
+    with open(src, "rb") as source, open(dst, "wb") as target:
+        shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+    shutil.copystat(src, dst)
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise
+        _copy_file(src, dst)
+
+
+def _transfer(src: str, dst: str, keep_source: bool) -> None:
+    """Move, or hardlink if ``keep_source``, a file or folder, copying across devices."""
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if not keep_source:
+        try:
+            os.rename(src, dst)
+        except OSError as error:
+            if error.errno != errno.EXDEV:
+                raise
+        else:
+            return
+    if os.path.isdir(src) and not os.path.islink(src):
+        shutil.copytree(src, dst, copy_function=_link_or_copy)
+        if not keep_source:
+            shutil.rmtree(src)
+    else:
+        _link_or_copy(src, dst)
+        if not keep_source:
+            os.unlink(src)
+
+
+class RecycleBin:
+    """Recycle bin with a persisted manifest and bounded size and age."""
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: Optional[int] = None,
+        max_age: Optional[float] = None,
+        disk_control_method: Optional[Mapping[str, Any]] = None,
+    ) -> None:
+        """Initialize the recycle bin.
+
+        :param path: Recycle bin folder.
+        :type path: str
+        :param max_bytes: Max size of the recycled contents, unbounded if None.
+        :type max_bytes: Optional[int]
+        :param max_age: Max seconds a torrent stays in the bin, unbounded if None.
+        :type max_age: Optional[float]
+        :param disk_control_method: Client ``disk_control_method`` config, the
+            purger also evicts torrents to meet its target if ``path_to_check``
+            is set.
+        :type disk_control_method: Optional[Mapping[str, Any]]
+        """
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.disk_control_method = disk_control_method
+        self.manifest_file = os.path.join(self.path, MANIFEST_FILE)
+        # Ordered by deletion time, oldest first.
+        self._entries: Dict[str, RecycledTorrent] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, client_config: Mapping[str, Any]) -> "RecycleBin":
+        """Build and load the recycle bin of a client.
+
+        :param client_config: Client config.
+        :type client_config: Mapping[str, Any]
+        :return: Loaded recycle bin.
+        :rtype: RecycleBin
+        """
+        path_config = client_config["path"]
+        max_gib = path_config.get("recycle_bin_max_gib")
+        max_days = path_config.get("recycle_bin_max_days")
+        recycle_bin = cls(
+            path_config["recycle_bin"],
+            max_bytes=max_gib * GIB if max_gib is not None else None,
+            max_age=max_days * 86400 if max_days is not None else None,
+            disk_control_method=client_config.get("disk_control_method"),
+        )
+        recycle_bin.load()
+        return recycle_bin
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, torrent_hash: object) -> bool:
+        return torrent_hash in self._entries
+
+    @property
+    def size(self) -> int:
+        """Size of the recycled contents, from the manifest."""
+        return self._size
+
+    def get(self, torrent_hash: str) -> Optional[RecycledTorrent]:
+        """Return the manifest entry of a recycled torrent.
+
+        :param torrent_hash: Torrent hash.
+        :type torrent_hash: str
+        :return: Manifest entry, None if not recycled.
+        :rtype: Optional[RecycledTorrent]
+        """
+        return self._entries.get(torrent_hash)
+
+    def load(self) -> None:
+        """Load the persisted manifest, if any."""
+        state = load_state(self.manifest_file)
+        if not isinstance(state, dict) or state.get("version") != MANIFEST_VERSION:
+            return
+        entries: Dict[str, RecycledTorrent] = {
+            torrent_hash: (
+                entry if entry.reclaimable is not None else entry._replace(reclaimable=entry.size)
+            )
+            for torrent_hash, entry in state["entries"].items()
+        }
+        with self._lock:
+            self._entries = dict(sorted(entries.items(), key=lambda item: item[1].deleted_at))
+            self._size = sum(entry.size for entry in self._entries.values())
+
+    def save(self) -> None:
+        """Persist the manifest."""
+        with self._lock:
+            entries = dict(self._entries)
+        dump_state(self.manifest_file, {"version": MANIFEST_VERSION, "entries": entries})
+
+    def _item_path(self, torrent_hash: str, position: int, original: str) -> str:
+        return os.path.join(self.path, torrent_hash, str(position), os.path.basename(original))
+
+    def recycle(
+        self,
+        torrent_hash: str,
+        paths: Iterable[str],
+        keep_source: bool = False,
+        now: Optional[float] = None,
+    ) -> RecycledTorrent:
+        """Move a torrent contents into the bin.
+
+        :param torrent_hash: Torrent hash.
+        :type torrent_hash: str
+        :param paths: Torrent files or folders, usually its content path and
+            its ``.torrent`` file.
+        :type paths: Iterable[str]
+        :param keep_source: Hardlink the contents instead of moving them, e.g.
+            when qBittorrent deletes the torrent files itself.
+        :type keep_source: bool
+        :param now: Deletion time, defaults to the current time.
+        :type now: Optional[float]
+        :return: Manifest entry.
+        :rtype: RecycledTorrent
+        :raises OSError: If a path can not be recycled, the paths recycled
+            before it are recorded in the bin.
+        """
+        if torrent_hash in self._entries:
+            # Recycled again, e.g. re-added then removed: keep the latest.
+            self._evict([torrent_hash])
+        originals = tuple(os.path.abspath(path) for path in paths)
+        deleted_at = time.time() if now is None else now
+        # The kept source is deleted by qBittorrent, its link does not count.
+        max_links = 2 if keep_source else 1
+        size = reclaimable = recycled = 0
+        try:
+            for position, original in enumerate(originals):
+                item_path = self._item_path(torrent_hash, position, original)
+                try:
+                    _transfer(original, item_path, keep_source)
+                except OSError:
+                    if os.path.lexists(original):
+                        # Still at its source, drop the partial copy.
+                        _remove(item_path)
+                    elif os.path.lexists(item_path):
+                        recycled += 1
+                    raise
+                recycled += 1
+                item_size, item_reclaimable = _tree_size(item_path, max_links)
+                size += item_size
+                reclaimable += item_reclaimable
+        except OSError:
+            # Paths already in the bin are recorded, so they are still counted,
+            # purged and restorable.
+            if recycled:
+                self._add(
+                    torrent_hash,
+                    RecycledTorrent(originals[:recycled], size, deleted_at, reclaimable),
+                )
+            else:
+                shutil.rmtree(os.path.join(self.path, torrent_hash), ignore_errors=True)
+            raise
+        return self._add(torrent_hash, RecycledTorrent(originals, size, deleted_at, reclaimable))
+
+    def _add(self, torrent_hash: str, entry: RecycledTorrent) -> RecycledTorrent:
+        with self._lock:
+            self._entries[torrent_hash] = entry
+            self._size += entry.size
+        self.save()
+        logger.bind(hash=torrent_hash).debug(f"Recycled {entry.size} bytes to '{self.path}'")
+        return entry
+
+    def restore(self, torrent_hash: str) -> bool:
+        """Move a recycled torrent contents back to their original paths.
+
+        :param torrent_hash: Torrent hash.
+        :type torrent_hash: str
+        :return: False if the torrent is not in the bin.
+        :rtype: bool
+        :raises FileExistsError: If an original path exists again.
+        """
+        entry = self._entries.get(torrent_hash)
+        if entry is None:
+            return False
+        for original in entry.paths:
+            if os.path.lexists(original):
+                raise FileExistsError(f"Unable to restore '{original}': path exists")
+        for position, original in enumerate(entry.paths):
+            _transfer(self._item_path(torrent_hash, position, original), original, False)
+        with self._lock:
+            del self._entries[torrent_hash]
+            self._size -= entry.size
+        shutil.rmtree(os.path.join(self.path, torrent_hash), ignore_errors=True)
+        self.save()
+        return True
+
+    def _evict(self, hashes: List[str]) -> int:
+        freed = 0
+        with self._lock:
+            for torrent_hash in hashes:
+                entry = self._entries.pop(torrent_hash)
+                self._size -= entry.size
+                freed += entry.reclaimable or 0
+        for torrent_hash in hashes:
+            try:
+                shutil.rmtree(os.path.join(self.path, torrent_hash))
+            except FileNotFoundError:
+                pass
+            except OSError as error:
+                logger.bind(hash=torrent_hash).warning(
+                    f"Unable to purge '{torrent_hash}' from '{self.path}': {error}",
+                )
+        return freed
+
+    def purge(self, bytes_to_free: int = 0, now: Optional[float] = None) -> int:
+        """Evict the oldest torrents over the size and age caps.
+
+        :param bytes_to_free: Also evict until this many bytes are freed,
+            e.g. to meet the client disk target, hardlinked files excluded.
+        :type bytes_to_free: int
+        :param now: Current time, defaults to the current time.
+        :type now: Optional[float]
+        :return: Bytes freed.
+        :rtype: int
+        """
+        now = time.time() if now is None else now
+        victims: List[str] = []
+        with self._lock:
+            size, selected = self._size, 0
+            for torrent_hash, entry in self._entries.items():
+                if not (
+                    (self.max_bytes is not None and size > self.max_bytes)
+                    or (self.max_age is not None and now - entry.deleted_at > self.max_age)
+                    or selected < bytes_to_free
+                ):
+                    # Entries are oldest first, the next ones are kept too.
+                    break
+                victims.append(torrent_hash)
+                size -= entry.size
+                selected += entry.reclaimable or 0
+        if not victims:
+            return 0
+        freed = self._evict(victims)
+        self.save()
+        logger.info(f"Purged {len(victims)} torrents ({freed} bytes) from '{self.path}'")
+        return freed
+
+    def bytes_to_free(self) -> int:
+        """Bytes to free to meet the client disk target, 0 without local check."""
+        if not self.disk_control_method or not self.disk_control_method.get("path_to_check"):
+            return 0
+        try:
+            return local_bytes_to_free(self.disk_control_method)
+        except OSError as error:
+            logger.warning(f"Unable to check disk usage: {error}")
+            return 0
+
+    async def run_purger(self, interval: float) -> None:
+        """Purge the bin every ``interval`` seconds, until cancelled.
+
+        Purges run in the default executor, so deleting large contents does
+        not block the event loop.
+
+        :param interval: Seconds between purges.
+        :type interval: float
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                bytes_to_free = await loop.run_in_executor(None, self.bytes_to_free)
+                await loop.run_in_executor(None, self.purge, bytes_to_free)
+            except Exception as error:
+                logger.opt(exception=error).error(f"Recycle bin purge failed on '{self.path}'")
+            await asyncio.sleep(interval)
@@ -1,12 +1,32 @@
-"""Logging utilities for qbt_flow_utils."""
+"""Logging utilities for qbt_flow_utils.
+
+By default the stdout sink is a :class:`BatchedWriter`: callers only format
+the message and append it to a buffer, written by batches from a background
+thread. With ``settings.log_json`` each message is a JSON
+line carrying the bound fields, e.g. ``logger.bind(hash=torrent_hash)``.
+
+Messages bound to a torrent ``hash`` are rate limited per call site, so a
+per-torrent message can not flood the output on large clients.
+"""
+import json
 import logging
 import sys
-from typing import Union
+import threading
+import time
+import traceback
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, TextIO, Tuple, Union
 
 from loguru import logger
 
+from qbt_flow_utils import metrics
 from qbt_flow_utils.settings import settings
 
+if TYPE_CHECKING:  # pragma: no cover
+    from loguru import Record
+
+# Bound fields promoted to the top level of JSON messages.
+STRUCTURED_FIELDS = ("client", "tracker_tag", "hash")
+
 
 class InterceptHandler(logging.Handler):
     """Intercept loguru messages and pass
@@ -32,16 +52,164 @@ class InterceptHandler(logging.Handler):
         )
 
 
+class BatchedWriter:
+    """Non-blocking text stream wrapper writing messages by batches.
+
+    Callers only append to a buffer. A background thread writes it once
+    ``max_bytes`` are buffered, or at most ``max_delay`` seconds after. If
+    the stream can not keep up, callers write themselves past
+    ``BACKPRESSURE_FACTOR * max_bytes``.
+    """
+
+    BACKPRESSURE_FACTOR = 16
+
+    def __init__(self, stream: TextIO, max_bytes: int = 64 * 1024, max_delay: float = 0.5) -> None:
+        """Initialize the writer.
+
+        :param stream: Wrapped stream.
+        :type stream: TextIO
+        :param max_bytes: Buffered size triggering a write.
+        :type max_bytes: int
+        :param max_delay: Max seconds a message stays buffered.
+        :type max_delay: float
+        """
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self._buffer: List[str] = []
+        self._size = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self, message: str) -> None:
+        """Buffer a message."""
+        with self._lock:
+            self._buffer.append(message)
+            self._size += len(message)
+            size = self._size
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        if size >= self.max_bytes * self.BACKPRESSURE_FACTOR:
+            self._write()
+        elif size >= self.max_bytes:
+            self._wake.set()
+
+    def _write(self) -> None:
+        with self._write_lock:
+            with self._lock:
+                buffer, self._buffer, self._size = self._buffer, [], 0
+            if buffer:
+                self.stream.write("".join(buffer))
+                self.stream.flush()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wake.wait(self.max_delay)
+            self._wake.clear()
+            self._write()
+
+    def stop(self) -> None:
+        """Write the buffered messages and stop the background thread.
+
+        Called by loguru when the sink is removed, and at exit.
+        """
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._write()
+
+
+class RateLimitFilter:
+    """Let at most ``limit`` torrent messages per call site every ``window`` seconds.
+
+    Only messages bound to a ``hash`` are limited. The first message let
+    through after suppressions reports how many were suppressed.
+    """
+
+    def __init__(self, limit: int, window: float) -> None:
+        """Initialize the filter.
+
+        :param limit: Messages per call site and window, 0 for no limit.
+        :type limit: int
+        :param window: Window duration in seconds.
+        :type window: float
+        """
+        self.limit = limit
+        self.window = window
+        # Call site: (window start, messages let through, suppressed).
+        self._sites: Dict[Tuple[Optional[str], int], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record: "Record") -> bool:
+        """Return whether the record is let through."""
+        if not self.limit or "hash" not in record["extra"]:
+            return True
+        key = (record["name"], record["line"])
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                site = self._sites[key] = [now, 0, site[2] if site is not None else 0]
+            if site[1] >= self.limit:
+                site[2] += 1
+                return False
+            site[1] += 1
+            suppressed, site[2] = int(site[2]), 0
+        if suppressed:
+            record["message"] += f" ({suppressed} similar messages suppressed)"
+        return True
+
+
+def json_format(record: "Record") -> str:
+    """Loguru format function rendering a record as a JSON line."""
+    extra = dict(record["extra"])
+    extra.pop("json", None)
+    data: Dict[str, Any] = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+    }
+    for field in STRUCTURED_FIELDS:
+        if field in extra:
+            data[field] = extra.pop(field)
+    if extra:
+        data["extra"] = extra
+    exception = record["exception"]
+    if exception is not None:
+        data["exception"] = "".join(
+            traceback.format_exception(exception.type, exception.value, exception.traceback),
+        )
+    record["extra"]["json"] = json.dumps(data, default=str)
+    return "{extra[json]}\n"
+
+
 def configure_logging() -> None:  # pragma: no cover
     """Configures logging."""
-    intercept_handler = InterceptHandler()
+    level = logging.getLevelName(settings.log_level.value)
+    # Libraries log through the standard module: below the root level no
+    # record is created, below the handler level the frame walk is skipped.
+    libraries_level = logging.getLevelName(settings.log_libraries_level.value)
+    intercept_handler = InterceptHandler(level)
 
-    logging.basicConfig(handlers=[intercept_handler], level=logging.NOTSET)
+    logging.basicConfig(handlers=[intercept_handler], level=max(level, libraries_level), force=True)
 
     # set logs output, level and format
+    options: Dict[str, Any] = {"format": json_format} if settings.log_json else {}
     logger.remove()
     logger.add(
-        sys.stdout,
-        colorize=True,
+        BatchedWriter(sys.stdout) if settings.log_enqueue else sys.stdout,
+        colorize=not settings.log_json,
         level=settings.log_level.value,
+        filter=RateLimitFilter(settings.log_rate_limit, settings.log_rate_window),
+        **options,
     )
+    if settings.metrics_enabled:
+        logger.add(metrics.log_sink, level=settings.log_level.value)
@@ -0,0 +1,395 @@
+"""In-process metrics with OpenMetrics text export.
+
+Counters and histograms are kept in memory by a :class:`MetricsRegistry` and
+rendered in the OpenMetrics text format, served on a local ``/metrics``
+endpoint and/or written to a node_exporter textfile collector file.
+
+Metrics are enabled by ``settings.metrics_enabled``. When disabled, updating
+a metric is a single attribute check.
+"""
+import bisect
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from qbt_flow_utils.settings import settings
+
+if TYPE_CHECKING:  # pragma: no cover
+    from aiohttp import web
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Seconds, from a fast API call to a slow removal stage.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Bytes, from 1 MiB to 4 TiB by powers of 4.
+BYTES_BUCKETS = tuple(float(4**power * 2**20) for power in range(12))
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = "unknown"
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _labels(self, labels: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+        if extra is not None:
+            pairs.append(f'{extra[0]}="{extra[1]}"')
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic counter, rendered with the ``_total`` suffix."""
+
+    type_name = "counter"
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        super().__init__(registry, name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """Increment the counter of the given label values.
+
+        :param labels: Label values, in ``labelnames`` order.
+        :type labels: str
+        :param amount: Non negative increment.
+        :type amount: float
+        """
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        """Return the counter of the given label values."""
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}_total{self._labels(labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values = {}
+
+
+class Histogram(_Metric):
+    """Histogram with cumulative buckets, a sum and a count."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: per bucket counts (last one is +Inf), then sum.
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record an observation.
+
+        :param value: Observed value.
+        :type value: float
+        :param labels: Label values, in ``labelnames`` order.
+        :type labels: str
+        """
+        if not self.registry.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        """Observe the duration in seconds of the block."""
+        if not self.registry.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels: str) -> int:
+        """Return the observations count of the given label values."""
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry is not None else 0
+
+    def sum(self, *labels: str) -> float:  # noqa: A003
+        """Return the observations sum of the given label values."""
+        entry = self._values.get(labels)
+        return entry[1][0] if entry is not None else 0.0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((labels, (list(c), s[0])) for labels, (c, s) in self._values.items())
+        lines = []
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = self._labels(labels, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {cumulative}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values = {}
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self, enabled: bool = False) -> None:
+        """Initialize the registry.
+
+        :param enabled: Whether metrics updates are recorded.
+        :type enabled: bool
+        """
+        self.enabled = enabled
+        self.metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> Any:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Create and register a counter.
+
+        :param name: Metric name, without the ``_total`` suffix.
+        :type name: str
+        :param documentation: Help text.
+        :type documentation: str
+        :param labelnames: Label names.
+        :type labelnames: Sequence[str]
+        :return: Counter.
+        :rtype: Counter
+        :raises ValueError: If the name is already registered.
+        """
+        counter: Counter = self._register(Counter(self, name, documentation, labelnames))
+        return counter
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Create and register a histogram.
+
+        :param name: Metric name.
+        :type name: str
+        :param documentation: Help text.
+        :type documentation: str
+        :param labelnames: Label names.
+        :type labelnames: Sequence[str]
+        :param buckets: Buckets upper bounds, ``+Inf`` is implicit.
+        :type buckets: Sequence[float]
+        :return: Histogram.
+        :rtype: Histogram
+        :raises ValueError: If the name is already registered.
+        """
+        histogram: Histogram = self._register(
+            Histogram(self, name, documentation, labelnames, buckets),
+        )
+        return histogram
+
+    def clear(self) -> None:
+        """Reset every metric."""
+        for metric in self.metrics.values():
+            metric.clear()
+
+    def render(self) -> str:
+        """Render every metric in the OpenMetrics text format.
+
+        :return: Exposition text, ending with ``# EOF``.
+        :rtype: str
+        """
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.extend(metric.samples())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        """Atomically write the metrics for the node_exporter textfile collector.
+
+        :param path: Output file, usually ``<collector dir>/qbt_flow_utils.prom``.
+        :type path: str
+        """
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".prom")
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(self.render())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    async def _handle_metrics(self, request: "web.Request") -> "web.Response":
+        from aiohttp import web
+
+        response = web.Response(text=self.render())
+        response.headers["Content-Type"] = CONTENT_TYPE
+        return response
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9891) -> "web.AppRunner":
+        """Serve ``GET /metrics`` until the returned runner is cleaned up.
+
+        :param host: Listen address, local only by default.
+        :type host: str
+        :param port: Listen port, 0 for a free one.
+        :type port: int
+        :return: Started runner, ``await runner.cleanup()`` stops it.
+        :rtype: web.AppRunner
+        """
+        # aiohttp.web is slow to import, only the daemon serves metrics.
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+registry = MetricsRegistry(enabled=settings.metrics_enabled)
+
+STAGE_DURATION = registry.histogram(
+    "qfu_stage_duration_seconds",
+    "Duration of the pipeline stages.",
+    ("client", "stage"),
+)
+STAGE_RUNS = registry.counter(
+    "qfu_stage_runs",
+    "Daemon stage runs, skipped when the previous run is still in flight.",
+    ("client", "stage", "result"),
+)
+API_CALLS = registry.counter(
+    "qfu_api_calls",
+    "qBittorrent WebUI API calls.",
+    ("endpoint", "status"),
+)
+API_LATENCY = registry.histogram(
+    "qfu_api_latency_seconds",
+    "qBittorrent WebUI API calls latency.",
+    ("endpoint",),
+)
+API_RECEIVED_BYTES = registry.counter(
+    "qfu_api_received_bytes",
+    "Bytes received from the qBittorrent WebUI API.",
+    ("endpoint",),
+)
+TORRENTS_PROCESSED = registry.counter(
+    "qfu_torrents_processed",
+    "Torrents processed by the pipeline cycles.",
+    ("client",),
+)
+CACHE_LOOKUPS = registry.counter(
+    "qfu_cache_lookups",
+    "Cache lookups, the hit ratio is hits over all lookups.",
+    ("cache", "result"),
+)
+REMOVAL_FREED_BYTES = registry.histogram(
+    "qfu_removal_freed_bytes",
+    "Bytes freed by each planned removal.",
+    buckets=BYTES_BUCKETS,
+)
+TRANSFERRED_BYTES = registry.counter(
+    "qfu_transferred_bytes",
+    "Bytes transferred between clients.",
+    ("destination",),
+)
+LOG_MESSAGES = registry.counter(
+    "qfu_log_messages",
+    "Log messages by level.",
+    ("level",),
+)
+
+
+def record_cache_lookups(cache: str, hits: int, misses: int) -> None:
+    """Count cache hits and misses.
+
+    :param cache: Cache name, e.g. ``state``.
+    :type cache: str
+    :param hits: Hits count.
+    :type hits: int
+    :param misses: Misses count.
+    :type misses: int
+    """
+    if not registry.enabled:
+        return
+    if hits:
+        CACHE_LOOKUPS.inc(cache, "hit", amount=hits)
+    if misses:
+        CACHE_LOOKUPS.inc(cache, "miss", amount=misses)
+
+
+def log_sink(message: Any) -> None:
+    """Loguru sink counting the log messages by level."""
+    LOG_MESSAGES.inc(message.record["level"].name)
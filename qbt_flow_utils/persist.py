@@ -0,0 +1,49 @@
+"""Atomic persistence of local state files."""
+import os
+import pickle
+import tempfile
+from typing import Any
+
+from qbt_flow_utils.logging import logger
+
+
+def dump_state(path: str, state: Any) -> None:
+    """Atomically write a state file.
+
+    The state is written to a temporary file of the same directory, then
+    renamed over the target, so readers and concurrent writers never see a
+    partial file.
+
+    :param path: State file path.
+    :type path: str
+    :param state: Picklable state.
+    :type state: Any
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".state")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_state(path: str) -> Any:
+    """Read a state file written by :func:`dump_state`.
+
+    :param path: State file path.
+    :type path: str
+    :return: The state, or None if the file is missing or unreadable.
+    :rtype: Any
+    """
+    try:
+        with open(path, "rb") as file:
+            return pickle.load(file)  # noqa: S301
+    except FileNotFoundError:
+        return None
+    except Exception as error:
+        logger.warning(f"Ignoring unreadable state file '{path}': {error}")
+        return None
@@ -0,0 +1,11 @@
+"""qBittorrent WebUI API utilities for qbt_flow_utils."""
+from qbt_flow_utils.qbittorrent.client import QBittorrentClient, QBittorrentError
+from qbt_flow_utils.qbittorrent.sync import ClientStateSnapshot, ClientStateStore, SyncChanges
+
+__all__ = [
+    "QBittorrentClient",
+    "QBittorrentError",
+    "ClientStateSnapshot",
+    "ClientStateStore",
+    "SyncChanges",
+]
@@ -0,0 +1,240 @@
+"""Asynchronous qBittorrent WebUI API client."""
+import asyncio
+import time
+from types import TracebackType
+from typing import Any, Mapping, Optional, Type, Union
+
+import aiohttp
+from yarl import URL
+
+from qbt_flow_utils.logging import logger
+from qbt_flow_utils.metrics import API_CALLS, API_LATENCY, API_RECEIVED_BYTES, registry
+from qbt_flow_utils.settings import settings
+
+
+class QBittorrentError(Exception):
+    """qBittorrent WebUI API error."""
+
+
+def client_base_url(login: Mapping[str, Any]) -> URL:
+    """Build a client WebUI base URL from its login config.
+
+    ``host`` may already contain a scheme and/or a port, port 443 defaults to https.
+
+    :param login: Client ``login`` config.
+    :type login: Mapping[str, Any]
+    :return: WebUI base URL.
+    :rtype: URL
+    """
+    host: str = login["host"]
+    port: Optional[int] = login.get("port")
+    if "://" not in host:
+        host = f"{'https' if port == 443 else 'http'}://{host}"
+    url = URL(host)
+    if port is not None and not url.explicit_port:
+        url = url.with_port(port)
+    return url
+
+
+class QBittorrentClient:
+    """Authenticated qBittorrent WebUI API client.
+
+    The aiohttp session keeps the connections alive and holds the ``SID``
+    cookie, which is renewed once when the API answers 403. At most
+    ``max_in_flight`` requests are sent concurrently.
+    """
+
+    def __init__(
+        self,
+        base_url: Union[URL, str],
+        username: str,
+        password: str,
+        session: Optional[aiohttp.ClientSession] = None,
+        max_in_flight: Optional[int] = None,
+    ) -> None:
+        """Initialize the client.
+
+        :param base_url: WebUI base URL.
+        :type base_url: Union[URL, str]
+        :param username: WebUI username.
+        :type username: str
+        :param password: WebUI password.
+        :type password: str
+        :param session: Session to use, a new one is created if not provided.
+        :type session: Optional[aiohttp.ClientSession]
+        :param max_in_flight: Max concurrent requests, defaults to
+            ``settings.max_in_flight_requests``.
+        :type max_in_flight: Optional[int]
+        """
+        self.base_url = URL(str(base_url))
+        self.max_in_flight = max_in_flight or settings.max_in_flight_requests
+        self.username = username
+        self.password = password
+        self.bytes_received = 0
+        self.requests_count = 0
+        self._session = session
+        self._owns_session = session is None
+        self._logged_in = False
+        self._login_lock: Optional[asyncio.Lock] = None
+        self._in_flight: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def from_config(
+        cls,
+        client_config: Mapping[str, Any],
+        session: Optional[aiohttp.ClientSession] = None,
+        max_in_flight: Optional[int] = None,
+    ) -> "QBittorrentClient":
+        """Build a client from its config.
+
+        :param client_config: Client config.
+        :type client_config: Mapping[str, Any]
+        :param session: Session to use, a new one is created if not provided.
+        :type session: Optional[aiohttp.ClientSession]
+        :param max_in_flight: Max concurrent requests.
+        :type max_in_flight: Optional[int]
+        :return: qBittorrent client.
+        :rtype: QBittorrentClient
+        """
+        login = client_config["login"]
+        return cls(
+            client_base_url(login),
+            login["username"],
+            login["password"],
+            session,
+            max_in_flight,
+        )
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Return the client session, creating it on first use."""
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                headers={"Referer": str(self.base_url)},
+                cookie_jar=aiohttp.CookieJar(unsafe=True),
+                connector=aiohttp.TCPConnector(limit=self.max_in_flight),
+            )
+        return self._session
+
+    async def __aenter__(self) -> "QBittorrentClient":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the session if owned by the client."""
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+        self._logged_in = False
+
+    async def login(self) -> None:
+        """Authenticate and store the ``SID`` cookie in the session.
+
+        :raises QBittorrentError: If credentials are rejected.
+        """
+        start = time.perf_counter()
+        async with self.session.post(
+            self.base_url / "api/v2/auth/login",
+            data={"username": self.username, "password": self.password},
+        ) as response:
+            self.requests_count += 1
+            body = await response.text()
+        if registry.enabled:
+            API_CALLS.inc("auth/login", str(response.status))
+            API_LATENCY.observe(time.perf_counter() - start, "auth/login")
+        if response.status != 200 or body.strip() != "Ok.":
+            logger.info(f"Login failed on {self.base_url}")
+            raise QBittorrentError(f"Login failed on {self.base_url}: {response.status} {body}")
+        self._logged_in = True
+
+    async def request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Mapping[str, Any]] = None,
+        data: Optional[Mapping[str, Any]] = None,
+    ) -> Any:
+        """Call an API endpoint.
+
+        :param method: HTTP method.
+        :type method: str
+        :param endpoint: Endpoint relative to ``/api/v2/``, e.g. ``sync/maindata``.
+        :type endpoint: str
+        :param params: Query parameters.
+        :type params: Optional[Mapping[str, Any]]
+        :param data: Form data.
+        :type data: Optional[Mapping[str, Any]]
+        :return: Decoded JSON, or text for non JSON responses.
+        :rtype: Any
+        :raises QBittorrentError: If the API answers with an error status.
+        """
+        if self._in_flight is None:
+            self._login_lock = asyncio.Lock()
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        if not self._logged_in:
+            async with self._login_lock:  # type: ignore [union-attr]
+                if not self._logged_in:
+                    await self.login()
+        async with self._in_flight:
+            return await self._request(method, endpoint, params, data)
+
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Mapping[str, Any]],
+        data: Optional[Mapping[str, Any]],
+    ) -> Any:
+        for attempt in range(2):
+            start = time.perf_counter()
+            async with self.session.request(
+                method,
+                self.base_url / "api/v2" / endpoint,
+                params=params,
+                data=data,
+            ) as response:
+                self.requests_count += 1
+                payload = await response.read()
+                self.bytes_received += len(payload)
+                if registry.enabled:
+                    API_CALLS.inc(endpoint, str(response.status))
+                    API_LATENCY.observe(time.perf_counter() - start, endpoint)
+                    API_RECEIVED_BYTES.inc(endpoint, amount=len(payload))
+                if response.status == 403 and attempt == 0:
+                    await self.login()
+                    continue
+                if response.status >= 400:
+                    raise QBittorrentError(
+                        f"{method} {endpoint} failed on {self.base_url}: {response.status}",
+                    )
+                if response.content_type == "application/json":
+                    return await response.json()
+                return payload.decode()
+        return None  # pragma: no cover
+
+    async def get(self, endpoint: str, **params: Any) -> Any:
+        """Call an API endpoint with GET.
+
+        :param endpoint: Endpoint relative to ``/api/v2/``.
+        :type endpoint: str
+        :return: Decoded response.
+        :rtype: Any
+        """
+        return await self.request("GET", endpoint, params=params or None)
+
+    async def post(self, endpoint: str, **data: Any) -> Any:
+        """Call an API endpoint with POST.
+
+        :param endpoint: Endpoint relative to ``/api/v2/``.
+        :type endpoint: str
+        :return: Decoded response.
+        :rtype: Any
+        """
+        return await self.request("POST", endpoint, data=data or None)
@@ -0,0 +1,139 @@
+"""Incremental client state sync through ``sync/maindata`` deltas.
+
+qBittorrent answers ``sync/maindata?rid=<rid>`` with only what changed since
+the response that returned ``rid``. The store keeps that cursor, applies the
+partial ``torrents`` / ``torrents_removed`` / ``categories`` / ``tags``
+updates and records which torrents changed since the last cycle.
+
+qBittorrent clears the ``tracker`` of a torrent when none of its trackers
+works. The last working one is kept under
+:data:`~qbt_flow_utils.trackers.matcher.LAST_TRACKER`, so that a failing
+private torrent still resolves to its tracker.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, Mapping, Set
+
+from qbt_flow_utils.logging import logger
+from qbt_flow_utils.qbittorrent.client import QBittorrentClient
+from qbt_flow_utils.trackers.matcher import LAST_TRACKER
+
+
+@dataclass(frozen=True)
+class ClientStateSnapshot:
+    """Consistent view of a client state at a given rid."""
+
+    rid: int
+    torrents: Dict[str, Dict[str, Any]]
+    categories: Dict[str, Dict[str, Any]]
+    tags: Set[str]
+    server_state: Dict[str, Any]
+
+
+@dataclass
+class SyncChanges:
+    """Torrents changed since the last cycle."""
+
+    changed: Set[str] = field(default_factory=set)
+    removed: Set[str] = field(default_factory=set)
+    full_update: bool = False
+
+
+class ClientStateStore:
+    """Client state kept up to date from ``sync/maindata`` deltas."""
+
+    def __init__(self) -> None:
+        self.rid = 0
+        self.torrents: Dict[str, Dict[str, Any]] = {}
+        self.categories: Dict[str, Dict[str, Any]] = {}
+        self.tags: Set[str] = set()
+        self.server_state: Dict[str, Any] = {}
+        self._changes = SyncChanges()
+
+    def apply(self, data: Mapping[str, Any]) -> None:
+        """Apply a ``sync/maindata`` response.
+
+        Torrents dicts are replaced rather than mutated, so previously taken
+        snapshots are not affected.
+
+        :param data: Decoded ``sync/maindata`` response.
+        :type data: Mapping[str, Any]
+        """
+        changes = self._changes
+        previous = self.torrents
+        if data.get("full_update"):
+            changes.removed |= self.torrents.keys() - data.get("torrents", {}).keys()
+            changes.full_update = True
+            self.torrents = {}
+            self.categories = {}
+            self.tags = set()
+            self.server_state = {}
+
+        for torrent_hash, delta in data.get("torrents", {}).items():
+            current = self.torrents.get(torrent_hash)
+            torrent = {**current, **delta} if current else dict(delta)
+            if torrent.get("tracker"):
+                torrent[LAST_TRACKER] = torrent["tracker"]
+            elif current is None and previous.get(torrent_hash, {}).get(LAST_TRACKER):
+                torrent[LAST_TRACKER] = previous[torrent_hash][LAST_TRACKER]
+            self.torrents[torrent_hash] = torrent
+            changes.changed.add(torrent_hash)
+            changes.removed.discard(torrent_hash)
+
+        for torrent_hash in data.get("torrents_removed", ()):
+            if self.torrents.pop(torrent_hash, None) is not None:
+                changes.removed.add(torrent_hash)
+            changes.changed.discard(torrent_hash)
+
+        for name, delta in data.get("categories", {}).items():
+            self.categories[name] = {**self.categories.get(name, {}), **delta}
+        for name in data.get("categories_removed", ()):
+            self.categories.pop(name, None)
+
+        self.tags.update(data.get("tags", ()))
+        self.tags.difference_update(data.get("tags_removed", ()))
+
+        if data.get("server_state"):
+            self.server_state = {**self.server_state, **data["server_state"]}
+
+        self.rid = int(data.get("rid", self.rid))
+
+    async def sync(self, client: QBittorrentClient) -> None:
+        """Fetch and apply the changes since the last sync.
+
+        :param client: Client to sync from.
+        :type client: QBittorrentClient
+        """
+        data = await client.get("sync/maindata", rid=self.rid)
+        self.apply(data)
+        logger.debug(
+            f"Synced {client.base_url} rid={self.rid}: {len(self._changes.changed)} changed,"
+            f" {len(self._changes.removed)} removed torrents",
+        )
+
+    def snapshot(self) -> ClientStateSnapshot:
+        """Return a consistent copy of the current state.
+
+        :return: Client state snapshot.
+        :rtype: ClientStateSnapshot
+        """
+        return ClientStateSnapshot(
+            rid=self.rid,
+            torrents=dict(self.torrents),
+            categories=dict(self.categories),
+            tags=set(self.tags),
+            server_state=dict(self.server_state),
+        )
+
+    @property
+    def changes(self) -> SyncChanges:
+        """Torrents changed since the last :meth:`pop_changes`, left pending."""
+        return self._changes
+
+    def pop_changes(self) -> SyncChanges:
+        """Return the torrents changed since the last call and reset them.
+
+        :return: Changed and removed torrents hashes.
+        :rtype: SyncChanges
+        """
+        changes, self._changes = self._changes, SyncChanges()
+        return changes
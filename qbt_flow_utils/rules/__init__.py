@@ -0,0 +1,4 @@
+"""Auto manage rules for qbt_flow_utils."""
+from qbt_flow_utils.rules.engine import ActionBatch, RuleEngine, apply_actions
+
+__all__ = ["ActionBatch", "RuleEngine", "apply_actions"]
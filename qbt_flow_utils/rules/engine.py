@@ -0,0 +1,207 @@
+"""Vectorised auto_manage rule engine.
+
+The ``auto_manage`` config of every tracker is compiled into per tracker
+lookup tables, indexed by the snapshot ``tracker_codes``, so that matching
+is a handful of array operations over the whole snapshot whatever the number
+of trackers. A torrent matches its tracker rules when:
+
+- any max_ condition is reached (``max_seed_time`` or ``max_ratio``),
+- all min_ conditions pass (``min_active_seeder``),
+- it is not protected by ``protect_hit_and_run`` while still under H&R.
+
+Matches are grouped by (action, parameter) across trackers, so that for
+example every torrent limited to 512 KB/s goes out in one
+``torrents/setUploadLimit`` call.
+"""
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from qbt_flow_utils.config.runtime import AutoManageRules, TrackerRules
+from qbt_flow_utils.logging import logger
+from qbt_flow_utils.qbittorrent.client import QBittorrentClient
+from qbt_flow_utils.settings import settings
+from qbt_flow_utils.tagging.planner import MAX_REQUEST_BYTES
+from qbt_flow_utils.torrents.snapshot import TorrentSnapshot
+
+LIMIT_UPLOAD_SPEED = "limit_upload_speed"
+
+# Actions sent as a single API call, other actions (move, sync, remove) are
+# left to their own stages.
+ACTION_ENDPOINTS = {
+    LIMIT_UPLOAD_SPEED: "torrents/setUploadLimit",
+    "pause_torrent": "torrents/pause",
+    "stop_torrent": "torrents/stop",
+}
+
+# Torrents already in those states are skipped by the action.
+ACTION_DONE_STATES = {
+    "pause_torrent": ("pausedUP", "pausedDL", "stoppedUP", "stoppedDL"),
+    "stop_torrent": ("pausedUP", "pausedDL", "stoppedUP", "stoppedDL"),
+}
+
+_HASHES_PER_CALL = MAX_REQUEST_BYTES // 43
+
+
+@dataclass(frozen=True)
+class ActionBatch:
+    """Torrents sharing the same auto_manage action and parameter."""
+
+    action: str
+    parameter: Optional[int]
+    hashes: Tuple[str, ...]
+
+    @property
+    def endpoint(self) -> Optional[str]:
+        """API endpoint of the action, None if handled by another stage."""
+        return ACTION_ENDPOINTS.get(self.action)
+
+    def data(self) -> Dict[str, str]:
+        """Return the call form data."""
+        data = {"hashes": "|".join(self.hashes)}
+        if self.action == LIMIT_UPLOAD_SPEED:
+            data["limit"] = str(self.parameter)
+        return data
+
+
+def _group_key(rules: AutoManageRules) -> Tuple[str, Optional[int]]:
+    # A paused or stopped torrent does not upload: a boolean action takes
+    # precedence over limit_upload_speed.
+    if rules.action is not None:
+        return rules.action, None
+    return LIMIT_UPLOAD_SPEED, rules.limit_upload_speed
+
+
+class RuleEngine:
+    """Match a torrents snapshot against the trackers auto_manage rules."""
+
+    def __init__(self, trackers: Mapping[str, TrackerRules]) -> None:
+        """Initialize the engine.
+
+        :param trackers: Runtime trackers config keyed by tracker tag.
+        :type trackers: Mapping[str, TrackerRules]
+        """
+        self.trackers = trackers
+        self.groups: List[Tuple[str, Optional[int]]] = sorted(
+            {_group_key(r.auto_manage) for r in trackers.values() if r.auto_manage is not None},
+            key=lambda group: (group[0], group[1] or 0),
+        )
+
+    def _tables(self, tracker_names: List[str]) -> Dict[str, npt.NDArray[np.float64]]:
+        columns: Dict[str, List[float]] = {
+            "max_seed_time": [],
+            "max_ratio": [],
+            "min_active_seeder": [],
+            "protect_hit_and_run": [],
+            "group": [],
+            "hnr_ignore": [],
+            "hnr_min_seed_time": [],
+            "hnr_min_ratio": [],
+        }
+        for name in tracker_names:
+            tracker = self.trackers.get(name)
+            rules = tracker.auto_manage if tracker is not None else None
+            if tracker is None or rules is None:
+                row = (math.inf, math.inf, 0, 0, -1, 1, math.inf, math.inf)
+            else:
+                row = (
+                    rules.max_seed_time,
+                    rules.max_ratio,
+                    rules.min_active_seeder,
+                    rules.protect_hit_and_run,
+                    self.groups.index(_group_key(rules)),
+                    *tracker.hit_and_run,
+                )
+            for column, value in zip(columns.values(), row):
+                column.append(float(value))
+        return {name: np.array(values, dtype=np.float64) for name, values in columns.items()}
+
+    def match(self, snapshot: TorrentSnapshot) -> npt.NDArray[np.int64]:
+        """Return the action group of every torrent.
+
+        :param snapshot: Torrents snapshot.
+        :type snapshot: TorrentSnapshot
+        :return: Per torrent index in :attr:`groups`, ``-1`` if no rule matched.
+        :rtype: npt.NDArray[np.int64]
+        """
+        tables = self._tables(snapshot.tracker_names)
+        codes = snapshot.tracker_codes
+
+        def column(name: str) -> npt.NDArray[np.float64]:
+            return tables[name][codes]
+
+        seeding_time = snapshot.seeding_time
+        ratio = snapshot.ratio
+        reached = (seeding_time >= column("max_seed_time")) | (ratio >= column("max_ratio"))
+        passed = snapshot.seeders >= column("min_active_seeder")
+        under_hit_and_run = (
+            (column("hnr_ignore") == 0)
+            & (seeding_time < column("hnr_min_seed_time"))
+            & (ratio < column("hnr_min_ratio"))
+        )
+        protected = (column("protect_hit_and_run") != 0) & under_hit_and_run
+        groups = column("group").astype(np.int64)
+        groups[~(reached & passed & ~protected)] = -1
+        return groups
+
+    def plan(self, snapshot: TorrentSnapshot) -> List[ActionBatch]:
+        """Plan the grouped actions of a snapshot.
+
+        Torrents already in the action target state (same upload limit,
+        already paused) are skipped.
+
+        :param snapshot: Torrents snapshot.
+        :type snapshot: TorrentSnapshot
+        :return: Action batches sorted by action and parameter.
+        :rtype: List[ActionBatch]
+        """
+        groups = self.match(snapshot)
+        batches: List[ActionBatch] = []
+        for index, (action, parameter) in enumerate(self.groups):
+            mask = groups == index
+            if action == LIMIT_UPLOAD_SPEED:
+                mask &= snapshot.up_limit != parameter
+            if action in ACTION_DONE_STATES:
+                mask &= ~snapshot.in_states(ACTION_DONE_STATES[action])
+            hashes = sorted(snapshot.hashes[mask])
+            for start in range(0, len(hashes), _HASHES_PER_CALL):
+                chunk = tuple(hashes[start : start + _HASHES_PER_CALL])
+                batches.append(ActionBatch(action, parameter, chunk))
+        return batches
+
+
+async def apply_actions(
+    client: QBittorrentClient,
+    batches: Iterable[ActionBatch],
+    dry_run: Optional[bool] = None,
+) -> int:
+    """Send planned action batches to a client.
+
+    Batches without API endpoint are only logged, they are handled by the
+    move, sync and remove stages.
+
+    :param client: qBittorrent client.
+    :type client: QBittorrentClient
+    :param batches: Planned batches.
+    :type batches: Iterable[ActionBatch]
+    :param dry_run: Only log the actions, defaults to ``settings.dry_run``.
+    :type dry_run: Optional[bool]
+    :return: Number of API calls sent.
+    :rtype: int
+    """
+    if dry_run is None:
+        dry_run = settings.dry_run
+    calls = 0
+    for batch in batches:
+        parameter = f" {batch.parameter}" if batch.parameter is not None else ""
+        logger.info(
+            f"{'[DRY-RUN] ' if dry_run else ''}auto_manage {batch.action}{parameter}"
+            f" on {len(batch.hashes)} torrents",
+        )
+        if not dry_run and batch.endpoint is not None:
+            await client.post(batch.endpoint, **batch.data())
+            calls += 1
+    return calls
@@ -0,0 +1,5 @@
+"""Torrents scoring for qbt_flow_utils."""
+from qbt_flow_utils.scoring.engine import ScoringEngine
+from qbt_flow_utils.scoring.removal import RemovalPlan, RemovalPlanner
+
+__all__ = ["RemovalPlan", "RemovalPlanner", "ScoringEngine"]
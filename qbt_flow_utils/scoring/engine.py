@@ -0,0 +1,125 @@
+"""Vectorized torrents scoring engine.
+
+The removal score of a torrent is::
+
+    coef_day_seed_time * seeding days
+    + coef_seed_ratio * ratio
+    + coef_nums_seeder * seeders
+    + tracker extra_score
+    + sum of extra_tags_score of its tags
+
+The highest scores are removed first.
+"""
+from typing import Any, Mapping, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from qbt_flow_utils.torrents.snapshot import TorrentSnapshot
+
+_DAY = 86400
+
+
+class ScoringEngine:
+    """Score torrents snapshots and select removal candidates."""
+
+    def __init__(
+        self,
+        scoring_config: Mapping[str, Any],
+        trackers_config: Mapping[str, Any],
+    ) -> None:
+        """Initialize the engine.
+
+        :param scoring_config: Scoring config.
+        :type scoring_config: Mapping[str, Any]
+        :param trackers_config: Trackers config keyed by tracker tag.
+        :type trackers_config: Mapping[str, Any]
+        """
+        calculation = scoring_config["score_calculation"]
+        self.coef_day_seed_time = float(calculation["coef_day_seed_time"])
+        self.coef_seed_ratio = float(calculation["coef_seed_ratio"])
+        self.coef_nums_seeder = float(calculation["coef_nums_seeder"])
+        self.ignore_untagged_torrents = bool(scoring_config.get("ignore_untagged_torrents", True))
+        self.ignore_tags_for_selection = list(scoring_config.get("ignore_tags_for_selection") or [])
+        self.extra_tags_score = dict(scoring_config.get("extra_tags_score") or {})
+        self.trackers_extra_score = {
+            tag: config.get("extra_score", 0) for tag, config in trackers_config.items()
+        }
+
+    def score(self, snapshot: TorrentSnapshot) -> npt.NDArray[np.float64]:
+        """Compute the removal score of every torrent.
+
+        :param snapshot: Torrents snapshot.
+        :type snapshot: TorrentSnapshot
+        :return: Per torrent score.
+        :rtype: npt.NDArray[np.float64]
+        """
+        tracker_scores = np.array(
+            [self.trackers_extra_score.get(name, 0) for name in snapshot.tracker_names],
+            dtype=np.float64,
+        )
+        scores = snapshot.seeding_time.astype(np.float64) * (self.coef_day_seed_time / _DAY)
+        scores += self.coef_seed_ratio * snapshot.ratio
+        scores += self.coef_nums_seeder * snapshot.seeders
+        scores += tracker_scores[snapshot.tracker_codes]
+        if self.extra_tags_score:
+            scores += snapshot.per_torrent_sum(self.extra_tags_score)
+        return scores
+
+    def selectable(self, snapshot: TorrentSnapshot) -> npt.NDArray[np.bool_]:
+        """Return the mask of torrents that can be selected for removal.
+
+        :param snapshot: Torrents snapshot.
+        :type snapshot: TorrentSnapshot
+        :return: Per torrent boolean mask.
+        :rtype: npt.NDArray[np.bool_]
+        """
+        mask = np.ones(len(snapshot), dtype=np.bool_)
+        if self.ignore_tags_for_selection:
+            mask &= ~snapshot.has_any_tag(self.ignore_tags_for_selection)
+        if self.ignore_untagged_torrents:
+            mask &= snapshot.tag_count() > 0
+        return mask
+
+    def select_for_removal(
+        self,
+        snapshot: TorrentSnapshot,
+        bytes_to_free: int,
+        scores: Optional[npt.NDArray[np.float64]] = None,
+    ) -> npt.NDArray[np.intp]:
+        """Select the highest scored torrents freeing at least bytes_to_free.
+
+        Only the top-k scores are sorted, k being doubled until the selected
+        torrents are large enough.
+
+        :param snapshot: Torrents snapshot.
+        :type snapshot: TorrentSnapshot
+        :param bytes_to_free: Target of bytes to free.
+        :type bytes_to_free: int
+        :param scores: Precomputed scores, computed if not provided.
+        :type scores: Optional[npt.NDArray[np.float64]]
+        :return: Rows of the selected torrents, highest score first. All
+            selectable torrents if the target can not be reached.
+        :rtype: npt.NDArray[np.intp]
+        """
+        if bytes_to_free <= 0:
+            return np.zeros(0, dtype=np.intp)
+        if scores is None:
+            scores = self.score(snapshot)
+
+        candidates = np.flatnonzero(self.selectable(snapshot))
+        candidates_scores = scores[candidates]
+        count = len(candidates)
+        mean_size = max(1, int(snapshot.size[candidates].mean())) if count else 1
+        k = min(count, max(64, 2 * bytes_to_free // mean_size))
+
+        while True:
+            top = np.argpartition(-candidates_scores, k)[:k] if k < count else np.arange(count)
+            top = top[np.argsort(-candidates_scores[top], kind="stable")]
+            rows = candidates[top]
+            freed = np.cumsum(snapshot.size[rows])
+            if len(freed) and freed[-1] >= bytes_to_free:
+                return rows[: int(np.searchsorted(freed, bytes_to_free)) + 1]
+            if k >= count:
+                return rows
+            k = min(count, k * 2)
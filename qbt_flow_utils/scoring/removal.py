@@ -0,0 +1,210 @@
+"""Hardlink aware removal planner.
+
+Removing a torrent only frees the files whose every hardlink is removed too:
+a file also linked into the media folder, or shared with a cross-seed that
+is kept, frees nothing. The planner accounts removed links per inode, so
+the bytes a candidate frees are known before anything is deleted and the
+target is reached in a single pass, instead of looping over delete, statvfs
+and repeat. The inode index finds the candidate files, their link counts
+are read from disk.
+
+Cross-seed families are removed as a whole. The removal cost of a family is
+its rank by descending score among the families freeing bytes (1 for the
+most removable), and families are taken by increasing cost per freed byte
+until the target is reached.
+"""
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from qbt_flow_utils.files.inodes import FileInode, InodeIndex, stat_inode
+from qbt_flow_utils.logging import logger
+from qbt_flow_utils.metrics import REMOVAL_FREED_BYTES
+from qbt_flow_utils.torrents.cross_seed import CrossSeedIndex
+from qbt_flow_utils.torrents.snapshot import TorrentSnapshot
+
+InodeKey = Tuple[int, int]
+
+
+@dataclass(frozen=True)
+class RemovalPlan:
+    """Torrents to remove to reach a bytes to free target."""
+
+    rows: npt.NDArray[np.intp]
+    freed_bytes: int
+    bytes_to_free: int
+
+    @property
+    def reached(self) -> bool:
+        """Whether removing the planned torrents meets the target."""
+        return self.freed_bytes >= self.bytes_to_free
+
+
+@dataclass
+class _Family:
+    rows: List[int]
+    score: float
+    size: int
+    # Removed links per inode, None when the torrents files are unknown.
+    links: Optional[Dict[InodeKey, int]] = None
+    paths: Set[str] = field(default_factory=set)
+    inodes: Dict[InodeKey, FileInode] = field(default_factory=dict)
+
+    def add_files(self, files: Iterable[Tuple[str, FileInode]]) -> None:
+        assert self.links is not None  # noqa: S101
+        for path, inode in files:
+            # Cross-seeds usually share their content path.
+            if path in self.paths:
+                continue
+            self.paths.add(path)
+            key = (inode.dev, inode.ino)
+            self.links[key] = self.links.get(key, 0) + 1
+            self.inodes[key] = inode
+
+    def freed(self, remaining: Dict[InodeKey, int], commit: bool) -> int:
+        """Bytes freed by removing the family, given the links left per inode."""
+        if self.links is None:
+            return self.size
+        freed = 0
+        for key, removed in self.links.items():
+            inode = self.inodes[key]
+            left = remaining.get(key, inode.nlink) - removed
+            if left <= 0:
+                freed += inode.size
+            if commit:
+                remaining[key] = left
+        return freed
+
+
+class RemovalPlanner:
+    """Plan removals from scores, hardlinks and cross-seed families."""
+
+    def __init__(
+        self,
+        inode_index: Optional[InodeIndex] = None,
+        cross_seeds: Optional[CrossSeedIndex] = None,
+    ) -> None:
+        """Initialize the planner.
+
+        :param inode_index: Refreshed inode index of the download and media
+            folders. Without it, a torrent is assumed to free its size.
+        :type inode_index: Optional[InodeIndex]
+        :param cross_seeds: Cross-seed index. Without it, each torrent is its
+            own family.
+        :type cross_seeds: Optional[CrossSeedIndex]
+        """
+        self.inode_index = inode_index
+        self.cross_seeds = cross_seeds
+
+    def _families(
+        self,
+        snapshot: TorrentSnapshot,
+        scores: npt.NDArray[np.float64],
+        selectable: npt.NDArray[np.bool_],
+        content_paths: Optional[Sequence[Optional[str]]],
+    ) -> List[_Family]:
+        if self.cross_seeds is not None:
+            codes, family_score, family_size = self.cross_seeds.family_stats(snapshot, scores)
+        else:
+            codes = np.arange(len(snapshot), dtype=np.int64)
+            family_score, family_size = scores, snapshot.size
+        # A family is only removable if all its torrents are.
+        removable = np.ones(len(family_score), dtype=np.bool_)
+        np.logical_and.at(removable, codes, selectable)
+
+        families: Dict[int, _Family] = {}
+        for row in np.flatnonzero(removable[codes]).tolist():
+            code = int(codes[row])
+            family = families.get(code)
+            if family is None:
+                family = families[code] = _Family(
+                    [],
+                    float(family_score[code]),
+                    int(family_size[code]),
+                    {} if self.inode_index is not None else None,
+                )
+            family.rows.append(row)
+            if family.links is None or self.inode_index is None:
+                continue
+            path = content_paths[row] if content_paths is not None else None
+            files: List[Tuple[str, FileInode]] = []
+            if path:
+                # Indexed link counts may be stale, candidate files are stat'ed again.
+                for file_path, _ in self.inode_index.files_under(os.path.normpath(path)):
+                    inode = stat_inode(file_path)
+                    if inode is not None:
+                        files.append((file_path, inode))
+            if files:
+                family.add_files(files)
+            else:
+                # Files unknown to the index, e.g. on a remote client.
+                family.links = None
+        return list(families.values())
+
+    def plan(
+        self,
+        snapshot: TorrentSnapshot,
+        scores: npt.NDArray[np.float64],
+        selectable: npt.NDArray[np.bool_],
+        bytes_to_free: int,
+        content_paths: Optional[Sequence[Optional[str]]] = None,
+    ) -> RemovalPlan:
+        """Plan the removals reaching ``bytes_to_free``.
+
+        :param snapshot: Torrents snapshot.
+        :type snapshot: TorrentSnapshot
+        :param scores: Per torrent removal scores, see :class:`ScoringEngine`.
+        :type scores: npt.NDArray[np.float64]
+        :param selectable: Per torrent selectable mask.
+        :type selectable: npt.NDArray[np.bool_]
+        :param bytes_to_free: Target of bytes to free.
+        :type bytes_to_free: int
+        :param content_paths: Per torrent ``content_path``, used with the inode
+            index to find the torrent files.
+        :type content_paths: Optional[Sequence[Optional[str]]]
+        :return: Removal plan, with every freeing family if the target can not
+            be reached.
+        :rtype: RemovalPlan
+        """
+        if bytes_to_free <= 0:
+            return RemovalPlan(np.zeros(0, dtype=np.intp), 0, bytes_to_free)
+        families = self._families(snapshot, scores, selectable, content_paths)
+        families.sort(key=lambda family: -family.score)
+
+        remaining: Dict[InodeKey, int] = {}
+        candidates: List[Tuple[float, int]] = []
+        rank = 0
+        for index, family in enumerate(families):
+            freed = family.freed(remaining, commit=False)
+            if freed > 0:
+                rank += 1
+                candidates.append((rank / freed, index))
+            else:
+                # May free links shared with families removed before it.
+                candidates.append((math.inf, index))
+        candidates.sort()
+
+        rows: List[int] = []
+        freed_bytes = 0
+        for _, index in candidates:
+            family = families[index]
+            # Earlier removals may have released links shared with this family.
+            freed = family.freed(remaining, commit=False)
+            if freed <= 0:
+                continue
+            family.freed(remaining, commit=True)
+            rows.extend(family.rows)
+            freed_bytes += freed
+            if freed_bytes >= bytes_to_free:
+                break
+        plan = RemovalPlan(np.array(rows, dtype=np.intp), freed_bytes, bytes_to_free)
+        REMOVAL_FREED_BYTES.observe(freed_bytes)
+        if not plan.reached:
+            logger.warning(
+                f"Removal can only free {freed_bytes} of the {bytes_to_free} bytes to free",
+            )
+        return plan
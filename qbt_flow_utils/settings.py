@@ -28,6 +28,11 @@ class Settings(BaseSettings):
     environment: str = "dev"
 
     log_level: LogLevel = LogLevel.INFO
+    log_libraries_level: LogLevel = LogLevel.WARNING  # Min level of third party libraries logs
+    log_json: bool = False  # One JSON object per line, with the bound fields
+    log_enqueue: bool = True  # Buffer logs, written by batches from a background thread
+    log_rate_limit: int = 20  # Max per torrent messages per call site and window, 0 to disable
+    log_rate_window: float = 60  # Rate limit window in seconds
 
     # Variables for qbt-flow-utils @TODO: review command names
     dry_run: bool = False
@@ -37,6 +42,24 @@ class Settings(BaseSettings):
     auto_remove: bool = True
     auto_sync: bool = False
     auto_move: bool = False
+    config_cache: bool = True  # Cache validated config files in cache_folder
+    media_hygiene_delete: bool = False  # Delete media files that are not hardlinks, else flag
+
+    # Variables for the daemon scheduler
+    daemon_poll_interval: float = 30  # Seconds between delta syncs looking for new torrents
+    daemon_disk_check_interval: float = 5  # Seconds between local disk usage checks
+    daemon_jitter: float = 0.1  # Stage intervals are randomized by +/- this fraction
+
+    # Variables for qBittorrent WebUI API
+    max_in_flight_requests: int = 8  # Max concurrent requests per client
+    tracker_status_max_calls: int = 20  # Max torrents/trackers calls per cycle, retries included
+    tracker_status_workers: int = 4  # Concurrent torrents/trackers calls
+
+    # Variables for metrics
+    metrics_enabled: bool = False
+    metrics_host: str = "127.0.0.1"  # Listen address of the /metrics endpoint
+    metrics_port: Optional[int] = None  # Serve /metrics on this port if set
+    metrics_textfile: Optional[str] = None  # Textfile collector file written each cycle
 
     # Variables for Redis
     redis_host: str = "qfu-redis"
@@ -52,6 +75,7 @@ class Settings(BaseSettings):
     )
     download_folder: str = "/downloads"  # Path to download folder
     media_folder: str = "/media"  # Path to media folder
+    cache_folder: str = "/app/cache"  # Path to persistent cache folder
 
     @property
     def redis_url(self) -> URL:
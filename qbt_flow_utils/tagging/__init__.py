@@ -0,0 +1,9 @@
+"""Auto-tagging for qbt_flow_utils."""
+from qbt_flow_utils.tagging.planner import (
+    TagMutation,
+    apply_tag_mutations,
+    managed_tags,
+    plan_tag_mutations,
+)
+
+__all__ = ["TagMutation", "apply_tag_mutations", "managed_tags", "plan_tag_mutations"]
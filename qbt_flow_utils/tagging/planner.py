@@ -0,0 +1,148 @@
+"""Batched tags mutations planner.
+
+Desired tags are diffed against current tags for every torrent, then the
+changes are grouped by tag into ``torrents/addTags`` / ``torrents/removeTags``
+calls carrying pipe joined hashes. Torrents already correctly tagged never
+produce a call.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from qbt_flow_utils.logging import logger
+from qbt_flow_utils.qbittorrent.client import QBittorrentClient
+from qbt_flow_utils.settings import settings
+
+# Auto tags families of the tags config: (enable flag, tag name) fields.
+AUTO_TAGS_FIELDS = (
+    ("auto_tags_no_hard_link", "no_hard_link_tag"),
+    ("auto_tags_hard_link", "hard_link_tag"),
+    ("auto_tags_hit_and_run", "hit_and_run_tag"),
+    ("auto_tags_upload_limit", "upload_limit_tag"),
+    ("auto_tags_public", "public_tag"),
+    ("auto_tags_unknown_trackers", "unknown_tracker_tag"),
+    ("auto_tags_tracker_error", "tracker_error_tag"),
+)
+
+# Stay well under qBittorrent WebUI request size limit.
+MAX_REQUEST_BYTES = 512 * 1024
+
+
+@dataclass(frozen=True)
+class TagMutation:
+    """A single ``torrents/addTags`` or ``torrents/removeTags`` call."""
+
+    endpoint: str
+    tag: str
+    hashes: Tuple[str, ...]
+
+    def data(self) -> Dict[str, str]:
+        """Return the call form data."""
+        return {"hashes": "|".join(self.hashes), "tags": self.tag}
+
+
+def managed_tags(tags_config: Mapping[str, Any], trackers_tags: Iterable[str]) -> Set[str]:
+    """Return the tags owned by the auto-tagging stage.
+
+    Only those tags are ever removed from torrents, user tags are left untouched.
+
+    :param tags_config: Tags config.
+    :type tags_config: Mapping[str, Any]
+    :param trackers_tags: Configured trackers tags.
+    :type trackers_tags: Iterable[str]
+    :return: Managed tags.
+    :rtype: Set[str]
+    """
+    tags = set(trackers_tags)
+    for enable_field, tag_field in AUTO_TAGS_FIELDS:
+        if tags_config.get(enable_field):
+            tags.add(tags_config[tag_field])
+    return tags
+
+
+def _chunks(
+    endpoint: str,
+    tag: str,
+    hashes: List[str],
+    max_request_bytes: int,
+) -> Iterable[TagMutation]:
+    hashes.sort()
+    budget = max_request_bytes - len("hashes=&tags=") - 3 * len(tag)
+    chunk: List[str] = []
+    size = 0
+    for torrent_hash in hashes:
+        # "|" is percent encoded in form data.
+        hash_size = len(torrent_hash) + 3
+        if chunk and size + hash_size > budget:
+            yield TagMutation(endpoint, tag, tuple(chunk))
+            chunk, size = [], 0
+        chunk.append(torrent_hash)
+        size += hash_size
+    if chunk:
+        yield TagMutation(endpoint, tag, tuple(chunk))
+
+
+def plan_tag_mutations(
+    current: Mapping[str, Iterable[str]],
+    desired: Mapping[str, Iterable[str]],
+    managed: Set[str],
+    max_request_bytes: int = MAX_REQUEST_BYTES,
+) -> List[TagMutation]:
+    """Plan the calls turning current tags into desired tags.
+
+    :param current: Current tags keyed by torrent hash.
+    :type current: Mapping[str, Iterable[str]]
+    :param desired: Desired managed tags keyed by torrent hash, torrents
+        missing from it are left untouched.
+    :type desired: Mapping[str, Iterable[str]]
+    :param managed: Tags owned by the auto-tagging stage.
+    :type managed: Set[str]
+    :param max_request_bytes: Max form data size of a single call.
+    :type max_request_bytes: int
+    :return: Removals then additions, grouped by tag.
+    :rtype: List[TagMutation]
+    """
+    to_add: Dict[str, List[str]] = {}
+    to_remove: Dict[str, List[str]] = {}
+    for torrent_hash, desired_tags in desired.items():
+        wanted = set(desired_tags)
+        present = set(current.get(torrent_hash, ()))
+        for tag in wanted - present:
+            to_add.setdefault(tag, []).append(torrent_hash)
+        for tag in (present & managed) - wanted:
+            to_remove.setdefault(tag, []).append(torrent_hash)
+
+    mutations: List[TagMutation] = []
+    for endpoint, grouped in (("torrents/removeTags", to_remove), ("torrents/addTags", to_add)):
+        for tag in sorted(grouped):
+            mutations.extend(_chunks(endpoint, tag, grouped[tag], max_request_bytes))
+    return mutations
+
+
+async def apply_tag_mutations(
+    client: QBittorrentClient,
+    mutations: Iterable[TagMutation],
+    dry_run: Optional[bool] = None,
+) -> int:
+    """Send planned tags mutations to a client.
+
+    :param client: qBittorrent client.
+    :type client: QBittorrentClient
+    :param mutations: Planned mutations.
+    :type mutations: Iterable[TagMutation]
+    :param dry_run: Only log the mutations, defaults to ``settings.dry_run``.
+    :type dry_run: Optional[bool]
+    :return: Number of API calls sent.
+    :rtype: int
+    """
+    if dry_run is None:
+        dry_run = settings.dry_run
+    calls = 0
+    for mutation in mutations:
+        logger.info(
+            f"{'[DRY-RUN] ' if dry_run else ''}{mutation.endpoint} '{mutation.tag}'"
+            f" on {len(mutation.hashes)} torrents",
+        )
+        if not dry_run:
+            await client.post(mutation.endpoint, **mutation.data())
+            calls += 1
+    return calls
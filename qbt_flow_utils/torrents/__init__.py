@@ -0,0 +1,12 @@
+"""Torrents data structures for qbt_flow_utils."""
+from qbt_flow_utils.torrents.cross_seed import CrossSeedFamily, CrossSeedIndex
+from qbt_flow_utils.torrents.hit_and_run import HitAndRunScheduler
+from qbt_flow_utils.torrents.snapshot import TorrentSnapshot, parse_tags
+
+__all__ = [
+    "CrossSeedFamily",
+    "CrossSeedIndex",
+    "HitAndRunScheduler",
+    "TorrentSnapshot",
+    "parse_tags",
+]
@@ -0,0 +1,189 @@
+"""Cross-seed families index.
+
+Cross-seeded torrents share the same data on disk and must be removed
+together. Instead of comparing torrents pairwise, each torrent is hashed to a
+canonical signature (total size, content path, and file count with sorted
+file sizes when the file list is known) and torrents sharing a signature form
+a family. Building the index is O(n) and it is updated incrementally from the
+sync deltas.
+"""
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, Mapping, Optional, Set, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from qbt_flow_utils.qbittorrent.sync import SyncChanges
+from qbt_flow_utils.torrents.snapshot import TorrentSnapshot
+
+
+def torrent_signature(
+    torrent: Mapping[str, Any],
+    file_sizes: Optional[Iterable[int]] = None,
+) -> bytes:
+    """Return the canonical signature of a torrent data.
+
+    :param torrent: qBittorrent torrent properties.
+    :type torrent: Mapping[str, Any]
+    :param file_sizes: Sizes of the torrent files, from ``torrents/files``.
+    :type file_sizes: Optional[Iterable[int]]
+    :return: Signature digest, equal for torrents seeding the same data.
+    :rtype: bytes
+    """
+    content_path = torrent.get("content_path")
+    location = os.path.normpath(content_path) if content_path else torrent.get("name", "")
+    parts = [str(torrent.get("total_size") or torrent.get("size") or 0), location]
+    if file_sizes is not None:
+        sizes = sorted(file_sizes)
+        parts.append(str(len(sizes)))
+        parts.append(",".join(map(str, sizes)))
+    return hashlib.blake2b("\0".join(parts).encode(), digest_size=16).digest()
+
+
+@dataclass(frozen=True)
+class CrossSeedFamily:
+    """Torrents seeding the same data."""
+
+    hashes: FrozenSet[str]
+    size: int  # Reclaimable bytes, the shared data is counted once.
+
+
+class CrossSeedIndex:
+    """Group torrents into cross-seed families."""
+
+    def __init__(self) -> None:
+        self._signatures: Dict[str, bytes] = {}
+        self._sizes: Dict[str, int] = {}
+        self._file_sizes: Dict[str, Tuple[int, ...]] = {}
+        self._families: Dict[bytes, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def add(
+        self,
+        torrent_hash: str,
+        torrent: Mapping[str, Any],
+        file_sizes: Optional[Iterable[int]] = None,
+    ) -> None:
+        """Add or update a torrent.
+
+        :param torrent_hash: Torrent hash.
+        :type torrent_hash: str
+        :param torrent: qBittorrent torrent properties.
+        :type torrent: Mapping[str, Any]
+        :param file_sizes: Sizes of the torrent files, kept for later updates.
+        :type file_sizes: Optional[Iterable[int]]
+        """
+        if file_sizes is not None:
+            self._file_sizes[torrent_hash] = tuple(file_sizes)
+        signature = torrent_signature(torrent, self._file_sizes.get(torrent_hash))
+        previous = self._signatures.get(torrent_hash)
+        self._sizes[torrent_hash] = int(torrent.get("total_size") or torrent.get("size") or 0)
+        if previous == signature:
+            return
+        if previous is not None:
+            self._discard(torrent_hash, previous)
+        self._signatures[torrent_hash] = signature
+        self._families.setdefault(signature, set()).add(torrent_hash)
+
+    def _discard(self, torrent_hash: str, signature: bytes) -> None:
+        family = self._families[signature]
+        family.discard(torrent_hash)
+        if not family:
+            del self._families[signature]
+
+    def remove(self, torrent_hash: str) -> None:
+        """Remove a torrent.
+
+        :param torrent_hash: Torrent hash.
+        :type torrent_hash: str
+        """
+        signature = self._signatures.pop(torrent_hash, None)
+        self._sizes.pop(torrent_hash, None)
+        self._file_sizes.pop(torrent_hash, None)
+        if signature is not None:
+            self._discard(torrent_hash, signature)
+
+    def update(self, torrents: Mapping[str, Mapping[str, Any]], changes: SyncChanges) -> None:
+        """Apply the changes of a delta sync.
+
+        :param torrents: Current torrents keyed by hash.
+        :type torrents: Mapping[str, Mapping[str, Any]]
+        :param changes: Changes reported by :meth:`ClientStateStore.pop_changes`.
+        :type changes: SyncChanges
+        """
+        removed: Iterable[str] = changes.removed
+        changed: Iterable[str] = changes.changed
+        if changes.full_update:
+            removed = self._signatures.keys() - torrents.keys()
+            changed = torrents
+        for torrent_hash in removed:
+            self.remove(torrent_hash)
+        for torrent_hash in changed:
+            torrent = torrents.get(torrent_hash)
+            if torrent is not None:
+                self.add(torrent_hash, torrent)
+
+    def family(self, torrent_hash: str) -> CrossSeedFamily:
+        """Return the family of a torrent.
+
+        :param torrent_hash: Torrent hash.
+        :type torrent_hash: str
+        :return: Family, the torrent alone if it has no cross-seed.
+        :rtype: CrossSeedFamily
+        :raises KeyError: If the torrent is not indexed.
+        """
+        hashes = frozenset(self._families[self._signatures[torrent_hash]])
+        return CrossSeedFamily(hashes, max(self._sizes[h] for h in hashes))
+
+    def families(self) -> Iterator[CrossSeedFamily]:
+        """Iterate over the families of more than one torrent."""
+        for hashes in self._families.values():
+            if len(hashes) > 1:
+                yield CrossSeedFamily(frozenset(hashes), max(self._sizes[h] for h in hashes))
+
+    def family_codes(self, snapshot: TorrentSnapshot) -> npt.NDArray[np.int64]:
+        """Return a dense family id for every snapshot row.
+
+        Torrents missing from the index get a family of their own.
+
+        :param snapshot: Torrents snapshot.
+        :type snapshot: TorrentSnapshot
+        :return: Per torrent family id, in ``[0, families count)``.
+        :rtype: npt.NDArray[np.int64]
+        """
+        codes: Dict[Any, int] = {}
+        return np.fromiter(
+            (codes.setdefault(self._signatures.get(h, h), len(codes)) for h in snapshot.hashes),
+            dtype=np.int64,
+            count=len(snapshot),
+        )
+
+    def family_stats(
+        self,
+        snapshot: TorrentSnapshot,
+        scores: npt.NDArray[np.float64],
+    ) -> Tuple[npt.NDArray[np.int64], npt.NDArray[np.float64], npt.NDArray[np.int64]]:
+        """Aggregate removal scores and reclaimable bytes per family.
+
+        A family is only as removable as its least removable member, so its
+        score is the minimum score of its members.
+
+        :param snapshot: Torrents snapshot.
+        :type snapshot: TorrentSnapshot
+        :param scores: Per torrent removal scores.
+        :type scores: npt.NDArray[np.float64]
+        :return: Per torrent family id, then per family score and reclaimable
+            bytes, so that ``family_score[codes[row]]`` is a single lookup.
+        :rtype: Tuple[npt.NDArray[np.int64], npt.NDArray[np.float64], npt.NDArray[np.int64]]
+        """
+        codes = self.family_codes(snapshot)
+        count = int(codes.max()) + 1 if len(codes) else 0
+        family_score = np.full(count, np.inf, dtype=np.float64)
+        np.minimum.at(family_score, codes, scores)
+        family_bytes = np.zeros(count, dtype=np.int64)
+        np.maximum.at(family_bytes, codes, snapshot.size)
+        return codes, family_score, family_bytes
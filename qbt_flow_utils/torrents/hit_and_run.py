@@ -0,0 +1,229 @@
+"""Hit and run deadline scheduler.
+
+Instead of rechecking every protected torrent on each cycle, the scheduler
+projects when each torrent becomes safe, i.e. reaches its tracker
+``min_seed_time`` or ``min_ratio``, and keeps the deadlines in a heap. The
+daemon only has to wake at :meth:`HitAndRunScheduler.next_deadline`.
+
+Ratio deadlines are projected from the observed upload rate and are only
+projected again when a delta sync reports a changed ``uploaded`` total.
+"""
+import heapq
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from qbt_flow_utils.config.runtime import HitAndRunRules, TrackerRules
+from qbt_flow_utils.qbittorrent.sync import SyncChanges
+from qbt_flow_utils.trackers.matcher import TrackerMatcher, known_tracker
+
+# Weight of the last observed upload rate in the rate moving average.
+RATE_SMOOTHING = 0.3
+
+
+def is_safe(torrent: Mapping[str, Any], rules: HitAndRunRules) -> bool:
+    """Return whether a torrent is no longer hit and run protected.
+
+    :param torrent: qBittorrent torrent properties.
+    :type torrent: Mapping[str, Any]
+    :param rules: Hit and run rules of its tracker.
+    :type rules: HitAndRunRules
+    :return: True if ignored by the tracker or if a threshold is reached.
+    :rtype: bool
+    """
+    return (
+        rules.ignore
+        or (torrent.get("seeding_time") or 0) >= rules.min_seed_time
+        or (torrent.get("ratio") or 0) >= rules.min_ratio
+    )
+
+
+def project_safe_at(
+    torrent: Mapping[str, Any],
+    rules: HitAndRunRules,
+    now: float,
+    upload_rate: float = 0,
+) -> float:
+    """Project when a torrent stops being hit and run protected.
+
+    Seeding time is assumed to keep growing in real time, and the ratio at
+    ``upload_rate`` bytes/s.
+
+    :param torrent: qBittorrent torrent properties.
+    :type torrent: Mapping[str, Any]
+    :param rules: Hit and run rules of its tracker.
+    :type rules: HitAndRunRules
+    :param now: Current timestamp.
+    :type now: float
+    :param upload_rate: Observed upload rate in bytes/s.
+    :type upload_rate: float
+    :return: Timestamp, ``now`` if already safe, ``math.inf`` if never.
+    :rtype: float
+    """
+    if is_safe(torrent, rules):
+        return now
+    safe_at = now + rules.min_seed_time - (torrent.get("seeding_time") or 0)
+    if upload_rate > 0 and rules.min_ratio != math.inf:
+        downloaded = torrent.get("downloaded") or torrent.get("size") or 0
+        missing = rules.min_ratio * downloaded - (torrent.get("uploaded") or 0)
+        safe_at = min(safe_at, now + missing / upload_rate)
+    return safe_at
+
+
+@dataclass
+class _Tracked:
+    rules: HitAndRunRules
+    uploaded: int
+    observed_at: float
+    upload_rate: float
+    safe_at: float
+
+
+class HitAndRunScheduler:
+    """Keep hit and run protected torrents ordered by projected safe time."""
+
+    def __init__(
+        self,
+        trackers: Mapping[str, TrackerRules],
+        tracker_matcher: TrackerMatcher,
+    ) -> None:
+        """Initialize the scheduler.
+
+        :param trackers: Runtime trackers config keyed by tracker tag.
+        :type trackers: Mapping[str, TrackerRules]
+        :param tracker_matcher: Matcher resolving the tracker tag of torrents.
+        :type tracker_matcher: TrackerMatcher
+        """
+        self.trackers = trackers
+        self.tracker_matcher = tracker_matcher
+        self.projections = 0
+        self._tracked: Dict[str, _Tracked] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._released: List[str] = []
+
+    @property
+    def protected(self) -> Set[str]:
+        """Hashes of the torrents still hit and run protected."""
+        return set(self._tracked)
+
+    def _rules(self, torrent: Mapping[str, Any]) -> Optional[HitAndRunRules]:
+        tag = self.tracker_matcher.match([known_tracker(torrent)], torrent.get("private"))
+        tracker = self.trackers.get(tag)
+        return tracker.hit_and_run if tracker is not None else None
+
+    def _schedule(self, torrent_hash: str, tracked: _Tracked, torrent: Mapping[str, Any]) -> None:
+        tracked.safe_at = project_safe_at(
+            torrent,
+            tracked.rules,
+            tracked.observed_at,
+            tracked.upload_rate,
+        )
+        self.projections += 1
+        if tracked.safe_at != math.inf:
+            heapq.heappush(self._heap, (tracked.safe_at, torrent_hash))
+
+    def _observe(self, torrent_hash: str, torrent: Mapping[str, Any], now: float) -> None:
+        rules = self._rules(torrent)
+        uploaded = torrent.get("uploaded") or 0
+        tracked = self._tracked.get(torrent_hash)
+        if rules is None or is_safe(torrent, rules):
+            if self._tracked.pop(torrent_hash, None) is not None and rules is not None:
+                self._released.append(torrent_hash)
+            return
+        if tracked is None or tracked.rules != rules:
+            tracked = self._tracked[torrent_hash] = _Tracked(rules, uploaded, now, 0, math.inf)
+        elif uploaded == tracked.uploaded:
+            return
+        else:
+            rate = (uploaded - tracked.uploaded) / max(now - tracked.observed_at, 1e-3)
+            if tracked.upload_rate:
+                rate = RATE_SMOOTHING * rate + (1 - RATE_SMOOTHING) * tracked.upload_rate
+            tracked.uploaded, tracked.observed_at, tracked.upload_rate = uploaded, now, rate
+        self._schedule(torrent_hash, tracked, torrent)
+
+    def update(
+        self,
+        torrents: Mapping[str, Mapping[str, Any]],
+        changes: SyncChanges,
+        now: Optional[float] = None,
+    ) -> None:
+        """Apply the changes of a delta sync.
+
+        New torrents are projected, known ones only if their ``uploaded``
+        total changed, removed ones are dropped.
+
+        :param torrents: Current torrents keyed by hash.
+        :type torrents: Mapping[str, Mapping[str, Any]]
+        :param changes: Changes reported by :meth:`ClientStateStore.pop_changes`.
+        :type changes: SyncChanges
+        :param now: Current timestamp, defaults to ``time.time()``.
+        :type now: Optional[float]
+        """
+        now = time.time() if now is None else now
+        changed: Iterable[str] = torrents if changes.full_update else changes.changed
+        for torrent_hash in changes.removed:
+            self._tracked.pop(torrent_hash, None)
+        if changes.full_update:
+            for torrent_hash in self._tracked.keys() - torrents.keys():
+                del self._tracked[torrent_hash]
+        for torrent_hash in changed:
+            torrent = torrents.get(torrent_hash)
+            if torrent is not None:
+                self._observe(torrent_hash, torrent, now)
+
+    def next_deadline(self) -> Optional[float]:
+        """Return the earliest projected safe time.
+
+        :return: Timestamp, None if no torrent is protected.
+        :rtype: Optional[float]
+        """
+        while self._heap:
+            safe_at, torrent_hash = self._heap[0]
+            tracked = self._tracked.get(torrent_hash)
+            if tracked is not None and tracked.safe_at == safe_at:
+                return safe_at
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(
+        self,
+        torrents: Mapping[str, Mapping[str, Any]],
+        now: Optional[float] = None,
+    ) -> List[str]:
+        """Pop the torrents whose deadline passed and that are now safe.
+
+        Due torrents are checked against their current properties; those not
+        safe yet (paused, slower upload) are projected again. Torrents found
+        safe by :meth:`update` are returned too.
+
+        :param torrents: Current torrents keyed by hash.
+        :type torrents: Mapping[str, Mapping[str, Any]]
+        :param now: Current timestamp, defaults to ``time.time()``.
+        :type now: Optional[float]
+        :return: Hashes of torrents no longer protected, their hit and run tag
+            can be cleared and they are eligible for removal.
+        :rtype: List[str]
+        """
+        now = time.time() if now is None else now
+        safe, self._released = [h for h in self._released if h in torrents], []
+        rescheduled: List[str] = []
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > now:
+                break
+            _, torrent_hash = heapq.heappop(self._heap)
+            torrent = torrents.get(torrent_hash)
+            tracked = self._tracked[torrent_hash]
+            if torrent is None or is_safe(torrent, tracked.rules):
+                del self._tracked[torrent_hash]
+                if torrent is not None:
+                    safe.append(torrent_hash)
+            else:
+                tracked.safe_at = math.nan
+                rescheduled.append(torrent_hash)
+        for torrent_hash in rescheduled:
+            tracked = self._tracked[torrent_hash]
+            tracked.observed_at = now
+            self._schedule(torrent_hash, tracked, torrents[torrent_hash])
+        return safe
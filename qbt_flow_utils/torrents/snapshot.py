@@ -0,0 +1,169 @@
+"""Columnar snapshot of torrents.
+
+Per-torrent values are stored in NumPy arrays, one row per torrent, so that
+engines work on whole columns instead of looping over qBittorrent dicts.
+Tags, tracker tags and states are dictionary encoded: ``tag_names`` /
+``tracker_names`` / ``state_names`` hold the vocabulary and the ``*_codes``
+arrays index into it.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from qbt_flow_utils.trackers.matcher import TrackerMatcher, known_tracker
+
+
+def parse_tags(tags: str) -> List[str]:
+    """Split a qBittorrent comma separated tags string.
+
+    :param tags: Tags string, e.g. ``"H&R, noHL"``.
+    :type tags: str
+    :return: List of tags.
+    :rtype: List[str]
+    """
+    return [tag for tag in (part.strip() for part in tags.split(",")) if tag]
+
+
+@dataclass(frozen=True)
+class TorrentSnapshot:
+    """Columnar snapshot of a client torrents."""
+
+    hashes: npt.NDArray[np.object_]
+    size: npt.NDArray[np.int64]
+    seeding_time: npt.NDArray[np.int64]
+    ratio: npt.NDArray[np.float64]
+    seeders: npt.NDArray[np.int64]
+    uploaded: npt.NDArray[np.int64]
+    up_limit: npt.NDArray[np.int64]
+    added_on: npt.NDArray[np.int64]
+    tracker_names: List[str]
+    tracker_codes: npt.NDArray[np.int32]
+    tag_names: List[str]
+    tag_rows: npt.NDArray[np.int32]
+    tag_codes: npt.NDArray[np.int32]
+    state_names: List[str]
+    state_codes: npt.NDArray[np.int32]
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    @classmethod
+    def from_torrents(
+        cls,
+        torrents: Mapping[str, Mapping[str, Any]],
+        tracker_matcher: Optional[TrackerMatcher] = None,
+    ) -> "TorrentSnapshot":
+        """Build a snapshot from qBittorrent torrents dicts.
+
+        :param torrents: Torrents properties keyed by hash, as returned by
+            ``sync/maindata`` or ``torrents/info``.
+        :type torrents: Mapping[str, Mapping[str, Any]]
+        :param tracker_matcher: Matcher used to resolve the tracker tag of each
+            torrent, tracker tag is left empty when not provided.
+        :type tracker_matcher: Optional[TrackerMatcher]
+        :return: Torrents snapshot.
+        :rtype: TorrentSnapshot
+        """
+        count = len(torrents)
+        values = list(torrents.values())
+
+        def column(key: str, dtype: Any) -> Any:
+            return np.fromiter((t.get(key) or 0 for t in values), dtype=dtype, count=count)
+
+        tracker_names: List[str] = [""]
+        tracker_index: Dict[str, int] = {"": 0}
+        tracker_codes = np.zeros(count, dtype=np.int32)
+        if tracker_matcher is not None:
+            for row, torrent in enumerate(values):
+                tag = tracker_matcher.match([known_tracker(torrent)], torrent.get("private"))
+                code = tracker_index.get(tag)
+                if code is None:
+                    code = tracker_index[tag] = len(tracker_names)
+                    tracker_names.append(tag)
+                tracker_codes[row] = code
+
+        tag_names: List[str] = []
+        tag_index: Dict[str, int] = {}
+        tag_rows: List[int] = []
+        tag_codes: List[int] = []
+        for row, torrent in enumerate(values):
+            for tag in parse_tags(torrent.get("tags") or ""):
+                code = tag_index.get(tag)
+                if code is None:
+                    code = tag_index[tag] = len(tag_names)
+                    tag_names.append(tag)
+                tag_rows.append(row)
+                tag_codes.append(code)
+
+        state_names: List[str] = []
+        state_index: Dict[str, int] = {}
+        state_codes = np.zeros(count, dtype=np.int32)
+        for row, torrent in enumerate(values):
+            state = torrent.get("state") or ""
+            code = state_index.get(state)
+            if code is None:
+                code = state_index[state] = len(state_names)
+                state_names.append(state)
+            state_codes[row] = code
+
+        return cls(
+            hashes=np.array(list(torrents), dtype=object),
+            size=column("size", np.int64),
+            seeding_time=column("seeding_time", np.int64),
+            ratio=column("ratio", np.float64),
+            seeders=column("num_complete", np.int64),
+            uploaded=column("uploaded", np.int64),
+            up_limit=column("up_limit", np.int64),
+            added_on=column("added_on", np.int64),
+            tracker_names=tracker_names,
+            tracker_codes=tracker_codes,
+            tag_names=tag_names,
+            tag_rows=np.array(tag_rows, dtype=np.int32),
+            tag_codes=np.array(tag_codes, dtype=np.int32),
+            state_names=state_names,
+            state_codes=state_codes,
+        )
+
+    def per_torrent_sum(self, tag_values: Mapping[str, float]) -> npt.NDArray[np.float64]:
+        """Sum a value over the tags of each torrent.
+
+        :param tag_values: Value of each tag name, missing tags count for 0.
+        :type tag_values: Mapping[str, float]
+        :return: Per torrent sum.
+        :rtype: npt.NDArray[np.float64]
+        """
+        table = np.array([tag_values.get(name, 0) for name in self.tag_names], dtype=np.float64)
+        weights = table[self.tag_codes] if len(table) else None
+        return np.bincount(self.tag_rows, weights=weights, minlength=len(self)).astype(np.float64)
+
+    def tag_count(self) -> npt.NDArray[np.int64]:
+        """Return the number of tags of each torrent.
+
+        :return: Per torrent tags count.
+        :rtype: npt.NDArray[np.int64]
+        """
+        return np.bincount(self.tag_rows, minlength=len(self)).astype(np.int64)
+
+    def has_any_tag(self, tags: List[str]) -> npt.NDArray[np.bool_]:
+        """Return a mask of torrents having at least one of the given tags.
+
+        :param tags: Tags names.
+        :type tags: List[str]
+        :return: Per torrent boolean mask.
+        :rtype: npt.NDArray[np.bool_]
+        """
+        return self.per_torrent_sum({tag: 1 for tag in tags}) > 0
+
+    def in_states(self, states: Iterable[str]) -> npt.NDArray[np.bool_]:
+        """Return a mask of torrents in one of the given states.
+
+        :param states: qBittorrent states, e.g. ``pausedUP``.
+        :type states: Iterable[str]
+        :return: Per torrent boolean mask.
+        :rtype: npt.NDArray[np.bool_]
+        """
+        wanted = set(states)
+        table = np.array([name in wanted for name in self.state_names], dtype=np.bool_)
+        return table[self.state_codes]
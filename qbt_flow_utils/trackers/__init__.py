@@ -0,0 +1,8 @@
+"""Trackers utilities for qbt_flow_utils.
+
+:mod:`qbt_flow_utils.trackers.status` is not imported here: it pulls in the
+HTTP client, and the config only needs the matcher.
+"""
+from qbt_flow_utils.trackers.matcher import TrackerMatcher, known_tracker
+
+__all__ = ["TrackerMatcher", "known_tracker"]
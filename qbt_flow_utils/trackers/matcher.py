@@ -0,0 +1,243 @@
+"""Compiled tracker keywords matcher.
+
+Trackers keywords are compiled once into two structures:
+
+- a hostname-suffix trie for keywords that look like hostnames
+  (``example.com`` matches ``tracker.example.com`` but not ``notexample.com``),
+- an Aho-Corasick automaton for every other keyword, matched as a substring
+  of the whole announce URL.
+
+Each announce URL is then resolved in a single pass, whatever the number of
+configured trackers.
+"""
+import re
+import sys
+from collections import deque
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from qbt_flow_utils.logging import logger
+
+_HOSTNAME_RE = re.compile(r"^[a-z0-9-]+(\.[a-z0-9-]+)+$")
+_URL_HOST_RE = re.compile(r"^[a-z][a-z0-9+.-]*://(?:[^@/?#]*@)?([^:/?#@\[\]]+)")
+_TAG = ""  # Trie node key holding the tracker tag, labels are never empty.
+
+# Synthetic torrent field set by the client state sync, the last non empty
+# ``tracker``: qBittorrent clears it when none of the trackers works.
+LAST_TRACKER = "last_tracker"
+
+
+def known_tracker(torrent: Mapping[str, Any]) -> str:
+    """Return the working tracker of a torrent, else the last one seen working.
+
+    :param torrent: Torrent properties, as kept by the client state sync.
+    :type torrent: Mapping[str, Any]
+    :return: Tracker URL, empty if never seen working.
+    :rtype: str
+    """
+    return torrent.get("tracker") or torrent.get(LAST_TRACKER) or ""
+
+
+class _AhoCorasick:
+    """Minimal Aho-Corasick automaton returning the longest keyword found."""
+
+    def __init__(self, keywords: Mapping[str, str]) -> None:
+        """Build the automaton.
+
+        :param keywords: Mapping of keyword to tracker tag.
+        :type keywords: Mapping[str, str]
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Optional[Tuple[int, str]]] = [None]
+
+        for keyword, tag in keywords.items():
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(None)
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._out[state] = (len(keyword), tag)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                inherited = self._out[self._fail[next_state]]
+                current = self._out[next_state]
+                if inherited is not None and (current is None or inherited[0] > current[0]):
+                    self._out[next_state] = inherited
+
+    def __bool__(self) -> bool:
+        return len(self._goto) > 1
+
+    def search(self, text: str) -> Optional[str]:
+        """Return the tag of the longest keyword found in text.
+
+        :param text: Text to scan.
+        :type text: str
+        :return: Tracker tag or None.
+        :rtype: Optional[str]
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        best: Optional[Tuple[int, str]] = None
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            hit = out[state]
+            if hit is not None and (best is None or hit[0] > best[0]):
+                best = hit
+        return best[1] if best is not None else None
+
+
+class TrackerMatcher:
+    """Resolve torrents announce URLs to a tracker tag."""
+
+    def __init__(
+        self,
+        trackers_keywords: Mapping[str, Iterable[str]],
+        unknown_tracker_tag: str,
+        public_tag: str,
+        cache_size: int = 65536,
+    ) -> None:
+        """Compile trackers keywords.
+
+        When the same keyword is declared by several trackers, the first one wins.
+
+        :param trackers_keywords: Mapping of tracker tag to its keywords.
+        :type trackers_keywords: Mapping[str, Iterable[str]]
+        :param unknown_tracker_tag: Tag for private torrents without configured tracker.
+        :type unknown_tracker_tag: str
+        :param public_tag: Tag for public torrents without configured tracker.
+        :type public_tag: str
+        :param cache_size: Max number of URLs kept in the lookup cache.
+        :type cache_size: int
+        """
+        self.unknown_tracker_tag = sys.intern(unknown_tracker_tag)
+        self.public_tag = sys.intern(public_tag)
+        self._cache_size = cache_size
+        self._cache: Dict[str, Optional[str]] = {}
+        self._hosts_trie: Dict[str, Any] = {}
+
+        owners: Dict[str, str] = {}
+        substrings: Dict[str, str] = {}
+        for tracker_tag, keywords in trackers_keywords.items():
+            tag = sys.intern(tracker_tag)
+            for raw_keyword in keywords:
+                keyword = raw_keyword.strip().lower()
+                if not keyword:
+                    continue
+                if keyword in owners:
+                    if owners[keyword] != tag:
+                        logger.warning(
+                            f"Keyword '{keyword}' of tracker '{tag}' already used by"
+                            f" '{owners[keyword]}', ignored.",
+                        )
+                    continue
+                owners[keyword] = tag
+                if _HOSTNAME_RE.match(keyword):
+                    self._add_host(keyword, tag)
+                else:
+                    substrings[keyword] = tag
+
+        self._substrings = _AhoCorasick(substrings)
+
+    @classmethod
+    def from_config(
+        cls,
+        trackers_config: Mapping[str, Any],
+        tags_config: Mapping[str, Any],
+    ) -> "TrackerMatcher":
+        """Build a matcher from loaded trackers and tags config.
+
+        :param trackers_config: Trackers config keyed by tracker tag.
+        :type trackers_config: Mapping[str, Any]
+        :param tags_config: Tags config.
+        :type tags_config: Mapping[str, Any]
+        :return: Compiled matcher.
+        :rtype: TrackerMatcher
+        """
+        return cls(
+            {tag: config["tracker_keywords"] for tag, config in trackers_config.items()},
+            unknown_tracker_tag=tags_config["unknown_tracker_tag"],
+            public_tag=tags_config["public_tag"],
+        )
+
+    def _add_host(self, host: str, tag: str) -> None:
+        node = self._hosts_trie
+        for label in reversed(host.split(".")):
+            node = node.setdefault(label, {})
+        node[_TAG] = tag
+
+    def _match_host(self, host: str) -> Optional[str]:
+        node = self._hosts_trie
+        found = None
+        for label in reversed(host.split(".")):
+            node = node.get(label)  # type: ignore [assignment]
+            if node is None:
+                break
+            found = node.get(_TAG, found)
+        return found
+
+    def match_url(self, url: str) -> Optional[str]:
+        """Return the tracker tag of an announce URL.
+
+        The most specific hostname keyword wins, then the longest substring keyword.
+
+        :param url: Announce URL.
+        :type url: str
+        :return: Tracker tag, or None if no configured tracker matches.
+        :rtype: Optional[str]
+        """
+        try:
+            return self._cache[url]
+        except KeyError:
+            pass
+
+        lowered = url.lower()
+        host = _URL_HOST_RE.match(lowered)
+        tag = self._match_host(host.group(1)) if host else None
+        if tag is None and self._substrings:
+            tag = self._substrings.search(lowered)
+
+        if len(self._cache) >= self._cache_size:
+            self._cache.clear()
+        self._cache[url] = tag
+        return tag
+
+    def match(self, urls: Iterable[str], is_private: Optional[bool] = None) -> str:
+        """Return the tag of a torrent from its announce URLs.
+
+        Falls back to ``unknown_tracker_tag`` for private torrents, and to
+        ``public_tag`` for public torrents or trackerless ones of unknown
+        privacy.
+
+        :param urls: Torrent announce URLs.
+        :type urls: Iterable[str]
+        :param is_private: Torrent private flag, if known.
+        :type is_private: Optional[bool]
+        :return: Tracker tag.
+        :rtype: str
+        """
+        has_url = False
+        for url in urls:
+            if not url:
+                continue
+            has_url = True
+            tag = self.match_url(url)
+            if tag is not None:
+                return tag
+        if is_private or (is_private is None and has_url):
+            return self.unknown_tracker_tag
+        return self.public_tag
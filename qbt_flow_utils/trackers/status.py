@@ -0,0 +1,329 @@
+"""Cached per torrent tracker status fetcher.
+
+Tracker statuses are only exposed by ``torrents/trackers``, one call per
+torrent. Instead of calling it for every torrent on each cycle, the fetcher
+follows the ``sync/maindata`` deltas and only fetches again:
+
+- new torrents,
+- torrents whose ``state`` or working ``tracker`` changed, qBittorrent
+  clears ``tracker`` when no tracker works anymore,
+- torrents not seen working that announced again, i.e. whose
+  ``reannounce`` countdown was reset,
+- cached statuses past their TTL, shorter for failing trackers.
+
+Calls are sent by a few concurrent workers, retried with an exponential
+backoff, and capped by ``max_calls`` per cycle, retries included. Torrents
+left over are fetched first on the next cycle.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+import aiohttp
+
+from qbt_flow_utils.logging import logger
+from qbt_flow_utils.metrics import record_cache_lookups
+from qbt_flow_utils.qbittorrent.client import QBittorrentClient, QBittorrentError
+from qbt_flow_utils.qbittorrent.sync import SyncChanges
+from qbt_flow_utils.settings import settings
+from qbt_flow_utils.trackers.matcher import TrackerMatcher
+
+# torrents/trackers status values.
+DISABLED = 0
+NOT_CONTACTED = 1
+WORKING = 2
+UPDATING = 3
+NOT_WORKING = 4
+
+# DHT, PeX and LSD are listed as pseudo trackers, e.g. "** [DHT] **".
+_PSEUDO_PREFIX = "** ["
+
+# A torrent status is the first one found among its trackers.
+_STATUS_ORDER = (WORKING, UPDATING, NOT_CONTACTED, NOT_WORKING, DISABLED)
+
+# Seconds a status is cached, None for torrents without tracker.
+DEFAULT_TTLS: Dict[Optional[int], float] = {
+    WORKING: 6 * 3600,
+    UPDATING: 300,
+    NOT_CONTACTED: 300,
+    NOT_WORKING: 1800,
+    DISABLED: 24 * 3600,
+    None: 24 * 3600,
+}
+
+
+def tracker_status(trackers: Iterable[Mapping[str, Any]]) -> Optional[int]:
+    """Aggregate the trackers of a torrent into a single status.
+
+    DHT, PeX and LSD pseudo trackers are ignored.
+
+    :param trackers: ``torrents/trackers`` response.
+    :type trackers: Iterable[Mapping[str, Any]]
+    :return: Best status of the torrent trackers, None without tracker.
+    :rtype: Optional[int]
+    """
+    statuses = {
+        tracker.get("status")
+        for tracker in trackers
+        if not tracker["url"].startswith(_PSEUDO_PREFIX)
+    }
+    return next((status for status in _STATUS_ORDER if status in statuses), None)
+
+
+@dataclass
+class _Entry:
+    urls: Tuple[str, ...]
+    status: Optional[int]
+    expires_at: float
+    fingerprint: Tuple[Any, str]
+
+
+class TrackerStatusFetcher:
+    """Keep the trackers status of a client torrents with few API calls."""
+
+    def __init__(
+        self,
+        ttls: Optional[Mapping[Optional[int], float]] = None,
+        max_calls: Optional[int] = None,
+        workers: Optional[int] = None,
+        retries: int = 2,
+        backoff: float = 1.0,
+    ) -> None:
+        """Initialize the fetcher.
+
+        :param ttls: Seconds a status is cached, keyed by status, defaults to
+            :data:`DEFAULT_TTLS`.
+        :type ttls: Optional[Mapping[Optional[int], float]]
+        :param max_calls: Max calls per :meth:`fetch`, retries included,
+            defaults to ``settings.tracker_status_max_calls``.
+        :type max_calls: Optional[int]
+        :param workers: Concurrent calls, defaults to
+            ``settings.tracker_status_workers``.
+        :type workers: Optional[int]
+        :param retries: Retries of a failed call.
+        :type retries: int
+        :param backoff: Seconds before the first retry, doubled on each retry.
+        :type backoff: float
+        """
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_calls = settings.tracker_status_max_calls if max_calls is None else max_calls
+        self.workers = workers or settings.tracker_status_workers
+        self.retries = retries
+        self.backoff = backoff
+        self._entries: Dict[str, _Entry] = {}
+        # Last seen state, tracker and reannounce countdown of each torrent.
+        self._seen: Dict[str, Tuple[Any, str, int]] = {}
+        # Stale torrents in the order they became stale.
+        self._stale: Dict[str, None] = {}
+        self._budget = 0
+
+    @property
+    def stale(self) -> Set[str]:
+        """Hashes of the torrents waiting to be fetched, expired ones excluded."""
+        return set(self._stale)
+
+    def update(self, torrents: Mapping[str, Mapping[str, Any]], changes: SyncChanges) -> None:
+        """Apply the changes of a delta sync.
+
+        :param torrents: Current torrents keyed by hash.
+        :type torrents: Mapping[str, Mapping[str, Any]]
+        :param changes: Changes reported by :meth:`ClientStateStore.pop_changes`.
+        :type changes: SyncChanges
+        """
+        removed: Iterable[str] = changes.removed
+        if changes.full_update:
+            removed = self._seen.keys() - torrents.keys()
+        for torrent_hash in list(removed):
+            self._seen.pop(torrent_hash, None)
+            self._entries.pop(torrent_hash, None)
+            self._stale.pop(torrent_hash, None)
+
+        changed: Iterable[str] = torrents if changes.full_update else changes.changed
+        for torrent_hash in changed:
+            torrent = torrents.get(torrent_hash)
+            if torrent is None:
+                continue
+            state, tracker = torrent.get("state"), torrent.get("tracker") or ""
+            reannounce = torrent.get("reannounce") or 0
+            previous = self._seen.get(torrent_hash)
+            self._seen[torrent_hash] = (state, tracker, reannounce)
+            entry = self._entries.get(torrent_hash)
+            if (
+                entry is None
+                or entry.fingerprint != (state, tracker)
+                or (entry.status != WORKING and previous is not None and reannounce > previous[2])
+            ):
+                self._stale.setdefault(torrent_hash, None)
+
+    def _select(self, now: float) -> List[str]:
+        # Never fetched torrents first, then changed ones, each in the order they
+        # became stale so none is left behind, then the oldest expired.
+        selected = sorted(self._stale, key=lambda torrent_hash: torrent_hash in self._entries)
+        if len(selected) < self.max_calls:
+            expired = sorted(
+                (entry.expires_at, torrent_hash)
+                for torrent_hash, entry in self._entries.items()
+                if entry.expires_at <= now and torrent_hash not in self._stale
+            )
+            selected.extend(torrent_hash for _, torrent_hash in expired)
+        return selected[: self.max_calls]
+
+    async def _fetch_one(
+        self,
+        client: QBittorrentClient,
+        torrent_hash: str,
+    ) -> Optional[List[Dict[str, Any]]]:
+        for attempt in range(self.retries + 1):
+            if self._budget <= 0:
+                return None
+            self._budget -= 1
+            try:
+                trackers: List[Dict[str, Any]] = await client.get(
+                    "torrents/trackers",
+                    hash=torrent_hash,
+                )
+            except (QBittorrentError, aiohttp.ClientError, asyncio.TimeoutError) as error:
+                if attempt == self.retries:
+                    logger.bind(hash=torrent_hash).warning(
+                        f"Unable to fetch trackers of torrent {torrent_hash}: {error}",
+                    )
+                    return None
+                await asyncio.sleep(self.backoff * 2**attempt)
+            else:
+                return trackers
+        return None  # pragma: no cover
+
+    def _store(self, torrent_hash: str, trackers: List[Dict[str, Any]], now: float) -> bool:
+        seen = self._seen.get(torrent_hash)
+        if seen is None:
+            # Removed while fetching.
+            return False
+        status = tracker_status(trackers)
+        self._entries[torrent_hash] = _Entry(
+            urls=tuple(
+                tracker["url"]
+                for tracker in trackers
+                if not tracker["url"].startswith(_PSEUDO_PREFIX)
+            ),
+            status=status,
+            expires_at=now + self.ttls[status],
+            fingerprint=seen[:2],
+        )
+        self._stale.pop(torrent_hash, None)
+        return True
+
+    async def fetch(self, client: QBittorrentClient, now: Optional[float] = None) -> int:
+        """Fetch the trackers of the stale and expired torrents.
+
+        :param client: Client of the torrents.
+        :type client: QBittorrentClient
+        :param now: Current timestamp, defaults to ``time.time()``.
+        :type now: Optional[float]
+        :return: Number of API calls sent.
+        :rtype: int
+        """
+        now = time.time() if now is None else now
+        selected = self._select(now)
+        if not selected:
+            return 0
+        self._budget = self.max_calls
+        queue: "asyncio.Queue[str]" = asyncio.Queue()
+        for torrent_hash in selected:
+            queue.put_nowait(torrent_hash)
+
+        fetched = 0
+
+        async def worker() -> None:
+            nonlocal fetched
+            while self._budget > 0 and not queue.empty():
+                torrent_hash = queue.get_nowait()
+                trackers = await self._fetch_one(client, torrent_hash)
+                if trackers is not None and self._store(torrent_hash, trackers, now):
+                    fetched += 1
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(selected)))))
+        calls = self.max_calls - self._budget
+        record_cache_lookups("tracker_status", len(self._seen) - len(selected), len(selected))
+        logger.debug(
+            f"Fetched trackers of {fetched} torrents in {calls} calls,"
+            f" {len(self._stale)} left stale",
+        )
+        return calls
+
+    def status(self, torrent_hash: str) -> Optional[int]:
+        """Return the cached trackers status of a torrent.
+
+        :param torrent_hash: Torrent hash.
+        :type torrent_hash: str
+        :return: Status, None if never fetched or without tracker.
+        :rtype: Optional[int]
+        """
+        entry = self._entries.get(torrent_hash)
+        return entry.status if entry is not None else None
+
+    def urls(self, torrent_hash: str) -> Tuple[str, ...]:
+        """Return the cached announce URLs of a torrent.
+
+        :param torrent_hash: Torrent hash.
+        :type torrent_hash: str
+        :return: Announce URLs, empty if never fetched.
+        :rtype: Tuple[str, ...]
+        """
+        entry = self._entries.get(torrent_hash)
+        return entry.urls if entry is not None else ()
+
+    def errors(self) -> Set[str]:
+        """Return the torrents whose trackers all report errors.
+
+        :return: Torrents hashes.
+        :rtype: Set[str]
+        """
+        return {
+            torrent_hash
+            for torrent_hash, entry in self._entries.items()
+            if entry.status == NOT_WORKING
+        }
+
+    def desired_tags(
+        self,
+        torrents: Mapping[str, Mapping[str, Any]],
+        tracker_matcher: TrackerMatcher,
+        tags_config: Mapping[str, Any],
+    ) -> Dict[str, List[str]]:
+        """Return the tracker and tracker error tags of the fetched torrents.
+
+        Unlike the ``tracker`` field of ``sync/maindata``, empty when no
+        tracker works, the fetched announce URLs resolve the tracker of
+        failing torrents too. Tags of the other auto tags families are not
+        included.
+
+        :param torrents: Current torrents keyed by hash.
+        :type torrents: Mapping[str, Mapping[str, Any]]
+        :param tracker_matcher: Matcher resolving the tracker tags.
+        :type tracker_matcher: TrackerMatcher
+        :param tags_config: Tags config.
+        :type tags_config: Mapping[str, Any]
+        :return: Tags keyed by torrent hash, never fetched torrents are missing.
+        :rtype: Dict[str, List[str]]
+        """
+        skipped = set()
+        if not tags_config.get("auto_tags_public"):
+            skipped.add(tracker_matcher.public_tag)
+        if not tags_config.get("auto_tags_unknown_trackers"):
+            skipped.add(tracker_matcher.unknown_tracker_tag)
+        error_tag = (
+            tags_config["tracker_error_tag"] if tags_config.get("auto_tags_tracker_error") else None
+        )
+
+        desired: Dict[str, List[str]] = {}
+        for torrent_hash, entry in self._entries.items():
+            torrent = torrents.get(torrent_hash)
+            if torrent is None:
+                continue
+            tag = tracker_matcher.match(entry.urls, torrent.get("private"))
+            tags = [tag] if tag not in skipped else []
+            if error_tag is not None and entry.status == NOT_WORKING:
+                tags.append(error_tag)
+            desired[torrent_hash] = tags
+        return desired
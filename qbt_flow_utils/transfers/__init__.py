@@ -0,0 +1,12 @@
+"""Torrent payload transfers between clients."""
+from qbt_flow_utils.transfers.copier import ChecksumError, RateLimiter, copy_file_resumable
+from qbt_flow_utils.transfers.scheduler import TransferHost, TransferJob, TransferScheduler
+
+__all__ = [
+    "ChecksumError",
+    "RateLimiter",
+    "copy_file_resumable",
+    "TransferHost",
+    "TransferJob",
+    "TransferScheduler",
+]
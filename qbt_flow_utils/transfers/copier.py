@@ -0,0 +1,151 @@
+"""Resumable, checksummed and rate limited file copies.
+
+Files are copied to ``<target>.part`` and renamed over the target once
+complete. An interrupted copy resumes from the end of its ``.part`` file,
+after checking that the copied prefix still matches the source. The SHA-256
+of the source bytes is computed while copying, then compared to the target
+read back once renamed.
+"""
+import hashlib
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Optional
+
+PART_SUFFIX = ".part"
+CHUNK_SIZE = 1024 * 1024
+
+
+class ChecksumError(Exception):
+    """Copied file not matching its source."""
+
+
+class RateLimiter:
+    """Thread-safe token bucket shared by the transfers to a destination."""
+
+    def __init__(
+        self,
+        rate: Optional[float],
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """Initialize the limiter.
+
+        :param rate: Max bytes per second, unlimited if None.
+        :type rate: Optional[float]
+        :param burst: Bytes allowed at once, one second of ``rate`` by default.
+        :type burst: Optional[float]
+        :param clock: Monotonic clock.
+        :type clock: Callable[[], float]
+        :param sleep: Blocking sleep.
+        :type sleep: Callable[[float], None]
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst or 0.0
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: int) -> None:
+        """Wait until ``amount`` bytes may be sent.
+
+        Callers reserve their bytes at once and sleep off their own debt, so
+        concurrent transfers share the rate fairly.
+        """
+        if not self.rate:
+            return
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                float(self.burst or 0),
+                self._tokens + (now - self._last) * self.rate,
+            )
+            self._last = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+
+
+def _hash_prefix(path: str, size: int, chunk_size: int) -> "hashlib._Hash":
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        remaining = size
+        while remaining > 0:
+            chunk = file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest
+
+
+def copy_file_resumable(
+    src: str,
+    dst: str,
+    limiter: Optional[RateLimiter] = None,
+    chunk_size: int = CHUNK_SIZE,
+    verify: bool = True,
+) -> str:
+    """Copy a file, resuming an interrupted copy.
+
+    :param src: Source file.
+    :type src: str
+    :param dst: Target file, its folder is created if needed.
+    :type dst: str
+    :param limiter: Bandwidth limiter.
+    :type limiter: Optional[RateLimiter]
+    :param chunk_size: Read and write size.
+    :type chunk_size: int
+    :param verify: Read the target back and compare its checksum.
+    :type verify: bool
+    :return: SHA-256 hex digest of the file.
+    :rtype: str
+    :raises ChecksumError: If the target does not match the source, it is removed.
+    """
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    part = dst + PART_SUFFIX
+    try:
+        offset = os.path.getsize(part)
+    except OSError:
+        offset = 0
+    if offset > os.path.getsize(src):
+        offset = 0
+
+    with open(src, "rb") as source:
+        digest = hashlib.sha256()
+        if offset:
+            # The copied prefix must still match the source to be resumed.
+            digest = _hash_prefix(src, offset, chunk_size)
+            if _hash_prefix(part, offset, chunk_size).digest() != digest.digest():
+                offset, digest = 0, hashlib.sha256()
+            source.seek(offset)
+        with open(part, "r+b" if offset else "wb") as target:
+            target.seek(offset)
+            target.truncate()
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                if limiter is not None:
+                    limiter.acquire(len(chunk))
+                target.write(chunk)
+                digest.update(chunk)
+            target.flush()
+            os.fsync(target.fileno())
+    shutil.copystat(src, part)
+    os.replace(part, dst)
+    checksum = digest.hexdigest()
+    if verify and file_sha256(dst, chunk_size) != checksum:
+        os.unlink(dst)
+        raise ChecksumError(f"'{dst}' does not match '{src}' once copied")
+    return checksum
+
+
+def file_sha256(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """Return the SHA-256 hex digest of a file."""
+    return _hash_prefix(path, os.path.getsize(path), chunk_size).hexdigest()
@@ -0,0 +1,492 @@
+"""Concurrent transfer scheduler of torrent payloads between clients.
+
+``move_to_local`` and ``sync_to_remote`` auto manage actions queue a
+transfer of the torrent content path, from the downloads folder of a client
+to the same relative path under the downloads folder of another client.
+
+Each destination has its own priority queue, served by up to
+``max_concurrent`` transfers sharing a ``max_speed`` bandwidth cap. Higher
+scores, then larger freed bytes, are transferred first. The queue is
+persisted after every change: after a restart, unfinished transfers resume
+from their partial files. Every copied file is checked against its source
+checksum before a job is done and, for moves, before the source is deleted.
+Failed transfers are retried after an exponential backoff.
+A torrent selected again for the same destination is not queued twice, its
+job only gathers the new trigger and priority. Done jobs are dropped
+``done_ttl`` seconds after they finished, the torrent may then be
+transferred again.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from qbt_flow_utils.config.runtime import KIB
+from qbt_flow_utils.logging import logger
+from qbt_flow_utils.metrics import TRANSFERRED_BYTES
+from qbt_flow_utils.persist import dump_state, load_state
+from qbt_flow_utils.transfers.copier import RateLimiter, copy_file_resumable
+
+QUEUE_VERSION = 1
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JobKey = Tuple[str, str]
+
+
+@dataclass(frozen=True)
+class TransferHost:
+    """A client downloads folder, source or destination of transfers."""
+
+    name: str
+    root: str
+    max_concurrent: int = 2
+    max_speed: Optional[int] = None  # bytes/s
+
+
+@dataclass
+class TransferJob:
+    """A queued torrent payload transfer."""
+
+    torrent_hash: str
+    source: str
+    destination: str
+    source_path: str
+    target_path: str
+    move: bool = False
+    score: float = 0.0
+    freed_bytes: int = 0
+    triggers: Set[str] = field(default_factory=set)
+    status: str = PENDING
+    attempts: int = 0
+    # Timestamp before which a failed transfer is not retried.
+    retry_at: float = 0.0
+    # SHA-256 of the transferred files, keyed by path relative to the content.
+    checksums: Dict[str, str] = field(default_factory=dict)
+    error: Optional[str] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def key(self) -> JobKey:
+        """Deduplication key of the job."""
+        return self.torrent_hash, self.destination
+
+
+def _copied(source: str, target: str) -> bool:
+    """Check that a file copied by a previous attempt is still in place."""
+    try:
+        return os.path.getsize(target) == os.path.getsize(source)
+    except OSError:
+        return False
+
+
+def _content_files(path: str) -> Iterator[str]:
+    if not os.path.isdir(path):
+        yield ""
+        return
+    for dir_path, dir_names, names in os.walk(path):
+        dir_names.sort()
+        for name in sorted(names):
+            yield os.path.relpath(os.path.join(dir_path, name), path)
+
+
+class TransferScheduler:
+    """Persistent and prioritised queue of transfers between hosts."""
+
+    def __init__(
+        self,
+        hosts: Mapping[str, TransferHost],
+        local_host: str,
+        queue_file: Optional[str] = None,
+        max_attempts: int = 3,
+        retry_delay: float = 30.0,
+        done_ttl: float = 24 * 3600,
+    ) -> None:
+        """Initialize the scheduler.
+
+        :param hosts: Hosts keyed by client name.
+        :type hosts: Mapping[str, TransferHost]
+        :param local_host: Name of the local client, destination of
+            ``move_to_local`` and source of ``sync_to_remote``.
+        :type local_host: str
+        :param queue_file: File the queue is persisted to, not persisted if None.
+        :type queue_file: Optional[str]
+        :param max_attempts: Attempts before a transfer is marked failed.
+        :type max_attempts: int
+        :param retry_delay: Seconds before the first retry of a failed
+            transfer, doubled on each retry.
+        :type retry_delay: float
+        :param done_ttl: Seconds a done job is kept, its torrent is not
+            transferred again meanwhile.
+        :type done_ttl: float
+        """
+        self.hosts = dict(hosts)
+        self.local_host = local_host
+        self.queue_file = queue_file
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.done_ttl = done_ttl
+        self.jobs: Dict[JobKey, TransferJob] = {}
+        # Per destination heaps of (-score, -freed bytes, sequence, key).
+        self._queues: Dict[str, List[Tuple[float, int, int, JobKey]]] = {}
+        self._queued: Dict[JobKey, int] = {}
+        self._sequence = itertools.count()
+        self._limiters = {name: RateLimiter(host.max_speed) for name, host in self.hosts.items()}
+
+    @classmethod
+    def from_config(
+        cls,
+        clients_config: Mapping[str, Mapping[str, Any]],
+        local_host: str,
+        queue_file: Optional[str] = None,
+    ) -> "TransferScheduler":
+        """Build the scheduler of the configured clients and load its queue.
+
+        :param clients_config: Clients config keyed by client name.
+        :type clients_config: Mapping[str, Mapping[str, Any]]
+        :param local_host: Name of the local client.
+        :type local_host: str
+        :param queue_file: File the queue is persisted to.
+        :type queue_file: Optional[str]
+        :return: Loaded scheduler.
+        :rtype: TransferScheduler
+        """
+        hosts = {}
+        for name, config in clients_config.items():
+            transfer = config.get("transfer") or {}
+            max_speed = transfer.get("max_speed")
+            hosts[name] = TransferHost(
+                name,
+                config["path"]["downloads_path"],
+                int(transfer.get("max_concurrent", 2)),
+                None if max_speed is None else max_speed * KIB,
+            )
+        scheduler = cls(hosts, local_host, queue_file)
+        scheduler.load()
+        return scheduler
+
+    def load(self) -> None:
+        """Load the persisted queue, running transfers are resumed."""
+        if self.queue_file is None:
+            return
+        state = load_state(self.queue_file)
+        if not isinstance(state, dict) or state.get("version") != QUEUE_VERSION:
+            return
+        for job in state["jobs"]:
+            if job.status == RUNNING:
+                job.status = PENDING
+            self.jobs[job.key] = job
+            if job.status == PENDING:
+                self._push(job)
+        self.prune()
+
+    def save(self) -> None:
+        """Persist the queue."""
+        if self.queue_file is None:
+            return
+        dump_state(self.queue_file, {"version": QUEUE_VERSION, "jobs": list(self.jobs.values())})
+
+    def _expired(self, job: TransferJob, now: float) -> bool:
+        return job.status == DONE and now - (job.finished_at or 0) >= self.done_ttl
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop the jobs done more than ``done_ttl`` seconds ago.
+
+        :param now: Current time, defaults to the current time.
+        :type now: Optional[float]
+        :return: Jobs dropped.
+        :rtype: int
+        """
+        now = time.time() if now is None else now
+        expired = [key for key, job in self.jobs.items() if self._expired(job, now)]
+        for key in expired:
+            del self.jobs[key]
+        return len(expired)
+
+    def _push(self, job: TransferJob) -> None:
+        sequence = next(self._sequence)
+        self._queued[job.key] = sequence
+        heapq.heappush(
+            self._queues.setdefault(job.destination, []),
+            (-job.score, -job.freed_bytes, sequence, job.key),
+        )
+
+    def _pop(self, destination: str) -> Optional[TransferJob]:
+        queue = self._queues.get(destination, [])
+        now = time.time()
+        waiting = []
+        job = None
+        while queue:
+            entry = heapq.heappop(queue)
+            *_, sequence, key = entry
+            # Entries of reprioritised jobs are left in the heap, skip them.
+            if self._queued.get(key) != sequence:
+                continue
+            if self.jobs[key].retry_at > now:
+                waiting.append(entry)
+                continue
+            del self._queued[key]
+            job = self.jobs[key]
+            break
+        for entry in waiting:
+            heapq.heappush(queue, entry)
+        return job
+
+    def _next_retry(self, destination: str) -> Optional[float]:
+        retries = [self.jobs[key].retry_at for key in self._queued if key[1] == destination]
+        return min(retries) if retries else None
+
+    def pending(self, destination: Optional[str] = None) -> int:
+        """Count the queued transfers, of a destination or of all."""
+        if destination is None:
+            return len(self._queued)
+        return sum(key[1] == destination for key in self._queued)
+
+    def enqueue(
+        self,
+        torrent_hash: str,
+        source: str,
+        destination: str,
+        content_path: str,
+        move: bool = False,
+        score: float = 0.0,
+        freed_bytes: int = 0,
+        trigger: str = "",
+    ) -> TransferJob:
+        """Queue a torrent payload transfer, deduplicated per destination.
+
+        :param torrent_hash: Torrent hash.
+        :type torrent_hash: str
+        :param source: Source client name.
+        :type source: str
+        :param destination: Destination client name.
+        :type destination: str
+        :param content_path: Torrent content path, under the source downloads folder.
+        :type content_path: str
+        :param move: Delete the source content once transferred.
+        :type move: bool
+        :param score: Torrent score, higher first.
+        :type score: float
+        :param freed_bytes: Bytes freed on the source, larger first for equal scores.
+        :type freed_bytes: int
+        :param trigger: Name of what selected the torrent, e.g. a tracker tag.
+        :type trigger: str
+        :return: The new job, or the existing one of the torrent and destination,
+            queued again if it failed. A job done more than ``done_ttl``
+            seconds ago is replaced by a new one.
+        :rtype: TransferJob
+        :raises ValueError: If the content path is not under the source folder.
+        """
+        key = (torrent_hash, destination)
+        job = self.jobs.get(key)
+        if job is not None and self._expired(job, time.time()):
+            del self.jobs[key]
+            job = None
+        if job is not None:
+            if trigger:
+                job.triggers.add(trigger)
+            job.move = job.move or move
+            if job.status == FAILED:
+                # Selected again: retry, the files already copied are kept.
+                job.status, job.attempts, job.retry_at = PENDING, 0, 0.0
+                job.score, job.freed_bytes = score, freed_bytes
+                self._push(job)
+            elif job.status == PENDING and (score, freed_bytes) > (job.score, job.freed_bytes):
+                job.score, job.freed_bytes = score, freed_bytes
+                self._push(job)
+            self.save()
+            return job
+
+        relative = os.path.relpath(os.path.normpath(content_path), self.hosts[source].root)
+        if relative == os.curdir or relative.startswith(os.pardir):
+            raise ValueError(f"'{content_path}' is not under the '{source}' downloads folder")
+        job = TransferJob(
+            torrent_hash,
+            source,
+            destination,
+            os.path.normpath(content_path),
+            os.path.join(self.hosts[destination].root, relative),
+            move=move,
+            score=score,
+            freed_bytes=freed_bytes,
+            triggers={trigger} if trigger else set(),
+        )
+        self.jobs[key] = job
+        self._push(job)
+        self.save()
+        return job
+
+    def enqueue_action(
+        self,
+        action: str,
+        client: str,
+        torrent_hash: str,
+        content_path: str,
+        score: float = 0.0,
+        freed_bytes: int = 0,
+        trigger: str = "",
+    ) -> List[TransferJob]:
+        """Queue the transfers of an auto manage action.
+
+        :param action: ``move_to_local`` or ``sync_to_remote``.
+        :type action: str
+        :param client: Client of the torrent.
+        :type client: str
+        :param torrent_hash: Torrent hash.
+        :type torrent_hash: str
+        :param content_path: Torrent content path.
+        :type content_path: str
+        :param score: Torrent score.
+        :type score: float
+        :param freed_bytes: Bytes freed on the client.
+        :type freed_bytes: int
+        :param trigger: Name of what selected the torrent.
+        :type trigger: str
+        :return: Queued jobs, none if the torrent already is on its destination.
+        :rtype: List[TransferJob]
+        :raises ValueError: If the action is not a transfer action.
+        """
+        if action == "move_to_local":
+            destinations = [self.local_host] if client != self.local_host else []
+            move = True
+        elif action == "sync_to_remote":
+            destinations = [name for name in self.hosts if name != self.local_host]
+            if client != self.local_host:
+                destinations = []
+            move = False
+        else:
+            raise ValueError(f"'{action}' is not a transfer action")
+        return [
+            self.enqueue(
+                torrent_hash,
+                client,
+                destination,
+                content_path,
+                move,
+                score,
+                freed_bytes,
+                trigger,
+            )
+            for destination in destinations
+        ]
+
+    def _checkpoint(self, job: TransferJob, relative: str, checksum: str) -> None:
+        job.checksums[relative] = checksum
+        self.save()
+
+    def _transfer(
+        self,
+        job: TransferJob,
+        done: FrozenSet[str],
+        checkpoint: Callable[[str, str], None],
+    ) -> int:
+        """Copy a job files, in a worker thread. Return the bytes copied.
+
+        Shared state is only updated from the event loop, by ``checkpoint``.
+        """
+        limiter = self._limiters[job.destination]
+        copied = 0
+        is_dir = os.path.isdir(job.source_path)
+        for relative in _content_files(job.source_path):
+            source = os.path.join(job.source_path, relative) if is_dir else job.source_path
+            target = os.path.join(job.target_path, relative) if is_dir else job.target_path
+            # Files copied by a previous attempt were checksummed then.
+            if relative in done and _copied(source, target):
+                continue
+            checkpoint(relative, copy_file_resumable(source, target, limiter))
+            copied += os.path.getsize(target)
+        if job.move:
+            if is_dir:
+                shutil.rmtree(job.source_path)
+            else:
+                os.unlink(job.source_path)
+        return copied
+
+    async def _worker(self, destination: str, executor: ThreadPoolExecutor) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            job = self._pop(destination)
+            if job is None:
+                retry_at = self._next_retry(destination)
+                if retry_at is None:
+                    return
+                # Only failed transfers waiting for their retry are left.
+                await asyncio.sleep(max(0.0, retry_at - time.time()))
+                continue
+            job.status = RUNNING
+            job.attempts += 1
+            self.save()
+
+            def checkpoint(relative: str, checksum: str, job: TransferJob = job) -> None:
+                loop.call_soon_threadsafe(self._checkpoint, job, relative, checksum)
+
+            try:
+                copied = await loop.run_in_executor(
+                    executor,
+                    self._transfer,
+                    job,
+                    frozenset(job.checksums),
+                    checkpoint,
+                )
+            except Exception as error:
+                job.error = str(error)
+                job.status = FAILED if job.attempts >= self.max_attempts else PENDING
+                logger.bind(hash=job.torrent_hash).warning(
+                    f"Transfer to '{destination}' failed ({job.attempts}): {error}",
+                )
+                if job.status == PENDING:
+                    job.retry_at = time.time() + self.retry_delay * 2 ** (job.attempts - 1)
+                    self._push(job)
+            else:
+                job.status, job.error, job.finished_at = DONE, None, time.time()
+                TRANSFERRED_BYTES.inc(destination, amount=copied)
+                logger.bind(hash=job.torrent_hash).info(
+                    f"Transferred {job.source_path} to '{destination}'",
+                )
+            self.save()
+
+    async def run(self) -> Dict[str, int]:
+        """Run the queued transfers until the queues are empty.
+
+        Each destination runs up to its ``max_concurrent`` transfers at once.
+
+        :return: Jobs count by status.
+        :rtype: Dict[str, int]
+        """
+        if self.prune():
+            self.save()
+        destinations = [name for name, queue in self._queues.items() if queue]
+        workers = sum(self.hosts[name].max_concurrent for name in destinations)
+        if workers:
+            with ThreadPoolExecutor(workers, thread_name_prefix="transfer") as executor:
+                await asyncio.gather(
+                    *(
+                        self._worker(name, executor)
+                        for name in destinations
+                        for _ in range(self.hosts[name].max_concurrent)
+                    ),
+                )
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
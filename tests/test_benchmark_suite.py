@@ -0,0 +1,55 @@
+# tests/test_benchmark_suite.py
+import os
+from collections import Counter
+
+from benchmarks.bench_config_import import heavy_imports, import_times
+from benchmarks.generator import build_file_tree, generate
+from benchmarks.run import STAGES, Options, compare, run_suite
+from qbt_flow_utils.config.schemas.trackers import TrackerConfig
+
+
+def test_generate_ratios():
+    load = generate(5000, trackers=10, cross_seed_ratio=0.2, hardlink_ratio=0.5, seed=1)
+    assert len(load.torrents) == 5000
+    for config in load.trackers_config.values():
+        TrackerConfig(**config)
+    names = Counter(torrent["name"] for torrent in load.torrents.values())
+    assert abs(1 - len(names) / 5000 - 0.2) < 0.03
+    assert abs(len(load.hardlinked) / len(load.contents) - 0.5) < 0.05
+    # Zipf mix: the first tracker is the most popular.
+    trackers = Counter(torrent["tracker"].split("/")[2] for torrent in load.torrents.values())
+    assert trackers.most_common(1)[0][0] == "tracker0.org"
+
+
+def test_build_file_tree(tmp_path):
+    load = generate(20, trackers=2, hardlink_ratio=1, downloads_path=str(tmp_path / "d"))
+    created = build_file_tree(load, str(tmp_path / "d"), str(tmp_path / "m"))
+    assert created == sum(len(files) for files in load.contents.values())
+    relative_path, size = load.contents[load.hardlinked[0]][0]
+    stat = os.stat(tmp_path / "m" / relative_path)
+    assert stat.st_nlink == 2
+    assert stat.st_size == size
+
+
+def test_run_suite_and_compare():
+    report = run_suite([300], Options(trackers=5, file_tree=True), isolate=False)
+    stages = report["sizes"]["300"]
+    assert list(stages) == list(STAGES)
+    assert stages["sync"]["api_calls"] == 2
+    assert stages["tagging"]["api_calls"] > 0
+    assert stages["removal"]["api_calls"] == 1
+    assert all(stage["api_bytes"] > 0 and stage["peak_rss_mb"] > 0 for stage in stages.values())
+
+    assert compare(report, report, tolerance=0) == []
+    baseline = {"sizes": {"300": {"tagging": {**stages["tagging"], "api_calls": 1}}}}
+    assert compare(report, baseline, tolerance=0.2) == [
+        f"300 tagging api_calls: 1 -> {stages['tagging']['api_calls']}",
+    ]
+
+
+def test_config_import_stays_light():
+    config_folder = os.path.join(os.path.dirname(__file__), "..", "config")
+    env = dict(os.environ, QBT_FLOW_UTILS_CONFIG_FOLDER=os.path.abspath(config_folder))
+    times = import_times(env)
+    assert "qbt_flow_utils.config" in times
+    assert heavy_imports(times) == []
@@ -0,0 +1,91 @@
+# tests/test_client_state_sync.py
+import asyncio
+
+import pytest
+
+from benchmarks.fake_qbittorrent import FakeQBittorrent
+from qbt_flow_utils.qbittorrent.client import QBittorrentClient, QBittorrentError, client_base_url
+from qbt_flow_utils.qbittorrent.sync import ClientStateStore
+from qbt_flow_utils.trackers.matcher import known_tracker
+
+
+def test_client_base_url():
+    assert (
+        str(client_base_url({"host": "qbittorrent:8080", "port": 8080}))
+        == "http://qbittorrent:8080"
+    )
+    assert str(client_base_url({"host": "qbt.mynass.com", "port": 443})) == "https://qbt.mynass.com"
+
+
+def test_apply_deltas():
+    store = ClientStateStore()
+    store.apply(
+        {
+            "rid": 1,
+            "full_update": True,
+            "torrents": {"a": {"name": "A", "ratio": 1.0}, "b": {"name": "B"}},
+            "tags": ["x"],
+        },
+    )
+    changes = store.pop_changes()
+    assert changes.full_update
+    assert changes.changed == {"a", "b"}
+
+    before = store.snapshot()
+    store.apply({"rid": 2, "torrents": {"a": {"ratio": 2.0}}, "torrents_removed": ["b"]})
+    changes = store.pop_changes()
+    assert changes.changed == {"a"}
+    assert changes.removed == {"b"}
+    assert store.torrents == {"a": {"name": "A", "ratio": 2.0}}
+    assert before.torrents["a"]["ratio"] == 1.0
+    assert "b" in before.torrents
+
+
+def test_last_working_tracker_kept():
+    store = ClientStateStore()
+    store.apply({"rid": 1, "full_update": True, "torrents": {"a": {"tracker": "https://t.org"}}})
+    # No tracker works anymore, then a full update while still failing.
+    store.apply({"rid": 2, "torrents": {"a": {"tracker": ""}}})
+    assert known_tracker(store.torrents["a"]) == "https://t.org"
+    store.apply({"rid": 3, "full_update": True, "torrents": {"a": {"tracker": ""}, "b": {}}})
+    assert known_tracker(store.torrents["a"]) == "https://t.org"
+    assert known_tracker(store.torrents["b"]) == ""
+
+
+def test_sync_against_fake_server():
+    async def scenario():
+        server = FakeQBittorrent()
+        server.add_torrent("a", name="A", ratio=0.5, tags="x")
+        server.add_torrent("b", name="B", ratio=1.0)
+        server.add_category("films", "/data/films")
+        url = await server.start()
+        try:
+            async with QBittorrentClient(url, "admin", "adminadmin") as client:
+                store = ClientStateStore()
+                await store.sync(client)
+                assert store.pop_changes().changed == {"a", "b"}
+                assert store.tags == {"x"}
+                assert store.categories["films"]["savePath"] == "/data/films"
+
+                server.update_torrent("a", ratio=0.7)
+                server.remove_torrent("b")
+                server.add_torrent("c", name="C")
+                await store.sync(client)
+                changes = store.pop_changes()
+                assert changes.changed == {"a", "c"}
+                assert changes.removed == {"b"}
+                assert store.torrents["a"] == {"name": "A", "ratio": 0.7, "tags": "x"}
+                assert store.torrents == {
+                    torrent_hash: dict(torrent) for torrent_hash, torrent in server.torrents.items()
+                }
+
+                await store.sync(client)
+                assert not store.pop_changes().changed
+
+            async with QBittorrentClient(url, "admin", "wrong") as client:
+                with pytest.raises(QBittorrentError):
+                    await client.get("sync/maindata", rid=0)
+        finally:
+            await server.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,66 @@
+# tests/test_compiled_config.py
+import os
+import shutil
+
+from qbt_flow_utils.config.compiled import CompiledConfigCache
+from qbt_flow_utils.config.config import _load_trackers_config
+from qbt_flow_utils.config.schemas import TagsConfig
+
+CONFIG_FOLDER = os.path.join(os.path.dirname(__file__), "..", "config")
+
+
+def _trackers(tmp_path, count):
+    folder = tmp_path / "trackers_config"
+    folder.mkdir()
+    sample = os.path.join(CONFIG_FOLDER, "trackers_config", "tracker_sample_config.yml")
+    with open(sample) as file:
+        content = file.read()
+    for i in range(count):
+        (folder / f"t{i}.yml").write_text(content.replace('"sample"', f'"t{i}"'))
+    return folder
+
+
+def test_unchanged_files_are_not_revalidated(tmp_path):
+    folder = _trackers(tmp_path, 3)
+    cache_file = str(tmp_path / "config.cache")
+
+    cache = CompiledConfigCache(cache_file)
+    compiled, tags = _load_trackers_config(str(folder), cache)
+    cache.save()
+    assert (cache.hits, cache.misses) == (0, 3)
+
+    (folder / "t1.yml").write_text((folder / "t1.yml").read_text().replace("1000", "5"))
+    cache = CompiledConfigCache(cache_file)
+    cached, cached_tags = _load_trackers_config(str(folder), cache)
+    assert (cache.hits, cache.misses) == (2, 1)
+    assert sorted(cached_tags) == sorted(tags)
+    assert cached.t0 == compiled.t0
+    assert cached.t1.extra_score == 5
+
+
+def test_schema_change_drops_cache(tmp_path):
+    folder = _trackers(tmp_path, 2)
+    cache_file = str(tmp_path / "config.cache")
+    cache = CompiledConfigCache(cache_file, version="v1")
+    _load_trackers_config(str(folder), cache)
+    cache.save()
+
+    cache = CompiledConfigCache(cache_file, version="v2")
+    _load_trackers_config(str(folder), cache)
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_concurrent_writers_merge(tmp_path):
+    shutil.copy(os.path.join(CONFIG_FOLDER, "tags_config.yml"), tmp_path)
+    folder = _trackers(tmp_path, 1)
+    cache_file = str(tmp_path / "config.cache")
+    first, second = CompiledConfigCache(cache_file), CompiledConfigCache(cache_file)
+    first.load(str(tmp_path / "tags_config.yml"), TagsConfig)
+    _load_trackers_config(str(folder), second)
+    first.save()
+    second.save()
+
+    cache = CompiledConfigCache(cache_file)
+    cache.load(str(tmp_path / "tags_config.yml"), TagsConfig)
+    _load_trackers_config(str(folder), cache)
+    assert (cache.hits, cache.misses) == (2, 0)
@@ -0,0 +1,106 @@
+# tests/test_config_registry.py
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from qbt_flow_utils.config.config import ConfigRegistry
+
+CONFIG_FOLDER = os.path.join(os.path.dirname(__file__), "..", "config")
+
+
+def test_import_has_no_side_effect(tmp_path):
+    env = dict(os.environ, QBT_FLOW_UTILS_CONFIG_FOLDER=str(tmp_path / "missing"))
+    subprocess.run(
+        [sys.executable, "-c", "import qbt_flow_utils.config"],  # noqa: S603
+        check=True,
+        env=env,
+    )
+
+
+def test_sections_load_lazily(tmp_path):
+    shutil.copy(os.path.join(CONFIG_FOLDER, "tags_config.yml"), tmp_path)
+    registry = ConfigRegistry(str(tmp_path), str(tmp_path / "cache" / "config.cache"))
+    tags_config = registry.tags()
+    assert tags_config.public_tag == "public"
+    assert registry.tags() is tags_config
+    with pytest.raises(FileNotFoundError):
+        registry.trackers()
+
+
+def test_reset_reloads(tmp_path):
+    shutil.copytree(CONFIG_FOLDER, tmp_path, dirs_exist_ok=True)
+    registry = ConfigRegistry(str(tmp_path), str(tmp_path / "cache" / "config.cache"))
+    assert registry.tracker_matcher().match_url("https://key.example.com/a") == "sample"
+    scoring_config = registry.scoring()
+    registry.reset()
+    assert registry.scoring() is not scoring_config
+    assert registry.scoring() == scoring_config
+
+
+def test_reload_swaps_valid_config(tmp_path):
+    shutil.copytree(CONFIG_FOLDER, tmp_path, dirs_exist_ok=True)
+    registry = ConfigRegistry(str(tmp_path), str(tmp_path / "cache" / "config.cache"))
+    diffs = []
+    registry.subscribe(diffs.append)
+    matcher = registry.tracker_matcher()
+    scoring_config = registry.scoring()
+    assert registry.reload() is None
+
+    tracker_file = tmp_path / "trackers_config" / "tracker_sample_config.yml"
+    content = tracker_file.read_text()
+    tracker_file.write_text(content.replace("extra_score: 1000", "extra_score: 5"))
+    (tmp_path / "trackers_config" / "new.yml").write_text(
+        content.replace('"sample"', '"new"').replace("example.com", "new.org"),
+    )
+    diff = registry.reload()
+    assert diff.trackers_added == {"new"}
+    assert diff.trackers_changed == {"sample"}
+    assert not diff.scoring_changed
+    assert diffs == [diff]
+    assert registry.trackers()[0].sample.extra_score == 5
+    assert registry.tracker_matcher() is not matcher
+    assert registry.tracker_matcher().match_url("https://tracker.new.org/a") == "new"
+    assert registry.scoring() is scoring_config
+
+
+def test_reload_rejects_invalid_config(tmp_path):
+    shutil.copytree(CONFIG_FOLDER, tmp_path, dirs_exist_ok=True)
+    registry = ConfigRegistry(str(tmp_path), str(tmp_path / "cache" / "config.cache"))
+    trackers_config = registry.trackers()
+    tracker_file = tmp_path / "trackers_config" / "tracker_sample_config.yml"
+    content = tracker_file.read_text()
+    tracker_file.write_text(content.replace('tracker_tag: "sample"', ""))
+    assert registry.reload() is None
+    assert registry.trackers() is trackers_config
+
+    tracker_file.write_text(content.replace("extra_score: 1000", "extra_score: 7"))
+    assert registry.reload().trackers_changed == {"sample"}
+
+
+def test_reload_applies_valid_sections_of_mixed_poll(tmp_path):
+    shutil.copytree(CONFIG_FOLDER, tmp_path, dirs_exist_ok=True)
+    registry = ConfigRegistry(str(tmp_path), str(tmp_path / "cache" / "config.cache"))
+    trackers_config = registry.trackers()
+    registry.runtime()
+    scoring_file = tmp_path / "scoring_config.yml"
+    scoring_file.write_text(
+        scoring_file.read_text().replace("coef_seed_ratio: 2", "coef_seed_ratio: 5"),
+    )
+    tracker_file = tmp_path / "trackers_config" / "tracker_sample_config.yml"
+    content = tracker_file.read_text()
+    tracker_file.write_text(content.replace('tracker_tag: "sample"', ""))
+
+    # The invalid trackers are rejected, the valid scoring is applied.
+    diff = registry.reload()
+    assert diff.scoring_changed
+    assert not diff.trackers_changed
+    assert registry.scoring().score_calculation.coef_seed_ratio == 5
+    assert registry.trackers() is trackers_config
+    assert registry.reload() is None
+
+    tracker_file.write_text(content.replace("extra_score: 1000", "extra_score: 7"))
+    assert registry.reload().trackers_changed == {"sample"}
+    assert registry.scoring().score_calculation.coef_seed_ratio == 5
@@ -0,0 +1,68 @@
+# tests/test_cross_seed.py
+import numpy as np
+
+from qbt_flow_utils.qbittorrent.sync import ClientStateStore
+from qbt_flow_utils.torrents.cross_seed import CrossSeedIndex
+from qbt_flow_utils.torrents.snapshot import TorrentSnapshot
+
+GIB = 1024**3
+
+
+def _torrent(name, size, path=None):
+    return {"name": name, "size": size, "content_path": path or f"/data/{name}"}
+
+
+TORRENTS = {
+    "a1": _torrent("Movie", 4 * GIB),
+    "a2": _torrent("Movie", 4 * GIB, "/data/Movie/"),
+    "a3": _torrent("Movie", 4 * GIB),
+    "b1": _torrent("Show", 10 * GIB),
+    "b2": _torrent("Show", 10 * GIB, "/data/other/Show"),
+}
+
+
+def test_families_and_incremental_update():
+    store = ClientStateStore()
+    index = CrossSeedIndex()
+    store.apply({"rid": 1, "full_update": True, "torrents": TORRENTS})
+    index.update(store.torrents, store.pop_changes())
+
+    assert index.family("a2").hashes == {"a1", "a2", "a3"}
+    assert index.family("a2").size == 4 * GIB
+    assert index.family("b1").hashes == {"b1"}
+    assert [family.hashes for family in index.families()] == [{"a1", "a2", "a3"}]
+
+    store.apply(
+        {
+            "rid": 2,
+            "torrents": {"b2": {"content_path": "/data/Show"}, "c1": _torrent("Show", 10 * GIB)},
+            "torrents_removed": ["a3"],
+        },
+    )
+    index.update(store.torrents, store.pop_changes())
+    assert index.family("b1").hashes == {"b1", "b2", "c1"}
+    assert index.family("a1").hashes == {"a1", "a2"}
+    assert len(index) == 5
+
+
+def test_file_sizes_split_same_location():
+    index = CrossSeedIndex()
+    index.add("x", _torrent("Pack", GIB), file_sizes=[GIB // 2, GIB // 2])
+    index.add("y", _torrent("Pack", GIB), file_sizes=[GIB // 2, GIB // 2])
+    index.add("z", _torrent("Pack", GIB), file_sizes=[GIB // 4, 3 * GIB // 4])
+    assert index.family("x").hashes == {"x", "y"}
+    # File sizes are kept when the torrent is updated from a delta.
+    index.add("y", {**_torrent("Pack", GIB), "ratio": 2})
+    assert index.family("x").hashes == {"x", "y"}
+
+
+def test_family_stats():
+    index = CrossSeedIndex()
+    for torrent_hash, torrent in TORRENTS.items():
+        index.add(torrent_hash, torrent)
+    snapshot = TorrentSnapshot.from_torrents(TORRENTS)
+    scores = np.array([5.0, 1.0, 9.0, 3.0, 7.0])
+    codes, family_score, family_bytes = index.family_stats(snapshot, scores)
+    assert codes.tolist() == [0, 0, 0, 1, 2]
+    assert family_score.tolist() == [1.0, 3.0, 7.0]
+    assert family_bytes.tolist() == [4 * GIB, 10 * GIB, 10 * GIB]
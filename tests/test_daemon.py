@@ -0,0 +1,173 @@
+# tests/test_daemon.py
+import asyncio
+import random
+import time
+
+from benchmarks.fake_qbittorrent import FakeQBittorrent
+from qbt_flow_utils.daemon import (
+    DISK_PRESSURE,
+    HNR_DEADLINE,
+    NEW_TORRENTS,
+    DaemonScheduler,
+    StageSchedule,
+    default_schedules,
+)
+from qbt_flow_utils.engine import MultiClientEngine
+from qbt_flow_utils.settings import settings
+
+
+def _run(scheduler_options, schedules, duration, during=None, client_config=None):
+    """Run a daemon on a fake client for ``duration`` seconds."""
+
+    async def scenario():
+        server = FakeQBittorrent()
+        server.add_torrent("a", name="A")
+        url = await server.start()
+        config = {
+            "login": {"host": str(url), "username": "admin", "password": "adminadmin"},
+            **(client_config or {}),
+        }
+        try:
+            async with MultiClientEngine({"local": config}, []) as engine:
+                scheduler = DaemonScheduler(
+                    engine,
+                    schedules,
+                    rng=random.Random(0),
+                    **scheduler_options,
+                )
+                task = asyncio.create_task(scheduler.run())
+                if during is not None:
+                    await during(server, scheduler)
+                await asyncio.sleep(duration)
+                scheduler.stop()
+                await asyncio.wait_for(task, 1)
+        finally:
+            await server.close()
+        return server
+
+    return asyncio.run(scenario())
+
+
+def _recording_stage(name, runs, sleep=0.0):
+    async def stage(context):
+        runs.append((time.monotonic(), sorted(context.state.torrents)))
+        await asyncio.sleep(sleep)
+
+    stage.__name__ = name
+    return stage
+
+
+def test_quiet_instance_only_polls():
+    runs = []
+    tagging = _recording_stage("tagging", runs)
+
+    async def add_torrent_later(server, scheduler):
+        await asyncio.sleep(0.3)
+        server.add_torrent("b", name="B")
+
+    server = _run(
+        {"poll_interval": 0.1, "disk_check_interval": 0.1},
+        [StageSchedule(tagging, triggers=frozenset({NEW_TORRENTS}))],
+        0.3,
+        during=add_torrent_later,
+    )
+    # Run once at start, then once on the new torrent.
+    assert [torrents for _, torrents in runs] == [["a"], ["a", "b"]]
+    # Only delta syncs, about one per poll interval and one per stage run.
+    endpoints = {call.endpoint for call in server.calls}
+    assert endpoints == {"auth/login", "sync/maindata"}
+    assert len(server.calls_to("sync/maindata")) <= 10
+
+
+def test_backpressure_skips_in_flight_stage():
+    runs = []
+    slow = _recording_stage("slow", runs, sleep=0.15)
+    _run(
+        {"poll_interval": 10, "disk_check_interval": 10, "jitter": 0},
+        [StageSchedule(slow, interval=0.02)],
+        0.4,
+    )
+    # Due every 20ms, but never two runs at once.
+    assert 2 <= len(runs) <= 4
+    starts = [start for start, _ in runs]
+    assert all(b - a >= 0.15 for a, b in zip(starts, starts[1:]))
+
+
+def test_triggers_are_coalesced(monkeypatch):
+    runs = []
+    stage = _recording_stage("auto_manage", runs)
+    starts = []
+    run_stage = DaemonScheduler._run_stage
+
+    async def recording_run_stage(self, client_loop, state, triggers):
+        # Start times the scheduler spaces by min_interval, before the sync.
+        starts.append(state.last_start)
+        await run_stage(self, client_loop, state, triggers)
+
+    monkeypatch.setattr(DaemonScheduler, "_run_stage", recording_run_stage)
+
+    async def fire_many(server, scheduler):
+        await asyncio.sleep(0.05)
+        for _ in range(5):
+            scheduler.trigger(HNR_DEADLINE)
+            scheduler.trigger(NEW_TORRENTS, client="local")
+        scheduler.trigger(NEW_TORRENTS, client="other")
+
+    _run(
+        {"poll_interval": 10, "disk_check_interval": 10},
+        [StageSchedule(stage, triggers=frozenset({NEW_TORRENTS, HNR_DEADLINE}), min_interval=0.2)],
+        0.4,
+        during=fire_many,
+    )
+    assert len(runs) == len(starts) == 2
+    # Run again once min_interval elapsed.
+    assert starts[1] - starts[0] >= 0.2
+
+
+def test_disk_pressure_reacts_without_api_calls(tmp_path):
+    runs = []
+    removal = _recording_stage("removal", runs)
+    disk_control_method = {"keep_free_gib": 10**9, "path_to_check": str(tmp_path)}
+    server = _run(
+        {"poll_interval": 10, "disk_check_interval": 0.02},
+        [StageSchedule(removal, triggers=frozenset({DISK_PRESSURE}), min_interval=0.1)],
+        0.35,
+        client_config={"disk_control_method": disk_control_method},
+    )
+    assert 3 <= len(runs) <= 5
+    # Initial sync plus one per removal run.
+    assert len(server.calls_to("sync/maindata")) == len(runs) + 1
+
+
+def test_hit_and_run_deadline_trigger():
+    runs = []
+    stage = _recording_stage("auto_manage", runs)
+
+    class Deadlines:
+        deadline = time.time() + 0.15
+
+        def next_deadline(self):
+            return self.deadline
+
+    start = time.monotonic()
+    _run(
+        {"poll_interval": 10, "disk_check_interval": 10, "hit_and_run": {"local": Deadlines()}},
+        [StageSchedule(stage, triggers=frozenset({HNR_DEADLINE}))],
+        0.3,
+    )
+    assert len(runs) == 2
+    assert runs[1][0] - start >= 0.15
+
+
+def test_default_schedules(monkeypatch):
+    async def tagging(context):
+        pass
+
+    async def removal(context):
+        pass
+
+    monkeypatch.setattr(settings, "auto_tags", True)
+    monkeypatch.setattr(settings, "auto_remove", False)
+    schedules = default_schedules({"tagging": tagging, "removal": removal})
+    assert [schedule.name for schedule in schedules] == ["tagging"]
+    assert schedules[0].triggers == {NEW_TORRENTS}
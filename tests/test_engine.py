@@ -0,0 +1,62 @@
+# tests/test_engine.py
+import asyncio
+
+from benchmarks.fake_qbittorrent import FakeQBittorrent
+from qbt_flow_utils.engine import MultiClientEngine
+from qbt_flow_utils.qbittorrent.client import QBittorrentClient
+
+
+def _client_config(url):
+    return {
+        "login": {"host": str(url), "username": "admin", "password": "adminadmin"},
+        "path": {"downloads_path": "/data", "recycle_bin": "/data/.RecycleBin"},
+    }
+
+
+def test_clients_run_concurrently():
+    async def scenario():
+        local, remote = FakeQBittorrent(latency=0.05), FakeQBittorrent(latency=0.2)
+        local.add_torrent("a", name="A")
+        remote.add_torrent("b", name="B")
+        seen = {}
+        remote_busy = []
+
+        async def stage(context):
+            seen[context.name] = set(context.state.torrents)
+            if context.name == "local":
+                remote_busy.append(remote.in_flight)
+            await context.client.get("torrents/info")
+
+        clients_config = {
+            "local": _client_config(await local.start()),
+            "remote": _client_config(await remote.start()),
+            "down": _client_config("http://127.0.0.1:1"),
+        }
+        try:
+            async with MultiClientEngine(clients_config, [stage]) as engine:
+                results = await engine.run_cycle()
+        finally:
+            await local.close()
+            await remote.close()
+
+        assert seen == {"local": {"a"}, "remote": {"b"}}
+        assert results["local"].error is None
+        assert results["down"].error is not None
+        # The local stage runs while the slower remote is still answering.
+        assert remote_busy == [1]
+
+    asyncio.run(scenario())
+
+
+def test_in_flight_cap():
+    async def scenario():
+        server = FakeQBittorrent(latency=0.02)
+        url = await server.start()
+        try:
+            async with QBittorrentClient(url, "admin", "adminadmin", max_in_flight=2) as client:
+                await asyncio.gather(*(client.get("torrents/info") for _ in range(10)))
+        finally:
+            await server.close()
+        assert server.max_in_flight == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,99 @@
+# tests/test_hit_and_run.py
+import math
+
+from qbt_flow_utils.config.runtime import compile_tracker
+from qbt_flow_utils.qbittorrent.sync import ClientStateStore
+from qbt_flow_utils.torrents.hit_and_run import HitAndRunScheduler, project_safe_at
+from qbt_flow_utils.trackers.matcher import TrackerMatcher
+
+HOUR = 3600
+GIB = 1024**3
+
+TRACKER = compile_tracker(
+    {
+        "tracker_tag": "hnr",
+        "tracker_keywords": ["hnr.org"],
+        "hit_and_run": {"ignore_hit_and_run": False, "min_seed_time": 72, "min_ratio": 1},
+    },
+)
+
+
+def _torrent(**properties):
+    return {
+        "tracker": "https://hnr.org/announce",
+        "private": True,
+        "size": GIB,
+        "downloaded": GIB,
+        "uploaded": 0,
+        "ratio": 0,
+        "seeding_time": 0,
+        **properties,
+    }
+
+
+def _scheduler():
+    matcher = TrackerMatcher({"hnr": ["hnr.org"]}, "other", "public")
+    return HitAndRunScheduler({"hnr": TRACKER}, matcher)
+
+
+def test_projection():
+    rules = TRACKER.hit_and_run
+    assert project_safe_at(_torrent(seeding_time=70 * HOUR), rules, 0) == 2 * HOUR
+    assert project_safe_at(_torrent(ratio=1.5), rules, 10) == 10
+    half = _torrent(uploaded=GIB // 2, ratio=0.5)
+    assert project_safe_at(half, rules, 0, upload_rate=GIB / HOUR) == HOUR / 2
+    ignored = compile_tracker({**TRACKER._asdict(), "tracker_tag": "x", "hit_and_run": {}})
+    assert project_safe_at(_torrent(), ignored.hit_and_run, 0) == 0
+    assert math.isinf(project_safe_at(_torrent(), rules._replace(min_seed_time=math.inf), 0))
+
+
+def test_deadlines_and_delta_reprojection():
+    store = ClientStateStore()
+    scheduler = _scheduler()
+    store.apply(
+        {
+            "rid": 1,
+            "full_update": True,
+            "torrents": {
+                "slow": _torrent(seeding_time=70 * HOUR),
+                "fast": _torrent(),
+                "safe": _torrent(ratio=2),
+                "public": _torrent(tracker="https://open.org/announce", private=False),
+            },
+        },
+    )
+    scheduler.update(store.torrents, store.pop_changes(), now=0)
+    assert scheduler.protected == {"slow", "fast"}
+    assert scheduler.next_deadline() == 2 * HOUR
+    assert scheduler.projections == 2
+
+    # Only torrents with changed upload totals are projected again.
+    store.apply({"rid": 2, "torrents": {"slow": {"seeding_time": 70 * HOUR + 600}}})
+    scheduler.update(store.torrents, store.pop_changes(), now=600)
+    assert scheduler.projections == 2
+    store.apply({"rid": 3, "torrents": {"fast": {"uploaded": GIB // 4, "ratio": 0.25}}})
+    scheduler.update(store.torrents, store.pop_changes(), now=900)
+    assert scheduler.projections == 3
+    # GIB / 4 in 900s: the remaining 3/4 GIB take 2700s.
+    assert scheduler.next_deadline() == 3600
+
+    assert scheduler.pop_due(store.torrents, now=1800) == []
+    store.apply({"rid": 4, "torrents": {"fast": {"uploaded": GIB, "ratio": 1.0}}})
+    store.apply({"rid": 5, "torrents_removed": ["slow"]})
+    scheduler.update(store.torrents, store.pop_changes(), now=3000)
+    assert scheduler.pop_due(store.torrents, now=3000) == ["fast"]
+    assert scheduler.protected == set()
+    assert scheduler.next_deadline() is None
+
+
+def test_due_but_not_safe_is_rescheduled():
+    scheduler = _scheduler()
+    torrents = {"paused": _torrent(seeding_time=71 * HOUR)}
+    store = ClientStateStore()
+    store.apply({"rid": 1, "full_update": True, "torrents": torrents})
+    scheduler.update(store.torrents, store.pop_changes(), now=0)
+    assert scheduler.next_deadline() == HOUR
+    # Torrent was paused: its seeding time did not grow.
+    assert scheduler.pop_due(store.torrents, now=HOUR) == []
+    assert scheduler.next_deadline() == 2 * HOUR
+    assert scheduler.protected == {"paused"}
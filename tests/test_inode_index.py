@@ -0,0 +1,67 @@
+# tests/test_inode_index.py
+import os
+
+from qbt_flow_utils.files.inodes import InodeIndex
+
+PAST = (1_600_000_000, 1_600_000_000)
+
+
+def _tree(tmp_path):
+    downloads = tmp_path / "downloads"
+    media = tmp_path / "media"
+    (downloads / "movie").mkdir(parents=True)
+    (downloads / "other").mkdir()
+    media.mkdir()
+    (downloads / "movie" / "a.mkv").write_bytes(b"a")
+    (downloads / "other" / "b.mkv").write_bytes(b"b")
+    os.link(downloads / "movie" / "a.mkv", media / "a.mkv")
+    for folder in (downloads / "movie", downloads / "other", downloads, media):
+        os.utime(folder, PAST)
+    return downloads, media
+
+
+def test_hardlinks_lookup(tmp_path):
+    downloads, media = _tree(tmp_path)
+    index = InodeIndex([str(downloads), str(media)])
+    stats = index.refresh()
+    assert stats.files == 3
+
+    linked = str(downloads / "movie" / "a.mkv")
+    alone = str(downloads / "other" / "b.mkv")
+    assert index.is_hardlinked(linked, into=str(media))
+    assert not index.is_hardlinked(alone, into=str(media))
+    assert not index.is_hardlinked(linked, into=str(downloads / "other"))
+    assert index.any_hardlinked([alone, linked])
+    assert sorted(index.paths_of(index.lookup(linked))) == [linked, str(media / "a.mkv")]
+
+
+def test_link_count_read_from_disk(tmp_path):
+    downloads, media = _tree(tmp_path)
+    index = InodeIndex([str(downloads)])
+    index.refresh()
+    alone = str(downloads / "other" / "b.mkv")
+    assert not index.is_hardlinked(alone)
+
+    # Linked from outside its directory, which is then reused as is.
+    os.link(alone, media / "b.mkv")
+    assert index.refresh().scanned_dirs == 0
+    assert index.is_hardlinked(alone)
+
+
+def test_persisted_incremental_refresh(tmp_path):
+    downloads, media = _tree(tmp_path)
+    index_file = str(tmp_path / "cache" / "index.state")
+    index = InodeIndex([str(downloads), str(media)], index_file)
+    assert index.refresh().scanned_dirs == 4
+    index.save()
+
+    reloaded = InodeIndex([str(downloads), str(media)], index_file)
+    reloaded.load()
+    assert reloaded.lookup(str(downloads / "other" / "b.mkv")) is not None
+
+    os.link(downloads / "other" / "b.mkv", media / "b.mkv")
+    os.utime(media, (PAST[0] + 10, PAST[1] + 10))
+    stats = reloaded.refresh()
+    assert stats.scanned_dirs == 1
+    assert stats.reused_dirs == 3
+    assert reloaded.is_hardlinked(str(downloads / "other" / "b.mkv"), into=str(media))
@@ -0,0 +1,109 @@
+# tests/test_logging.py
+import io
+import json
+import logging
+
+from loguru import logger
+
+from qbt_flow_utils.logging import BatchedWriter, InterceptHandler, RateLimitFilter, json_format
+
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+def _capture(**options):
+    messages = []
+    handler_id = logger.add(messages.append, **options)
+    return messages, handler_id
+
+
+def test_batched_writer():
+    stream = CountingStream()
+    writer = BatchedWriter(stream, max_bytes=1000, max_delay=60)
+    for i in range(30):
+        writer.write(f"message {i:02d}\n")
+    assert stream.writes == 0
+    writer.stop()
+    assert stream.writes == 1
+    assert stream.getvalue() == "".join(f"message {i:02d}\n" for i in range(30))
+
+
+def test_batched_writer_backpressure():
+    stream = CountingStream()
+    writer = BatchedWriter(stream, max_bytes=10, max_delay=60)
+    writer._stopped = True  # No background thread, only callers write.
+    for i in range(30):
+        writer.write(f"message {i:02d}\n")
+    # 11 bytes per message, callers write past 16 * 10 bytes.
+    assert stream.writes == 2
+    writer.stop()
+    assert stream.getvalue() == "".join(f"message {i:02d}\n" for i in range(30))
+
+
+def test_rate_limit_per_torrent_messages():
+    messages, handler_id = _capture(
+        filter=RateLimitFilter(limit=3, window=3600), format="{message}"
+    )
+    try:
+        for i in range(10):
+            logger.bind(hash=f"{i:040x}").info("torrent skipped")
+            logger.info("cycle message")
+    finally:
+        logger.remove(handler_id)
+    assert messages.count("torrent skipped\n") == 3
+    assert messages.count("cycle message\n") == 10
+
+
+def test_rate_limit_reports_suppressed():
+    rate_filter = RateLimitFilter(limit=2, window=3600)
+    messages, handler_id = _capture(filter=rate_filter, format="{message}")
+    try:
+        for i in range(6):
+            if i == 5:
+                assert messages == ["torrent skipped\n"] * 2
+                rate_filter.window = 0
+            logger.bind(hash="a").info("torrent skipped")
+    finally:
+        logger.remove(handler_id)
+    assert messages[-1] == "torrent skipped (3 similar messages suppressed)\n"
+
+
+def test_json_format_structured_fields():
+    messages, handler_id = _capture(format=json_format)
+    try:
+        with logger.contextualize(client="local"):
+            logger.bind(hash="abc", tracker_tag="sample", other=1).warning("Removed {x}")
+            try:
+                int("boom")
+            except ValueError:
+                logger.exception("Failed")
+    finally:
+        logger.remove(handler_id)
+    first, second = (json.loads(message) for message in messages)
+    assert first["message"] == "Removed {x}"
+    assert first["level"] == "WARNING"
+    assert (first["client"], first["hash"], first["tracker_tag"]) == ("local", "abc", "sample")
+    assert first["extra"] == {"other": 1}
+    assert "ValueError: invalid literal" in second["exception"]
+
+
+def test_intercept_handler_level():
+    messages, handler_id = _capture(format="{message}")
+    library = logging.getLogger("tests.library")
+    library.propagate = False
+    library.setLevel(logging.DEBUG)
+    library.addHandler(InterceptHandler(logging.INFO))
+    try:
+        library.debug("noise")
+        library.info("kept")
+    finally:
+        logger.remove(handler_id)
+        library.handlers.clear()
+    assert messages == ["kept\n"]
@@ -0,0 +1,131 @@
+# tests/test_media_scanner.py
+import os
+
+from qbt_flow_utils.files.inodes import InodeIndex
+from qbt_flow_utils.files.media import MediaScanner
+from qbt_flow_utils.settings import settings
+
+PAST = (1_600_000_000, 1_600_000_000)
+
+
+def _library(tmp_path):
+    downloads = tmp_path / "downloads"
+    media = tmp_path / "media"
+    for folder in (downloads, media / "films" / "Movie", media / "tv" / "Show" / "S01"):
+        folder.mkdir(parents=True)
+    (downloads / "movie.mkv").write_bytes(b"m")
+    (downloads / "e01.mkv").write_bytes(b"e")
+    os.link(downloads / "movie.mkv", media / "films" / "Movie" / "movie.mkv")
+    os.link(downloads / "e01.mkv", media / "tv" / "Show" / "S01" / "e01.mkv")
+    (media / "films" / "Movie" / "copy.mkv").write_bytes(b"c")
+    _settle(media)
+    return downloads, media
+
+
+def _settle(folder):
+    """Date the folders past the mtime racy window."""
+    for dir_path, _, _ in os.walk(folder):
+        os.utime(dir_path, PAST)
+
+
+def test_violations_and_incremental_refresh(tmp_path):
+    _, media = _library(tmp_path)
+    manifest_file = str(tmp_path / "cache" / "media.state")
+    scanner = MediaScanner(str(media), manifest_file, workers=2)
+    stats = scanner.refresh()
+    assert (stats.scanned_dirs, stats.reused_dirs, stats.files) == (6, 0, 3)
+    assert scanner.violations() == [str(media / "films" / "Movie" / "copy.mkv")]
+    scanner.save()
+
+    reloaded = MediaScanner(str(media), manifest_file)
+    reloaded.load()
+    (media / "tv" / "Show" / "S01" / "e02.mkv").write_bytes(b"x")
+    os.utime(media / "tv" / "Show" / "S01", (PAST[0] + 10, PAST[1] + 10))
+    stats = reloaded.refresh()
+    assert (stats.scanned_dirs, stats.changed_dirs, stats.reused_dirs) == (1, 1, 5)
+    assert reloaded.violations() == [
+        str(media / "films" / "Movie" / "copy.mkv"),
+        str(media / "tv" / "Show" / "S01" / "e02.mkv"),
+    ]
+
+    # Touched without changes: listed again, not changed.
+    os.utime(media / "films", (PAST[0] + 20, PAST[1] + 20))
+    stats = reloaded.refresh()
+    assert (stats.scanned_dirs, stats.changed_dirs) == (1, 0)
+
+
+def test_removed_download_seen_by_link_index(tmp_path):
+    downloads, media = _library(tmp_path)
+    link_index = InodeIndex([str(downloads)])
+    link_index.refresh()
+    scanner = MediaScanner(str(media), link_index=link_index)
+    scanner.refresh()
+    assert scanner.violations() == [str(media / "films" / "Movie" / "copy.mkv")]
+
+    # The media folder is unchanged, only the download index sees the removal.
+    os.unlink(downloads / "movie.mkv")
+    link_index.refresh()
+    assert scanner.refresh().scanned_dirs == 0
+    assert scanner.violations() == [
+        str(media / "films" / "Movie" / "copy.mkv"),
+        str(media / "films" / "Movie" / "movie.mkv"),
+    ]
+
+
+def test_links_inside_media_folder_not_counted(tmp_path):
+    downloads, media = _library(tmp_path)
+    movie = media / "films" / "Movie" / "movie.mkv"
+    os.link(movie, media / "films" / "Movie" / "movie.copy.mkv")
+    _settle(media)
+    link_index = InodeIndex([str(downloads)])
+    link_index.refresh()
+    scanner = MediaScanner(str(media), link_index=link_index)
+    scanner.refresh()
+    os.unlink(downloads / "movie.mkv")
+    link_index.refresh()
+    # Still two links, both in the media folder.
+    assert scanner.violations() == [
+        str(media / "films" / "Movie" / "copy.mkv"),
+        str(media / "films" / "Movie" / "movie.copy.mkv"),
+        str(movie),
+    ]
+
+
+def test_clean_flags_or_deletes(tmp_path, monkeypatch):
+    _, media = _library(tmp_path)
+    copy = media / "films" / "Movie" / "copy.mkv"
+    scanner = MediaScanner(str(media))
+    scanner.refresh()
+    assert scanner.clean() == [str(copy)]
+    assert copy.exists()
+
+    monkeypatch.setattr(settings, "dry_run", True)
+    scanner.clean(delete=True)
+    assert copy.exists()
+
+    monkeypatch.setattr(settings, "dry_run", False)
+    monkeypatch.setattr(settings, "media_hygiene_delete", True)
+    assert scanner.clean() == [str(copy)]
+    assert not copy.exists()
+    assert (media / "films" / "Movie" / "movie.mkv").exists()
+
+
+def test_linked_since_listing_kept(tmp_path, monkeypatch):
+    downloads, media = _library(tmp_path)
+    copy = media / "films" / "Movie" / "copy.mkv"
+    scanner = MediaScanner(str(media))
+    scanner.refresh()
+    # Linked after the listing, the media directory mtime is unchanged.
+    os.link(copy, downloads / "copy.mkv")
+    assert scanner.refresh().scanned_dirs == 0
+    monkeypatch.setattr(settings, "dry_run", False)
+    assert scanner.clean(delete=True) == []
+    assert copy.exists()
+
+    # Replaced by a file indexed in the downloads.
+    link_index = InodeIndex([str(downloads)])
+    link_index.refresh()
+    scanner.link_index = link_index
+    os.unlink(copy)
+    os.link(downloads / "movie.mkv", copy)
+    assert scanner.violations() == []
@@ -0,0 +1,118 @@
+# tests/test_metrics.py
+import asyncio
+
+import aiohttp
+
+from benchmarks.fake_qbittorrent import FakeQBittorrent
+from qbt_flow_utils import metrics
+from qbt_flow_utils.engine import MultiClientEngine
+from qbt_flow_utils.metrics import CONTENT_TYPE, MetricsRegistry
+from qbt_flow_utils.settings import settings
+
+
+def test_render_openmetrics():
+    registry = MetricsRegistry(enabled=True)
+    calls = registry.counter("calls", "API calls.", ("endpoint",))
+    latency = registry.histogram("latency_seconds", "Latency.", ("endpoint",), buckets=(0.1, 1))
+    calls.inc("sync/maindata")
+    calls.inc("sync/maindata", amount=2)
+    calls.inc('a"b')
+    latency.observe(0.05, "x")
+    latency.observe(0.5, "x")
+    latency.observe(5, "x")
+
+    assert calls.value("sync/maindata") == 3
+    assert latency.count("x") == 3
+    assert latency.sum("x") == 5.55
+    assert (
+        registry.render()
+        == "# TYPE calls counter\n"
+        "# HELP calls API calls.\n"
+        'calls_total{endpoint="a\\"b"} 1\n'
+        'calls_total{endpoint="sync/maindata"} 3\n'
+        "# TYPE latency_seconds histogram\n"
+        "# HELP latency_seconds Latency.\n"
+        'latency_seconds_bucket{endpoint="x",le="0.1"} 1\n'
+        'latency_seconds_bucket{endpoint="x",le="1"} 2\n'
+        'latency_seconds_bucket{endpoint="x",le="+Inf"} 3\n'
+        'latency_seconds_sum{endpoint="x"} 5.55\n'
+        'latency_seconds_count{endpoint="x"} 3\n'
+        "# EOF\n"
+    )
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    calls = registry.counter("calls", "API calls.")
+    latency = registry.histogram("latency_seconds", "Latency.")
+    calls.inc()
+    latency.observe(1)
+    with latency.time():
+        pass
+    assert calls.value() == 0
+    assert latency.count() == 0
+    assert (
+        registry.render()
+        == "# TYPE calls counter\n# HELP calls API calls.\n"
+        "# TYPE latency_seconds histogram\n# HELP latency_seconds Latency.\n# EOF\n"
+    )
+
+
+def test_serve_and_textfile(tmp_path):
+    registry = MetricsRegistry(enabled=True)
+    registry.counter("calls", "API calls.").inc()
+
+    async def scenario():
+        runner = await registry.serve(port=0)
+        port = runner.addresses[0][1]
+        try:
+            async with aiohttp.ClientSession() as session, session.get(
+                f"http://127.0.0.1:{port}/metrics",
+            ) as response:
+                return response.headers["Content-Type"], await response.text()
+        finally:
+            await runner.cleanup()
+
+    content_type, text = asyncio.run(scenario())
+    assert content_type == CONTENT_TYPE
+    assert text == registry.render()
+
+    path = tmp_path / "collector" / "qbt_flow_utils.prom"
+    registry.write_textfile(str(path))
+    assert path.read_text() == registry.render()
+
+
+def test_engine_cycle_metrics(tmp_path, monkeypatch):
+    textfile = tmp_path / "qbt_flow_utils.prom"
+    monkeypatch.setattr(metrics.registry, "enabled", True)
+    monkeypatch.setattr(settings, "metrics_textfile", str(textfile))
+    metrics.registry.clear()
+
+    async def tagging(context):
+        await context.client.get("torrents/info")
+
+    async def scenario():
+        server = FakeQBittorrent()
+        server.add_torrent("a", name="A")
+        server.add_torrent("b", name="B")
+        url = await server.start()
+        config = {"login": {"host": str(url), "username": "admin", "password": "adminadmin"}}
+        try:
+            async with MultiClientEngine({"local": config}, [tagging]) as engine:
+                await engine.run_cycle()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(scenario())
+        assert metrics.STAGE_DURATION.count("local", "sync") == 1
+        assert metrics.STAGE_DURATION.count("local", "tagging") == 1
+        assert metrics.TORRENTS_PROCESSED.value("local") == 2
+        assert metrics.API_CALLS.value("sync/maindata", "200") == 1
+        assert metrics.API_LATENCY.count("torrents/info") == 1
+        assert metrics.API_RECEIVED_BYTES.value("sync/maindata") > 0
+        text = textfile.read_text()
+        assert 'qfu_stage_duration_seconds_count{client="local",stage="tagging"} 1' in text
+        assert 'qfu_api_calls_total{endpoint="auth/login",status="200"} 1' in text
+    finally:
+        metrics.registry.clear()
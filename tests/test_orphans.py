@@ -0,0 +1,50 @@
+# tests/test_orphans.py
+from qbt_flow_utils.files.orphans import (
+    ExpectedPaths,
+    client_roots,
+    find_orphans,
+    torrent_save_path,
+)
+
+CLIENT_CONFIG = {
+    "category": {"films": "/data/films", "tv": "/other/tv"},
+    "path": {"downloads_path": "/data", "recycle_bin": "/data/.RecycleBin"},
+}
+
+
+def test_client_roots_and_save_path():
+    assert client_roots(CLIENT_CONFIG) == ["/data", "/other/tv"]
+    assert torrent_save_path({"save_path": "/x"}, CLIENT_CONFIG) == "/x"
+    assert torrent_save_path({"category": "tv"}, CLIENT_CONFIG) == "/other/tv"
+    assert torrent_save_path({"category": "unknown"}, CLIENT_CONFIG) == "/data"
+
+
+def test_find_orphans(tmp_path):
+    films = tmp_path / "films" / "Movie"
+    films.mkdir(parents=True)
+    (films / "movie.mkv").write_bytes(b"")
+    (films / "sample.mkv").write_bytes(b"")
+    (tmp_path / "tv").mkdir()
+    (tmp_path / "tv" / "episode.mkv.!qB").write_bytes(b"")
+    (tmp_path / "loose.nfo").write_bytes(b"")
+    recycle_bin = tmp_path / ".RecycleBin"
+    recycle_bin.mkdir()
+    (recycle_bin / "deleted.mkv").write_bytes(b"")
+
+    expected = ExpectedPaths()
+    expected.add_torrent(str(tmp_path / "films"), ["Movie/movie.mkv"])
+    expected.add_torrent(str(tmp_path / "tv"), ["episode.mkv"])
+
+    orphans = set(find_orphans([str(tmp_path)], expected, excluded=[str(recycle_bin)]))
+    assert orphans == {str(films / "sample.mkv"), str(tmp_path / "loose.nfo")}
+
+
+def test_find_orphans_early_stop(tmp_path):
+    for i in range(20):
+        folder = tmp_path / f"dir{i}"
+        folder.mkdir()
+        for j in range(5):
+            (folder / f"{j}.bin").write_bytes(b"")
+    orphans = find_orphans([str(tmp_path)], ExpectedPaths(), max_workers=2, max_pending=1)
+    assert next(orphans)
+    orphans.close()
@@ -0,0 +1,208 @@
+# tests/test_rclone_verifier.py
+import asyncio
+import os
+import shutil
+import stat
+import sys
+import textwrap
+
+import pytest
+from pydantic import ValidationError
+
+from qbt_flow_utils.config.config import ConfigRegistry
+from qbt_flow_utils.config.schemas import RcloneConfig
+from qbt_flow_utils.files import rclone as rclone_module
+from qbt_flow_utils.files.rclone import RcloneError, UploadVerifier, parse_mod_time
+
+CONFIG_FOLDER = os.path.join(os.path.dirname(__file__), "..", "config")
+
+# Emulates `rclone lsjson --recursive` with "<remote>:<path>" mapped to
+# $RCLONE_STUB_ROOT/<path>, and logs the listed paths.
+STUB = textwrap.dedent(
+    """\
+    import datetime, hashlib, json, os, sys
+
+    root = os.environ["RCLONE_STUB_ROOT"]
+    with open(os.environ["RCLONE_STUB_LOG"], "a") as log:
+        log.write(" ".join(sys.argv[1:]) + "\\n")
+    args = sys.argv[1:]
+    path = os.path.join(root, args[-1].split(":", 1)[1])
+    if not os.path.isdir(path):
+        sys.stderr.write("directory not found")
+        sys.exit(3)
+    listing = []
+    for dir_path, _, names in os.walk(path):
+        for name in names:
+            full = os.path.join(dir_path, name)
+            mtime = datetime.datetime.fromtimestamp(
+                os.stat(full).st_mtime, datetime.timezone.utc
+            )
+            item = {
+                "Path": os.path.relpath(full, path),
+                "Name": name,
+                "Size": os.stat(full).st_size,
+                "ModTime": mtime.strftime("%Y-%m-%dT%H:%M:%S.%f") + "123Z",
+                "IsDir": False,
+            }
+            if "--hash" in args:
+                with open(full, "rb") as file:
+                    item["Hashes"] = {"MD5": hashlib.md5(file.read()).hexdigest()}
+            listing.append(item)
+    json.dump(listing, sys.stdout)
+    """,
+)
+
+
+@pytest.fixture()
+def layout(tmp_path, monkeypatch):
+    local = tmp_path / "local"
+    remote = tmp_path / "remote"
+    for root in (local, remote):
+        (root / "Show.S01").mkdir(parents=True)
+        (root / "Show.S01" / "e01.mkv").write_bytes(b"a" * 10)
+        (root / "Show.S01" / "e02.mkv").write_bytes(b"b" * 10)
+        (root / "Movie.mkv").write_bytes(b"c" * 20)
+        os.utime(root / "Show.S01" / "e01.mkv", (1_700_000_000, 1_700_000_000))
+    (local / "Pending").mkdir()
+    (local / "Pending" / "file.mkv").write_bytes(b"d")
+
+    binary = tmp_path / "rclone"
+    binary.write_text(f"#!{sys.executable}\n{STUB}")
+    binary.chmod(binary.stat().st_mode | stat.S_IEXEC)
+    log = tmp_path / "rclone.log"
+    log.touch()
+    monkeypatch.setenv("RCLONE_STUB_ROOT", str(remote))
+    monkeypatch.setenv("RCLONE_STUB_LOG", str(log))
+    return local, remote, binary, log
+
+
+def _verifier(layout, **options):
+    local, _, binary, _ = layout
+    config = {"remote": "stub:", "local_root": str(local), "rclone_binary": str(binary)}
+    return UploadVerifier(RcloneConfig(**config, **options).model_dump())
+
+
+def test_schema_validation():
+    with pytest.raises(ValidationError):
+        RcloneConfig(remote="no-colon", local_root="/media")
+    with pytest.raises(ValidationError):
+        RcloneConfig(remote="gdrive:", local_root="media")
+    with pytest.raises(ValidationError):
+        RcloneConfig(remote="gdrive:", local_root="/media", compare="crc")
+    with pytest.raises(ValidationError, match="quickxor"):
+        RcloneConfig(remote="gdrive:", local_root="/media", hash_type="quickxor")
+    assert RcloneConfig(remote="gdrive:", local_root="/media", hash_type="SHA-1").hash_type
+
+
+def test_parse_mod_time():
+    assert parse_mod_time("2023-11-14T22:13:20Z") == 1_700_000_000
+    assert parse_mod_time("2023-11-14T22:13:20.123456789Z") == pytest.approx(1_700_000_000.123456)
+    assert parse_mod_time("2023-11-15T00:13:20.5+02:00") == 1_700_000_000.5
+
+
+def test_full_listing_is_indexed_once(layout):
+    local, _, _, log = layout
+    verifier = _verifier(layout)
+    asyncio.run(verifier.refresh())
+    paths = [str(local / "Show.S01"), str(local / "Movie.mkv"), str(local / "Pending")]
+    assert verifier.verify(paths) == dict(zip(paths, [True, True, False]))
+    assert verifier.listings == 1
+    assert log.read_text().split() == [
+        "lsjson",
+        "--recursive",
+        "--files-only",
+        "--no-mimetype",
+        "--no-modtime",
+        "stub:",
+    ]
+
+
+def test_incremental_listing(layout):
+    local, remote, _, log = layout
+    verifier = _verifier(layout)
+    asyncio.run(verifier.refresh())
+    assert verifier.is_uploaded(str(local / "Show.S01"))
+
+    # A removed remote file is only seen once its directory is listed again.
+    (remote / "Show.S01" / "e02.mkv").unlink()
+    (remote / "Pending").mkdir()
+    (remote / "Pending" / "file.mkv").write_bytes(b"d")
+    asyncio.run(verifier.refresh([str(local / "Pending")]))
+    assert verifier.is_uploaded(str(local / "Pending"))
+    assert verifier.is_uploaded(str(local / "Show.S01"))
+    asyncio.run(verifier.refresh([str(local / "Show.S01" / "e01.mkv"), str(local / "New")]))
+    assert not verifier.is_uploaded(str(local / "Show.S01"))
+    assert verifier.is_uploaded(str(local / "Movie.mkv"))
+    assert [line.split()[-1] for line in log.read_text().splitlines()] == [
+        "stub:",
+        "stub:Pending",
+        "stub:New",
+        "stub:Show.S01",
+    ]
+
+
+def test_compare_size_modtime_and_hash(layout):
+    local, remote, _, _ = layout
+    episode = str(local / "Show.S01" / "e01.mkv")
+    (remote / "Show.S01" / "e01.mkv").write_bytes(b"x" * 10)
+    os.utime(remote / "Show.S01" / "e01.mkv", (1_700_000_000, 1_700_000_000))
+
+    results = {}
+    for compare in ("size", "modtime", "hash"):
+        verifier = _verifier(layout, compare=compare)
+        asyncio.run(verifier.refresh())
+        results[compare] = verifier.is_uploaded(episode)
+    assert results == {"size": True, "modtime": True, "hash": False}
+
+    os.utime(local / "Show.S01" / "e01.mkv", (1_700_000_100, 1_700_000_100))
+    verifier = _verifier(layout, compare="modtime")
+    asyncio.run(verifier.refresh())
+    assert not verifier.is_uploaded(episode)
+    assert verifier.is_uploaded(str(local / "Movie.mkv"))
+
+
+def test_local_hashes_cached(layout, monkeypatch):
+    local, remote, _, _ = layout
+    verifier = _verifier(layout, compare="hash")
+    asyncio.run(verifier.refresh())
+    hashed = []
+    file_hash = rclone_module.file_hash
+    monkeypatch.setattr(
+        rclone_module,
+        "file_hash",
+        lambda path, *args: hashed.append(path) or file_hash(path, *args),
+    )
+    paths = [str(local / "Show.S01"), str(local / "Movie.mkv")]
+    assert verifier.verify(paths) == dict.fromkeys(paths, True)
+    assert len(hashed) == 3
+    assert verifier.verify(paths) == dict.fromkeys(paths, True)
+    assert len(hashed) == 3
+
+    # Modified files are hashed again, files no longer verified are forgotten.
+    for root in (local, remote):
+        (root / "Movie.mkv").write_bytes(b"e" * 20)
+    asyncio.run(verifier.refresh())
+    assert verifier.verify(paths[1:]) == {paths[1]: True}
+    assert hashed[3:] == [paths[1]]
+    assert len(verifier._hashes) == 1
+
+
+def test_outside_root_and_errors(layout, tmp_path):
+    local, _, _, _ = layout
+    verifier = _verifier(layout)
+    asyncio.run(verifier.refresh())
+    assert not verifier.is_uploaded(str(tmp_path / "rclone.log"))
+    assert not verifier.is_uploaded(str(local / "Missing"))
+
+    verifier.remote = "stub:missing"
+    with pytest.raises(RcloneError, match="directory not found"):
+        asyncio.run(verifier.refresh())
+
+
+def test_registry_loads_rclone(tmp_path):
+    shutil.copytree(CONFIG_FOLDER, tmp_path, dirs_exist_ok=True)
+    registry = ConfigRegistry(str(tmp_path), str(tmp_path / "cache" / "config.cache"))
+    rclone_config = registry.rclone()
+    assert rclone_config.remote == "gdrive:media"
+    assert rclone_config.compare == "modtime"
+    assert UploadVerifier(rclone_config).relative_path("/media/a/b.mkv") == "a/b.mkv"
@@ -0,0 +1,167 @@
+# tests/test_recycle_bin.py
+import asyncio
+import errno
+import os
+
+import pytest
+
+from qbt_flow_utils.disk import GIB
+from qbt_flow_utils.files import recycle_bin as recycle_bin_module
+from qbt_flow_utils.files.recycle_bin import RecycleBin
+
+NOW = 1_700_000_000.0
+
+
+def _content(tmp_path):
+    downloads = tmp_path / "downloads"
+    (downloads / "Show.S01").mkdir(parents=True)
+    (downloads / "Show.S01" / "e01.mkv").write_bytes(b"a" * 10)
+    (downloads / "Show.S01" / "e02.mkv").write_bytes(b"b" * 20)
+    (downloads / "Movie.mkv").write_bytes(b"c" * 40)
+    return downloads
+
+
+def test_recycle_moves_without_copy(tmp_path):
+    downloads = _content(tmp_path)
+    inode = os.stat(downloads / "Show.S01" / "e01.mkv").st_ino
+    recycle_bin = RecycleBin(str(tmp_path / "bin"))
+    entry = recycle_bin.recycle("aaa", [str(downloads / "Show.S01")], now=NOW)
+
+    assert entry.size == 30
+    assert recycle_bin.size == 30
+    assert not (downloads / "Show.S01").exists()
+    assert os.stat(tmp_path / "bin" / "aaa" / "0" / "Show.S01" / "e01.mkv").st_ino == inode
+
+    assert recycle_bin.restore("aaa")
+    assert os.stat(downloads / "Show.S01" / "e01.mkv").st_ino == inode
+    assert not (tmp_path / "bin" / "aaa").exists()
+    assert len(recycle_bin) == 0
+    assert not recycle_bin.restore("aaa")
+
+
+def test_recycle_keep_source_hardlinks(tmp_path):
+    downloads = _content(tmp_path)
+    recycle_bin = RecycleBin(str(tmp_path / "bin"))
+    recycle_bin.recycle("aaa", [str(downloads / "Show.S01")], keep_source=True)
+    assert os.stat(downloads / "Show.S01" / "e02.mkv").st_nlink == 2
+    (downloads / "Movie.mkv").write_bytes(b"d")
+    recycle_bin.recycle("bbb", [str(downloads / "Movie.mkv")], keep_source=True)
+    assert os.stat(downloads / "Movie.mkv").st_nlink == 2
+    with pytest.raises(FileExistsError):
+        recycle_bin.restore("bbb")
+
+
+def test_cross_device_fallback_copies(tmp_path, monkeypatch):
+    downloads = _content(tmp_path)
+
+    def cross_device(*args):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(recycle_bin_module.os, "rename", cross_device)
+    monkeypatch.setattr(recycle_bin_module.os, "link", cross_device)
+    recycle_bin = RecycleBin(str(tmp_path / "bin"))
+    recycle_bin.recycle("aaa", [str(downloads / "Show.S01"), str(downloads / "Movie.mkv")])
+
+    assert not (downloads / "Show.S01").exists()
+    assert not (downloads / "Movie.mkv").exists()
+    assert (tmp_path / "bin" / "aaa" / "0" / "Show.S01" / "e02.mkv").read_bytes() == b"b" * 20
+    assert (tmp_path / "bin" / "aaa" / "1" / "Movie.mkv").read_bytes() == b"c" * 40
+    assert recycle_bin.size == 70
+
+
+def test_partial_recycle_recorded(tmp_path):
+    downloads = _content(tmp_path)
+    recycle_bin = RecycleBin(str(tmp_path / "bin"))
+    missing = str(downloads / "missing.torrent")
+    with pytest.raises(FileNotFoundError):
+        recycle_bin.recycle("aaa", [str(downloads / "Show.S01"), missing], now=NOW)
+    # The moved content is counted and restorable.
+    assert recycle_bin.get("aaa").paths == (str(downloads / "Show.S01"),)
+    assert recycle_bin.size == 30
+    assert recycle_bin.restore("aaa")
+    assert (downloads / "Show.S01" / "e02.mkv").read_bytes() == b"b" * 20
+
+    with pytest.raises(FileNotFoundError):
+        recycle_bin.recycle("bbb", [missing, str(downloads / "Movie.mkv")], now=NOW)
+    assert "bbb" not in recycle_bin
+    assert not (tmp_path / "bin" / "bbb").exists()
+    assert (downloads / "Movie.mkv").exists()
+
+
+def test_manifest_is_persisted(tmp_path):
+    downloads = _content(tmp_path)
+    recycle_bin = RecycleBin(str(tmp_path / "bin"))
+    recycle_bin.recycle("bbb", [str(downloads / "Movie.mkv")], now=NOW + 10)
+    recycle_bin.recycle("aaa", [str(downloads / "Show.S01")], now=NOW)
+
+    reloaded = RecycleBin(str(tmp_path / "bin"))
+    reloaded.load()
+    assert reloaded.size == 70
+    assert "aaa" in reloaded
+    assert reloaded.get("bbb").paths == (str(downloads / "Movie.mkv"),)
+    # Oldest first whatever the recycling order.
+    assert reloaded.purge(bytes_to_free=1, now=NOW) == 30
+    assert "aaa" not in reloaded
+
+
+def test_purge_caps_oldest_first(tmp_path):
+    downloads = _content(tmp_path)
+    (downloads / "Other.mkv").write_bytes(b"d" * 5)
+    recycle_bin = RecycleBin(str(tmp_path / "bin"), max_bytes=50, max_age=3600)
+    recycle_bin.recycle("old", [str(downloads / "Show.S01")], now=NOW)
+    recycle_bin.recycle("mid", [str(downloads / "Movie.mkv")], now=NOW + 60)
+    recycle_bin.recycle("new", [str(downloads / "Other.mkv")], now=NOW + 120)
+
+    # Over the size cap: the oldest torrent is evicted.
+    assert recycle_bin.purge(now=NOW + 120) == 30
+    assert not (tmp_path / "bin" / "old").exists()
+    assert recycle_bin.purge(now=NOW + 120) == 0
+    # Over the age cap.
+    assert recycle_bin.purge(now=NOW + 3700) == 40
+    assert list(recycle_bin._entries) == ["new"]
+    # The disk target comes before the caps.
+    assert recycle_bin.purge(bytes_to_free=1, now=NOW + 120) == 5
+    assert recycle_bin.size == 0
+
+
+def test_hardlinked_files_not_reclaimable(tmp_path):
+    downloads = _content(tmp_path)
+    (tmp_path / "media").mkdir()
+    os.link(downloads / "Show.S01" / "e02.mkv", tmp_path / "media" / "e02.mkv")
+    recycle_bin = RecycleBin(str(tmp_path / "bin"), max_bytes=1000)
+    linked = recycle_bin.recycle("aaa", [str(downloads / "Show.S01")], now=NOW)
+    kept = recycle_bin.recycle("bbb", [str(downloads / "Movie.mkv")], keep_source=True, now=NOW)
+    assert (linked.size, linked.reclaimable) == (30, 10)
+    assert (kept.size, kept.reclaimable) == (40, 40)
+    assert recycle_bin.size == 70
+
+    # Only the unlinked episode counts toward the disk target.
+    assert recycle_bin.purge(bytes_to_free=20, now=NOW) == 50
+    assert len(recycle_bin) == 0
+    assert (tmp_path / "media" / "e02.mkv").read_bytes() == b"b" * 20
+
+
+def test_from_config_and_background_purger(tmp_path):
+    downloads = _content(tmp_path)
+    config = {
+        "disk_control_method": {"keep_free_gib": 10},
+        "path": {
+            "downloads_path": str(downloads),
+            "recycle_bin": str(tmp_path / "bin"),
+            "recycle_bin_max_gib": 1,
+            "recycle_bin_max_days": 0.5,
+        },
+    }
+    recycle_bin = RecycleBin.from_config(config)
+    assert (recycle_bin.max_bytes, recycle_bin.max_age) == (GIB, 43200)
+    assert recycle_bin.bytes_to_free() == 0
+    recycle_bin.recycle("aaa", [str(downloads / "Movie.mkv")], now=NOW)
+
+    async def scenario():
+        task = asyncio.create_task(recycle_bin.run_purger(3600))
+        while len(recycle_bin):
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert not (tmp_path / "bin" / "aaa").exists()
@@ -0,0 +1,110 @@
+# tests/test_removal_planner.py
+import os
+
+import numpy as np
+
+from qbt_flow_utils.files.inodes import InodeIndex
+from qbt_flow_utils.scoring.removal import RemovalPlanner
+from qbt_flow_utils.torrents.cross_seed import CrossSeedIndex
+from qbt_flow_utils.torrents.snapshot import TorrentSnapshot
+
+
+def _setup(tmp_path):
+    downloads, media = tmp_path / "downloads", tmp_path / "media"
+    media.mkdir()
+    sizes = {"linked": 100, "shared": 250, "big": 400, "small": 300, "pack": 0}
+    for name, size in sizes.items():
+        if name == "pack":
+            (downloads / "pack").mkdir()
+            (downloads / "pack" / "a").write_bytes(b"a" * 150)
+            (downloads / "pack" / "b").write_bytes(b"b" * 50)
+        else:
+            downloads.mkdir(exist_ok=True)
+            (downloads / name).write_bytes(b"x" * size)
+    os.link(downloads / "linked", media / "linked")
+    # "pack/b" is also linked by "small2", another torrent.
+    os.link(downloads / "pack" / "b", downloads / "small2")
+
+    torrents = {
+        "linked": ("linked", 100),
+        "shared1": ("shared", 250),
+        "shared2": ("shared", 250),
+        "big": ("big", 400),
+        "small": ("small", 300),
+        "pack": ("pack", 200),
+        "small2": ("small2", 50),
+    }
+    torrents = {
+        h: {"name": name, "size": size, "content_path": str(downloads / name), "tags": "t"}
+        for h, (name, size) in torrents.items()
+    }
+    index = InodeIndex([str(downloads), str(media)])
+    index.refresh()
+    return torrents, index
+
+
+def _plan(torrents, index, scores, bytes_to_free, selectable=None):
+    snapshot = TorrentSnapshot.from_torrents(torrents)
+    cross_seeds = CrossSeedIndex()
+    for torrent_hash, torrent in torrents.items():
+        cross_seeds.add(torrent_hash, torrent)
+    if selectable is None:
+        selectable = np.ones(len(snapshot), dtype=np.bool_)
+    plan = RemovalPlanner(index, cross_seeds).plan(
+        snapshot,
+        np.array([scores[h] for h in torrents], dtype=np.float64),
+        selectable,
+        bytes_to_free,
+        [torrent["content_path"] for torrent in torrents.values()],
+    )
+    return {snapshot.hashes[row] for row in plan.rows}, plan
+
+
+def test_hardlinks_and_cross_seeds(tmp_path):
+    torrents, index = _setup(tmp_path)
+    scores = {"linked": 99, "shared1": 50, "shared2": 40, "big": 30, "small": 20, "pack": 10}
+    scores["small2"] = 5
+
+    removed, plan = _plan(torrents, index, scores, 150)
+    # "linked" frees nothing, the "shared" family frees its data once.
+    assert removed == {"shared1", "shared2"}
+    assert plan.freed_bytes == 250
+
+    selectable = np.array([h != "shared2" for h in torrents])
+    removed, plan = _plan(torrents, index, scores, 150, selectable)
+    assert removed == {"big"}
+    assert plan.reached
+
+    # Not enough space: every freeing family is planned, shared inodes of
+    # "pack" and "small2" are freed once both are removed.
+    removed, plan = _plan(torrents, index, scores, 10_000)
+    assert removed == set(torrents) - {"linked"}
+    assert plan.freed_bytes == 250 + 400 + 300 + 200
+    assert not plan.reached
+
+
+def test_link_created_after_index_refresh(tmp_path):
+    torrents, index = _setup(tmp_path)
+    media = tmp_path / "media"
+    os.utime(media, (1_600_000_000, 1_600_000_000))
+    index.refresh()
+    # Linked into media once indexed: "big" directory mtime is unchanged.
+    os.link(tmp_path / "downloads" / "big", media / "big")
+    scores = {h: 1.0 for h in torrents}
+    scores["big"] = 99
+    removed, plan = _plan(torrents, index, scores, 10_000)
+    assert "big" not in removed
+    assert plan.freed_bytes == 250 + 300 + 200
+
+
+def test_without_inode_index():
+    torrents = {h: {"name": h, "size": size} for h, size in (("a", 10), ("b", 30), ("c", 5))}
+    snapshot = TorrentSnapshot.from_torrents(torrents)
+    plan = RemovalPlanner().plan(
+        snapshot,
+        np.array([3.0, 2.0, 1.0]),
+        np.ones(3, dtype=np.bool_),
+        20,
+    )
+    assert plan.rows.tolist() == [1]
+    assert plan.freed_bytes == 30
@@ -0,0 +1,105 @@
+# tests/test_rule_engine.py
+import asyncio
+
+from benchmarks.fake_qbittorrent import FakeQBittorrent
+from qbt_flow_utils.config.runtime import compile_tracker
+from qbt_flow_utils.qbittorrent.client import QBittorrentClient
+from qbt_flow_utils.qbittorrent.sync import ClientStateStore
+from qbt_flow_utils.rules.engine import RuleEngine, apply_actions
+from qbt_flow_utils.torrents.snapshot import TorrentSnapshot
+from qbt_flow_utils.trackers.matcher import TrackerMatcher
+
+HOUR = 3600
+
+
+def _tracker(tag, conditions, action, hit_and_run=None):
+    return {
+        "tracker_tag": tag,
+        "tracker_keywords": [f"{tag}.org"],
+        "hit_and_run": hit_and_run or {"ignore_hit_and_run": True},
+        "auto_manage": {"conditions": conditions, "action": action},
+    }
+
+
+TRACKERS = [
+    _tracker("aaa", {"max_seed_time": 10, "min_active_seeder": 2}, {"limit_upload_speed": 512}),
+    _tracker("bbb", {"max_ratio": 2}, {"limit_upload_speed": 512}),
+    _tracker(
+        "ccc",
+        {"max_ratio": 1, "protect_hit_and_run": True},
+        {"pause_torrent": True},
+        {"ignore_hit_and_run": False, "min_seed_time": 100},
+    ),
+    _tracker("ddd", {"max_ratio": 1}, {"remove_torrent": True}),
+]
+
+
+def _torrent(tracker, seeding_time=0, ratio=0.0, seeders=5, **properties):
+    return {
+        "tracker": f"https://{tracker}.org/announce",
+        "private": True,
+        "seeding_time": seeding_time,
+        "ratio": ratio,
+        "num_complete": seeders,
+        "up_limit": -1,
+        "state": "uploading",
+        **properties,
+    }
+
+
+TORRENTS = {
+    "a1": _torrent("aaa", seeding_time=11 * HOUR),
+    "a2": _torrent("aaa", seeding_time=11 * HOUR, seeders=1),
+    "a3": _torrent("aaa", seeding_time=11 * HOUR, up_limit=512 * 1024),
+    "a4": _torrent("aaa", seeding_time=9 * HOUR),
+    "b1": _torrent("bbb", ratio=2.5),
+    "c1": _torrent("ccc", ratio=3, seeding_time=50 * HOUR),
+    "c2": _torrent("ccc", ratio=3, seeding_time=101 * HOUR),
+    "c3": _torrent("ccc", ratio=3, seeding_time=101 * HOUR, state="pausedUP"),
+    "d1": _torrent("ddd", ratio=3),
+    "x1": _torrent("other", ratio=30),
+}
+
+
+def _engine_and_snapshot(torrents):
+    trackers = {config["tracker_tag"]: compile_tracker(config) for config in TRACKERS}
+    keywords = {tag: list(rules.keywords) for tag, rules in trackers.items()}
+    matcher = TrackerMatcher(keywords, "other", "public")
+    return RuleEngine(trackers), TorrentSnapshot.from_torrents(torrents, matcher)
+
+
+def test_plan_groups_actions():
+    engine, snapshot = _engine_and_snapshot(TORRENTS)
+    plan = {(batch.action, batch.parameter): batch.hashes for batch in engine.plan(snapshot)}
+    assert plan == {
+        ("limit_upload_speed", 512 * 1024): ("a1", "b1"),
+        ("pause_torrent", None): ("c2",),
+        ("remove_torrent", None): ("d1",),
+    }
+
+
+def test_apply_actions_and_dry_run():
+    async def scenario():
+        server = FakeQBittorrent()
+        for torrent_hash, torrent in TORRENTS.items():
+            server.add_torrent(torrent_hash, **torrent)
+        url = await server.start()
+        try:
+            async with QBittorrentClient(url, "admin", "adminadmin") as client:
+                state = ClientStateStore()
+                await state.sync(client)
+                engine, snapshot = _engine_and_snapshot(state.torrents)
+                batches = engine.plan(snapshot)
+                assert await apply_actions(client, batches, dry_run=True) == 0
+                assert server.torrents["a1"]["up_limit"] == -1
+                assert await apply_actions(client, batches, dry_run=False) == 2
+
+                await state.sync(client)
+                _, snapshot = _engine_and_snapshot(state.torrents)
+                assert [batch.action for batch in engine.plan(snapshot)] == ["remove_torrent"]
+        finally:
+            await server.close()
+        assert server.torrents["a1"]["up_limit"] == 512 * 1024
+        assert server.torrents["c2"]["state"] == "pausedUP"
+
+    asyncio.run(scenario())
@@ -0,0 +1,38 @@
+# tests/test_runtime_config.py
+import math
+import os
+import shutil
+
+from qbt_flow_utils.config.config import ConfigRegistry
+from qbt_flow_utils.config.runtime import compile_auto_manage, compile_hit_and_run
+
+CONFIG_FOLDER = os.path.join(os.path.dirname(__file__), "..", "config")
+
+
+def test_thresholds_are_converted(tmp_path):
+    shutil.copytree(CONFIG_FOLDER, tmp_path, dirs_exist_ok=True)
+    registry = ConfigRegistry(str(tmp_path), str(tmp_path / "cache" / "config.cache"))
+    runtime = registry.runtime()
+    sample = runtime.trackers["sample"]
+    assert sample.extra_score == 1000
+    assert sample.hit_and_run == (False, 40 * 3600, 1.0)
+    assert sample.auto_manage.max_seed_time == 30 * 3600
+    assert sample.auto_manage.min_active_seeder == 2
+    assert sample.auto_manage.action is None
+    assert sample.auto_manage.limit_upload_speed == 512 * 1024
+    assert runtime.scoring.coef_seed_ratio == 2.0
+    assert registry.runtime() is runtime
+
+
+def test_unset_thresholds_are_resolved():
+    hit_and_run = compile_hit_and_run({"ignore_hit_and_run": False, "min_ratio": 1})
+    assert hit_and_run.min_seed_time == math.inf
+    assert compile_hit_and_run({}).ignore
+
+    auto_manage = compile_auto_manage(
+        {"conditions": {"max_ratio": 2}, "action": {"pause_torrent": True}},
+    )
+    assert auto_manage.max_seed_time == math.inf
+    assert auto_manage.min_active_seeder == 0
+    assert auto_manage.action == "pause_torrent"
+    assert compile_auto_manage({"conditions": {"max_ratio": 2}, "action": {}}) is None
@@ -0,0 +1,64 @@
+# tests/test_scoring_engine.py
+import numpy as np
+
+from qbt_flow_utils.disk import GIB, bytes_to_free
+from qbt_flow_utils.scoring.engine import ScoringEngine
+from qbt_flow_utils.torrents.snapshot import TorrentSnapshot
+from qbt_flow_utils.trackers.matcher import TrackerMatcher
+
+SCORING_CONFIG = {
+    "ignore_untagged_torrents": True,
+    "ignore_tags_for_selection": ["cross-seed"],
+    "extra_tags_score": {"public": 10000},
+    "score_calculation": {
+        "coef_day_seed_time": 0.5,
+        "coef_seed_ratio": 2,
+        "coef_nums_seeder": 0.1,
+    },
+}
+TRACKERS_CONFIG = {"sample": {"tracker_keywords": ["example.com"], "extra_score": 1000}}
+
+
+def _snapshot():
+    torrents = {
+        "a": {"size": 10, "seeding_time": 86400 * 2, "ratio": 1.0, "num_complete": 10, "tags": "x"},
+        "b": {
+            "size": 20,
+            "tags": "public",
+            "tracker": "udp://open.org",
+            "private": False,
+        },
+        "c": {"size": 30, "tags": "sample", "tracker": "https://t.example.com/announce"},
+        "d": {"size": 40, "tags": "sample, cross-seed", "tracker": "https://example.com/a"},
+        "e": {"size": 50, "tags": ""},
+    }
+    matcher = TrackerMatcher.from_config(
+        TRACKERS_CONFIG,
+        {"unknown_tracker_tag": "Other", "public_tag": "public"},
+    )
+    return TorrentSnapshot.from_torrents(torrents, matcher)
+
+
+def test_score():
+    engine = ScoringEngine(SCORING_CONFIG, TRACKERS_CONFIG)
+    scores = engine.score(_snapshot())
+    assert np.allclose(scores, [1.0 + 2.0 + 1.0, 10000, 1000, 1000, 0])
+
+
+def test_selectable_masks():
+    engine = ScoringEngine(SCORING_CONFIG, TRACKERS_CONFIG)
+    assert engine.selectable(_snapshot()).tolist() == [True, True, True, False, False]
+
+
+def test_select_for_removal():
+    engine = ScoringEngine(SCORING_CONFIG, TRACKERS_CONFIG)
+    snapshot = _snapshot()
+    assert snapshot.hashes[engine.select_for_removal(snapshot, 25)].tolist() == ["b", "c"]
+    assert snapshot.hashes[engine.select_for_removal(snapshot, 1000)].tolist() == ["b", "c", "a"]
+    assert len(engine.select_for_removal(snapshot, 0)) == 0
+
+
+def test_bytes_to_free():
+    assert bytes_to_free({"max_percents": 50}, total=100, free=20) == 30
+    assert bytes_to_free({"max_percents": 50}, total=100, free=80) == 0
+    assert bytes_to_free({"keep_free_gib": 10}, total=100 * GIB, free=4 * GIB) == 6 * GIB
@@ -0,0 +1,99 @@
+# tests/test_state_cache.py
+import json
+import pickle
+
+import fakeredis
+import redis
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+
+from qbt_flow_utils.cache import LRUCache, StateCache, make_key
+
+
+def test_redis_roundtrip_and_invalidation():
+    server = fakeredis.FakeServer()
+    cache = StateCache(fakeredis.FakeRedis(server=server))
+    other_worker = StateCache(fakeredis.FakeRedis(server=server))
+
+    cache.set_many({make_key("tracker", "local", h): f"tag-{h}" for h in "abc"}, ttl=60)
+    cache.set(make_key("scores", "local"), [1.0, 2.0])
+    assert other_worker.get_many([make_key("tracker", "local", h) for h in "abz"]) == {
+        "tracker:local:a": "tag-a",
+        "tracker:local:b": "tag-b",
+    }
+    assert other_worker.hits == 2
+    assert other_worker.misses == 1
+
+    other_worker.invalidate_prefix("tracker:local:")
+    assert cache.get("tracker:local:a") is None
+    assert cache.get("scores:local") == [1.0, 2.0]
+    cache.invalidate("scores:local")
+    assert other_worker.get("scores:local", "missing") == "missing"
+
+
+def test_values_stored_as_json():
+    server = fakeredis.FakeServer()
+    cache = StateCache(fakeredis.FakeRedis(server=server))
+    cache.set("scores:local", {"a": (1.0, None)})
+    raw = cache.redis.get("qfu:scores:local")
+    assert json.loads(raw) == {"a": [1.0, None]}
+    assert StateCache(fakeredis.FakeRedis(server=server)).get("scores:local") == {"a": [1.0, None]}
+
+    # Anything else written to the shared Redis is a miss, never unpickled.
+    cache.redis.set("qfu:scores:local", pickle.dumps({"a": 1}))
+    assert cache.get("scores:local", "missing") == "missing"
+
+
+def test_fallback_when_redis_unreachable():
+    unreachable = redis.Redis(
+        host="127.0.0.1",
+        port=1,
+        socket_connect_timeout=0.1,
+        retry=Retry(NoBackoff(), 0),
+    )
+    cache = StateCache(unreachable, retry_interval=60)
+    cache.set("snapshot:local", {"a": 1})
+    assert cache.get("snapshot:local") == {"a": 1}
+    cache.invalidate("snapshot:local")
+    assert cache.get("snapshot:local") is None
+
+
+def test_invalidations_replayed_after_outage():
+    server = fakeredis.FakeServer()
+    cache = StateCache(fakeredis.FakeRedis(server=server), retry_interval=0)
+    cache.set_many({"tracker:local:a": "a", "tracker:local:b": "b", "scores:local": [1.0]})
+    cache.set("forever", 1, ttl=0)
+    assert server.connected
+    server.connected = False
+    cache.invalidate("scores:local")
+    cache.invalidate_prefix("tracker:local:")
+    server.connected = True
+    assert cache.get_many(["tracker:local:a", "scores:local", "forever"]) == {"forever": 1}
+    other_worker = StateCache(fakeredis.FakeRedis(server=server))
+    assert other_worker.get("tracker:local:b") is None
+    assert other_worker.redis.ttl("qfu:forever") == -1
+
+
+def test_writes_during_outage_invalidated_on_recovery():
+    server = fakeredis.FakeServer()
+    cache = StateCache(fakeredis.FakeRedis(server=server), retry_interval=0)
+    cache.set("x", "old")
+    server.connected = False
+    cache.set("x", "new")
+    assert cache.get("x") == "new"
+    server.connected = True
+    # The stale Redis value is not served, a miss is recomputed by the caller.
+    assert cache.get("x") is None
+    assert StateCache(fakeredis.FakeRedis(server=server)).get("x") is None
+
+
+def test_lru_eviction_and_expiry():
+    lru = LRUCache(max_size=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    lru.set("d", 4, ttl=-1)
+    assert lru.get("d", "expired") == "expired"
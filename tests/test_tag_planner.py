@@ -0,0 +1,71 @@
+# tests/test_tag_planner.py
+import asyncio
+
+from benchmarks.fake_qbittorrent import FakeQBittorrent
+from qbt_flow_utils.qbittorrent.client import QBittorrentClient
+from qbt_flow_utils.tagging.planner import (
+    TagMutation,
+    apply_tag_mutations,
+    managed_tags,
+    plan_tag_mutations,
+)
+from qbt_flow_utils.torrents.snapshot import parse_tags
+
+
+def test_managed_tags():
+    tags_config = {
+        "auto_tags_no_hard_link": True,
+        "no_hard_link_tag": "noHL",
+        "auto_tags_hard_link": False,
+        "hard_link_tag": "hardlink",
+    }
+    assert managed_tags(tags_config, ["sample"]) == {"noHL", "sample"}
+
+
+def test_plan_groups_by_tag():
+    current = {"a": ["noHL", "to-keep"], "b": [], "c": ["sample"]}
+    desired = {"a": ["sample"], "b": ["sample"], "c": ["sample"]}
+    mutations = plan_tag_mutations(current, desired, managed={"noHL", "sample"})
+    assert mutations == [
+        TagMutation("torrents/removeTags", "noHL", ("a",)),
+        TagMutation("torrents/addTags", "sample", ("a", "b")),
+    ]
+    assert mutations[1].data() == {"hashes": "a|b", "tags": "sample"}
+
+
+def test_plan_nothing_to_do():
+    current = {"a": ["noHL", "sample"]}
+    assert plan_tag_mutations(current, {"a": ["sample", "noHL"]}, managed={"noHL"}) == []
+
+
+def test_plan_chunks_hashes():
+    hashes = [f"{i:040x}" for i in range(100)]
+    mutations = plan_tag_mutations(
+        {},
+        {h: ["sample"] for h in hashes},
+        managed=set(),
+        max_request_bytes=1000,
+    )
+    assert len(mutations) > 1
+    assert [h for mutation in mutations for h in mutation.hashes] == hashes
+    assert all(len(mutation.data()["hashes"]) * 1.1 < 1000 for mutation in mutations)
+
+
+def test_apply_against_fake_server():
+    async def scenario():
+        server = FakeQBittorrent()
+        for i in range(2000):
+            server.add_torrent(f"{i:040x}", tags="noHL" if i % 2 else "")
+        url = await server.start()
+        try:
+            async with QBittorrentClient(url, "admin", "adminadmin") as client:
+                current = {h: parse_tags(t["tags"]) for h, t in server.torrents.items()}
+                desired = {h: ["sample"] for h in server.torrents}
+                mutations = plan_tag_mutations(current, desired, managed={"noHL", "sample"})
+                calls = await apply_tag_mutations(client, mutations, dry_run=False)
+            assert calls == 2
+            assert all(parse_tags(t["tags"]) == ["sample"] for t in server.torrents.values())
+        finally:
+            await server.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,36 @@
+# tests/test_tracker_matcher.py
+from qbt_flow_utils.trackers.matcher import TrackerMatcher
+
+
+def _matcher():
+    return TrackerMatcher(
+        {
+            "sample": ["example.com"],
+            "keysample": ["key.example.com"],
+            "passkey": ["announce.php?passkey"],
+        },
+        unknown_tracker_tag="Other",
+        public_tag="public",
+    )
+
+
+def test_match_hostname_suffix():
+    matcher = _matcher()
+    assert matcher.match_url("https://tracker.example.com/announce") == "sample"
+    assert matcher.match_url("https://key.example.com:8443/abc/announce") == "keysample"
+    assert matcher.match_url("https://notexample.com/announce") is None
+
+
+def test_match_substring_keyword():
+    matcher = _matcher()
+    assert matcher.match_url("http://foo.org/announce.php?passkey=abcdef") == "passkey"
+    assert matcher.match_url("HTTP://FOO.ORG/ANNOUNCE.PHP?PASSKEY=ABC") == "passkey"
+
+
+def test_match_fallback_tags():
+    matcher = _matcher()
+    assert matcher.match(["udp://open.tracker.org:1337"], is_private=True) == "Other"
+    assert matcher.match(["udp://open.tracker.org:1337"], is_private=False) == "public"
+    assert matcher.match(["", "udp://tracker.example.com"]) == "sample"
+    assert matcher.match([]) == "public"
+    assert matcher.match([""], is_private=True) == "Other"
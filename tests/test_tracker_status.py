@@ -0,0 +1,196 @@
+# tests/test_tracker_status.py
+import asyncio
+
+from loguru import logger
+
+from benchmarks.fake_qbittorrent import FakeQBittorrent
+from qbt_flow_utils.logging import RateLimitFilter
+from qbt_flow_utils.qbittorrent.client import QBittorrentClient
+from qbt_flow_utils.qbittorrent.sync import ClientStateStore
+from qbt_flow_utils.tagging.planner import apply_tag_mutations, managed_tags, plan_tag_mutations
+from qbt_flow_utils.torrents.snapshot import parse_tags
+from qbt_flow_utils.trackers.matcher import TrackerMatcher
+from qbt_flow_utils.trackers.status import (
+    NOT_CONTACTED,
+    NOT_WORKING,
+    WORKING,
+    TrackerStatusFetcher,
+    tracker_status,
+)
+
+TAGS_CONFIG = {
+    "auto_tags_public": True,
+    "public_tag": "public",
+    "auto_tags_unknown_trackers": False,
+    "unknown_tracker_tag": "Other",
+    "auto_tags_tracker_error": True,
+    "tracker_error_tag": "TrackerError",
+}
+DHT = {"url": "** [DHT] **", "status": WORKING}
+
+
+def _tracker(url, status):
+    return {"url": url, "status": status, "msg": ""}
+
+
+def _run(scenario, server):
+    async def main():
+        url = await server.start()
+        try:
+            async with QBittorrentClient(url, "admin", "adminadmin") as client:
+                store = ClientStateStore()
+
+                async def cycle(fetcher, now=None):
+                    await store.sync(client)
+                    fetcher.update(store.torrents, store.pop_changes())
+                    return await fetcher.fetch(client, now)
+
+                await scenario(client, store, cycle)
+        finally:
+            await server.close()
+
+    asyncio.run(main())
+
+
+def test_tracker_status():
+    assert tracker_status([DHT, _tracker("a", NOT_WORKING), _tracker("b", WORKING)]) == WORKING
+    assert tracker_status([DHT, _tracker("a", NOT_WORKING)]) == NOT_WORKING
+    assert tracker_status([DHT]) is None
+
+
+def test_fetch_only_changed_and_tag():
+    server = FakeQBittorrent()
+    server.add_torrent("a", state="uploading", tracker="https://t.example.com/a", private=True)
+    server.add_torrent("b", state="stalledUP", tracker="", private=True, tags="keep")
+    server.add_torrent("c", state="uploading", tracker="", private=False)
+    server.set_trackers("a", [DHT, _tracker("https://t.example.com/a", WORKING)])
+    server.set_trackers("b", [DHT, _tracker("https://t.example.com/b", NOT_WORKING)])
+    server.set_trackers("c", [DHT])
+    matcher = TrackerMatcher({"sample": ["example.com"]}, "Other", "public")
+
+    async def scenario(client, store, cycle):
+        fetcher = TrackerStatusFetcher(max_calls=10)
+        assert await cycle(fetcher) == 3
+        assert fetcher.errors() == {"b"}
+        desired = fetcher.desired_tags(store.torrents, matcher, TAGS_CONFIG)
+        # The failing torrent has no working tracker, still matched from its URLs.
+        assert desired == {"a": ["sample"], "b": ["sample", "TrackerError"], "c": ["public"]}
+        current = {h: parse_tags(t.get("tags") or "") for h, t in store.torrents.items()}
+        mutations = plan_tag_mutations(current, desired, managed_tags(TAGS_CONFIG, ["sample"]))
+        await apply_tag_mutations(client, mutations, dry_run=False)
+        assert parse_tags(server.torrents["b"]["tags"]) == ["TrackerError", "keep", "sample"]
+
+        # Tags and unrelated fields changed, nothing to fetch.
+        server.update_torrent("a", uploaded=10)
+        assert await cycle(fetcher) == 0
+        assert fetcher.stale == set()
+
+        # The working tracker failed: cleared by qBittorrent.
+        server.update_torrent("a", tracker="")
+        server.set_trackers("a", [_tracker("https://t.example.com/a", NOT_WORKING)])
+        assert await cycle(fetcher) == 1
+        assert fetcher.errors() == {"a", "b"}
+
+    _run(scenario, server)
+
+
+def test_reannounce_and_ttl_refetch():
+    server = FakeQBittorrent()
+    server.add_torrent("a", state="uploading", tracker="https://t.example.com", reannounce=100)
+    server.add_torrent("b", state="stalledUP", tracker="", reannounce=100)
+    server.set_trackers("a", [_tracker("https://t.example.com", WORKING)])
+    server.set_trackers("b", [_tracker("https://t.example.com", NOT_CONTACTED)])
+
+    async def scenario(client, store, cycle):
+        fetcher = TrackerStatusFetcher(ttls={NOT_CONTACTED: 50}, max_calls=10)
+        assert await cycle(fetcher, now=0) == 2
+        # Countdowns running, then both announced again.
+        server.update_torrent("a", reannounce=40)
+        server.update_torrent("b", reannounce=40)
+        assert await cycle(fetcher, now=10) == 0
+        server.update_torrent("a", reannounce=1800)
+        server.update_torrent("b", reannounce=1800)
+        server.set_trackers("b", [_tracker("https://t.example.com", NOT_WORKING)])
+        # Only the torrent not seen working is fetched again.
+        assert await cycle(fetcher, now=20) == 1
+        assert fetcher.status("b") == NOT_WORKING
+        # Failing trackers expire sooner than working ones.
+        assert await cycle(fetcher, now=20 + 1800) == 1
+        assert await cycle(fetcher, now=6 * 3600 - 1) == 1
+        assert await cycle(fetcher, now=6 * 3600) == 1
+        assert fetcher.status("a") == WORKING
+        assert fetcher.urls("a") == ("https://t.example.com",)
+
+    _run(scenario, server)
+
+
+def test_calls_capped_with_retries():
+    server = FakeQBittorrent()
+    hashes = [f"{i:040x}" for i in range(10)]
+    for torrent_hash in hashes:
+        server.add_torrent(torrent_hash, state="uploading", tracker="")
+        server.set_trackers(torrent_hash, [_tracker("https://t.example.com", WORKING)])
+
+    async def scenario(client, store, cycle):
+        fetcher = TrackerStatusFetcher(max_calls=4, workers=2, backoff=0)
+        server.fail_next("torrents/trackers", 1)
+        assert await cycle(fetcher) == 4
+        assert len(fetcher.stale) == 7
+        assert server.max_in_flight <= 2
+        # Left over torrents go first.
+        server.update_torrent(hashes[0], state="pausedUP")
+        assert await cycle(fetcher) == 4
+        assert hashes[0] in fetcher.stale
+        assert await cycle(fetcher) == 4
+        assert fetcher.stale == set()
+
+        server.remove_torrent(hashes[1])
+        assert await cycle(fetcher) == 0
+        assert fetcher.status(hashes[1]) is None
+
+    _run(scenario, server)
+
+
+def test_stale_fetched_in_order():
+    server = FakeQBittorrent()
+    low, high = "0" * 40, "f" * 40
+    for torrent_hash in (low, high):
+        server.add_torrent(torrent_hash, state="uploading", tracker="")
+        server.set_trackers(torrent_hash, [_tracker("https://t.example.com", WORKING)])
+
+    async def scenario(client, store, cycle):
+        fetcher = TrackerStatusFetcher(max_calls=2)
+        assert await cycle(fetcher) == 2
+        # The high hash became stale first, it is not passed by the low one.
+        server.update_torrent(high, state="stalledUP")
+        fetcher.max_calls = 0
+        assert await cycle(fetcher) == 0
+        server.update_torrent(low, state="stalledUP")
+        fetcher.max_calls = 1
+        assert await cycle(fetcher) == 1
+        assert fetcher.stale == {low}
+        assert await cycle(fetcher) == 1
+        assert fetcher.stale == set()
+
+    _run(scenario, server)
+
+
+def test_fetch_errors_rate_limited():
+    server = FakeQBittorrent()
+    for i in range(5):
+        server.add_torrent(f"{i:040x}", state="uploading", tracker="")
+    messages = []
+    handler_id = logger.add(
+        messages.append, level="WARNING", filter=RateLimitFilter(limit=2, window=3600)
+    )
+
+    async def scenario(client, store, cycle):
+        fetcher = TrackerStatusFetcher(max_calls=5, retries=0)
+        server.fail_next("torrents/trackers", 5)
+        assert await cycle(fetcher) == 5
+
+    try:
+        _run(scenario, server)
+    finally:
+        logger.remove(handler_id)
+    assert len(messages) == 2
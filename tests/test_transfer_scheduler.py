@@ -0,0 +1,272 @@
+# tests/test_transfer_scheduler.py
+import asyncio
+import hashlib
+import threading
+import time
+
+import pytest
+
+from qbt_flow_utils.transfers import copier
+from qbt_flow_utils.transfers import scheduler as scheduler_module
+from qbt_flow_utils.transfers.copier import ChecksumError, RateLimiter, copy_file_resumable
+from qbt_flow_utils.transfers.scheduler import DONE, FAILED, PENDING, TransferScheduler
+
+
+def _hosts(tmp_path, **transfer):
+    local = tmp_path / "local"
+    remote = tmp_path / "remote"
+    local.mkdir()
+    remote.mkdir()
+    clients_config = {
+        "local": {"path": {"downloads_path": str(local)}, "transfer": transfer},
+        "remote": {"path": {"downloads_path": str(remote)}},
+    }
+    return local, remote, clients_config
+
+
+def _torrent(root, name, files):
+    content = root / name
+    content.mkdir(parents=True)
+    for file_name, data in files.items():
+        (content / file_name).write_bytes(data)
+    return content
+
+
+def test_move_to_local_checksummed(tmp_path):
+    local, remote, clients_config = _hosts(tmp_path)
+    content = _torrent(remote / "tv", "Show.S01", {"e01.mkv": b"a" * 100, "e02.mkv": b"b" * 50})
+    (remote / "Movie.mkv").write_bytes(b"m" * 10)
+    scheduler = TransferScheduler.from_config(clients_config, "local")
+
+    jobs = scheduler.enqueue_action("move_to_local", "remote", "aaa", str(content))
+    scheduler.enqueue_action("move_to_local", "remote", "bbb", str(remote / "Movie.mkv"))
+    assert [job.target_path for job in jobs] == [str(local / "tv" / "Show.S01")]
+    assert scheduler.enqueue_action("move_to_local", "local", "ccc", str(local)) == []
+
+    assert asyncio.run(scheduler.run()) == {DONE: 2}
+    assert (local / "tv" / "Show.S01" / "e02.mkv").read_bytes() == b"b" * 50
+    assert (local / "Movie.mkv").read_bytes() == b"m" * 10
+    assert not content.exists()
+    assert jobs[0].checksums == {
+        "e01.mkv": hashlib.sha256(b"a" * 100).hexdigest(),
+        "e02.mkv": hashlib.sha256(b"b" * 50).hexdigest(),
+    }
+
+
+def test_sync_to_remote_keeps_source(tmp_path):
+    local, remote, clients_config = _hosts(tmp_path)
+    content = _torrent(local, "Album", {"01.flac": b"x" * 10})
+    scheduler = TransferScheduler.from_config(clients_config, "local")
+    scheduler.enqueue_action("sync_to_remote", "local", "aaa", str(content))
+    asyncio.run(scheduler.run())
+    assert (remote / "Album" / "01.flac").read_bytes() == b"x" * 10
+    assert (content / "01.flac").exists()
+    with pytest.raises(ValueError, match="not a transfer action"):
+        scheduler.enqueue_action("remove_torrent", "local", "aaa", str(content))
+    with pytest.raises(ValueError, match="not under"):
+        scheduler.enqueue("bbb", "local", "remote", str(tmp_path / "elsewhere"))
+
+
+def test_priority_and_deduplication(tmp_path):
+    local, remote, clients_config = _hosts(tmp_path, max_concurrent=1)
+    for name in ("low", "high", "big"):
+        _torrent(remote, name, {"file": name.encode()})
+    scheduler = TransferScheduler.from_config(clients_config, "local")
+    scheduler.enqueue("low", "remote", "local", str(remote / "low"), score=1)
+    scheduler.enqueue("high", "remote", "local", str(remote / "high"), score=5)
+    scheduler.enqueue("big", "remote", "local", str(remote / "big"), score=1, freed_bytes=10)
+    # Selected again by another trigger, with a higher priority.
+    job = scheduler.enqueue("low", "remote", "local", str(remote / "low"), score=9, trigger="b")
+    assert job.score == 9
+    assert job.triggers == {"b"}
+    assert scheduler.pending() == 3
+
+    order = []
+    transfer = scheduler._transfer
+
+    def recording_transfer(job, *args):
+        order.append(job.torrent_hash)
+        return transfer(job, *args)
+
+    scheduler._transfer = recording_transfer
+    asyncio.run(scheduler.run())
+    assert order == ["low", "high", "big"]
+    # A transferred torrent is not queued again, until its job expires.
+    scheduler.enqueue("high", "remote", "local", str(remote / "high"), score=100)
+    assert scheduler.pending() == 0
+    scheduler.done_ttl = 0
+    job = scheduler.enqueue("high", "remote", "local", str(remote / "high"), score=100)
+    assert (job.status, job.score, scheduler.pending()) == (PENDING, 100, 1)
+
+
+def test_concurrency_cap_per_destination(tmp_path, monkeypatch):
+    local, remote, clients_config = _hosts(tmp_path, max_concurrent=2)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow_copy(src, dst, limiter=None):
+        with lock:
+            running.append(src)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(src)
+        return "checksum"
+
+    monkeypatch.setattr(scheduler_module, "copy_file_resumable", slow_copy)
+    scheduler = TransferScheduler.from_config(clients_config, "local")
+    # Nothing is copied, the jobs fail.
+    scheduler.max_attempts = 1
+    for i in range(6):
+        content = _torrent(remote, f"t{i}", {"file": b"x"})
+        scheduler.enqueue(f"t{i}", "remote", "local", str(content))
+    asyncio.run(scheduler.run())
+    assert max(peak) == 2
+
+
+def test_persistent_queue_resumes(tmp_path, monkeypatch):
+    local, remote, clients_config = _hosts(tmp_path)
+    content = _torrent(remote, "Show", {"a.mkv": b"a" * 10, "b.mkv": b"b" * 10})
+    queue_file = str(tmp_path / "cache" / "transfers.state")
+    scheduler = TransferScheduler.from_config(clients_config, "local", queue_file)
+    scheduler.enqueue("aaa", "remote", "local", str(content), move=True, trigger="tracker")
+
+    def interrupted_copy(src, dst, limiter=None):
+        if src.endswith("b.mkv"):
+            raise OSError("Connection lost")
+        return copy_file_resumable(src, dst, limiter)
+
+    monkeypatch.setattr(scheduler_module, "copy_file_resumable", interrupted_copy)
+    scheduler.max_attempts = 1
+    assert asyncio.run(scheduler.run()) == {FAILED: 1}
+    assert next(iter(scheduler.jobs.values())).checksums.keys() == {"a.mkv"}
+
+    monkeypatch.undo()
+    reloaded = TransferScheduler.from_config(clients_config, "local", queue_file)
+    job = reloaded.jobs[("aaa", "local")]
+    assert job.status == FAILED
+    assert job.error == "Connection lost"
+    # A new trigger retries a failed transfer, the copied file is skipped.
+    job = reloaded.enqueue("aaa", "remote", "local", str(content), move=True)
+    assert job.status == PENDING
+    job.checksums = {"a.mkv": "copied"}
+    assert asyncio.run(reloaded.run()) == {DONE: 1}
+    assert (local / "Show" / "b.mkv").read_bytes() == b"b" * 10
+    assert job.checksums["a.mkv"] == "copied"
+
+
+def test_move_keeps_source_on_checksum_mismatch(tmp_path, monkeypatch):
+    local, remote, clients_config = _hosts(tmp_path)
+    content = _torrent(remote, "Show", {"a.mkv": b"a" * 10, "b.mkv": b"b" * 10})
+    scheduler = TransferScheduler.from_config(clients_config, "local")
+    scheduler.max_attempts = 1
+    job = scheduler.enqueue("aaa", "remote", "local", str(content), move=True)
+
+    file_sha256 = copier.file_sha256
+    monkeypatch.setattr(
+        copier,
+        "file_sha256",
+        lambda path, *args: "corrupted" if path.endswith("b.mkv") else file_sha256(path, *args),
+    )
+    assert asyncio.run(scheduler.run()) == {FAILED: 1}
+    assert "does not match" in job.error
+    assert (content / "b.mkv").exists()
+    assert not (local / "Show" / "b.mkv").exists()
+
+    # Retried: a file copied before but removed since is copied again.
+    monkeypatch.undo()
+    (local / "Show" / "a.mkv").unlink()
+    scheduler.enqueue("aaa", "remote", "local", str(content), move=True)
+    assert asyncio.run(scheduler.run()) == {DONE: 1}
+    assert (local / "Show" / "a.mkv").read_bytes() == b"a" * 10
+    assert not content.exists()
+
+
+def test_failed_transfer_retried_after_backoff(tmp_path, monkeypatch):
+    local, remote, clients_config = _hosts(tmp_path, max_concurrent=1)
+    flaky = _torrent(remote, "flaky", {"f": b"x"})
+    other = _torrent(remote, "other", {"f": b"y"})
+    attempts = []
+
+    def flaky_copy(src, dst, limiter=None):
+        attempts.append((src, time.monotonic()))
+        if src.startswith(str(flaky)) and sum(s == src for s, _ in attempts) < 3:
+            raise OSError("Connection lost")
+        return copy_file_resumable(src, dst, limiter)
+
+    monkeypatch.setattr(scheduler_module, "copy_file_resumable", flaky_copy)
+    scheduler = TransferScheduler.from_config(clients_config, "local")
+    scheduler.retry_delay = 0.1
+    scheduler.enqueue("flaky", "remote", "local", str(flaky), score=1)
+    scheduler.enqueue("other", "remote", "local", str(other))
+    assert asyncio.run(scheduler.run()) == {DONE: 2}
+    # The other transfer runs while the failed one waits, then 0.1s and 0.2s backoffs.
+    sources = [src for src, _ in attempts]
+    assert sources == [str(flaky / "f"), str(other / "f"), str(flaky / "f"), str(flaky / "f")]
+    assert attempts[2][1] - attempts[0][1] >= 0.1
+    assert attempts[3][1] - attempts[2][1] >= 0.2
+
+
+def test_done_jobs_pruned(tmp_path):
+    local, remote, clients_config = _hosts(tmp_path)
+    queue_file = str(tmp_path / "cache" / "transfers.state")
+    scheduler = TransferScheduler.from_config(clients_config, "local", queue_file)
+    for name in ("a", "b"):
+        scheduler.enqueue(name, "remote", "local", str(_torrent(remote, name, {"f": b"x"})))
+    assert asyncio.run(scheduler.run()) == {DONE: 2}
+    scheduler.jobs[("a", "local")].finished_at -= scheduler.done_ttl
+    scheduler.save()
+
+    # Expired jobs are dropped from the persisted queue.
+    reloaded = TransferScheduler.from_config(clients_config, "local", queue_file)
+    assert list(reloaded.jobs) == [("b", "local")]
+    reloaded.done_ttl = 0
+    assert asyncio.run(reloaded.run()) == {}
+    assert TransferScheduler.from_config(clients_config, "local", queue_file).jobs == {}
+
+
+def test_copy_resumes_verified_part(tmp_path, monkeypatch):
+    src = tmp_path / "src.bin"
+    dst = tmp_path / "out" / "dst.bin"
+    data = bytes(range(256)) * 100
+    src.write_bytes(data)
+    dst.parent.mkdir()
+    part = tmp_path / "out" / "dst.bin.part"
+
+    part.write_bytes(data[:1000])
+    assert (
+        copy_file_resumable(str(src), str(dst), chunk_size=64) == hashlib.sha256(data).hexdigest()
+    )
+    assert dst.read_bytes() == data
+    assert not part.exists()
+
+    # A corrupted part is copied again from the start.
+    part.write_bytes(b"\0" * 1000)
+    copy_file_resumable(str(src), str(dst))
+    assert dst.read_bytes() == data
+    assert copier.file_sha256(str(dst)) == hashlib.sha256(data).hexdigest()
+
+    # A target corrupted once written is removed.
+    monkeypatch.setattr(copier, "file_sha256", lambda path, chunk_size: "corrupted")
+    with pytest.raises(ChecksumError):
+        copy_file_resumable(str(src), str(dst))
+    assert not dst.exists()
+
+
+def test_rate_limiter_shares_bandwidth():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(100, clock=lambda: now[0], sleep=sleep)
+    limiter.acquire(100)
+    assert sleeps == []
+    limiter.acquire(50)
+    limiter.acquire(50)
+    assert sleeps == [0.5, 0.5]
+    assert now[0] == 1.0
+    RateLimiter(None).acquire(1 << 30)